@@ -1,2 +1,12 @@
 # flake8: noqa
-from .datetime_utils import round_datetime, round_datetime_to_15min
\ No newline at end of file
+from .batch import round_many
+from .buckets import bucket_end, bucket_id, bucket_start
+from .cache import cache_info, clear_cache, set_cache_size
+from .datetime_utils import (
+    all_snapped, first_unsnapped, iter_periods, round_datetime, round_datetime_to_15min, snapped_mask)
+from .epoch import ceil_epoch, ceil_epoch_buffer, floor_epoch, floor_epoch_buffer
+from .iso import floor_iso
+from .periods import Period
+from .streams import bucketize, watermark_bucketize
+from .windows import HoppingWindowAggregator, WindowAggregator, hopping_windows
+from .zones import get_timezone
@@ -0,0 +1,9 @@
+"""
+Runs the command line rounding filter, see datetime_utils.cli.
+"""
+import sys
+
+from .cli import main
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Rounding of long lists of datetimes across processes.
+"""
+from .datetime_utils import round_datetime, round_datetime_down, round_datetime_up
+from .periods import Period
+
+# mode -> the function round_many applies to every value
+MODES = {
+    'floor': round_datetime_down,
+    'ceil': round_datetime_up,
+    'nearest': round_datetime,
+}
+
+# inputs shorter than this are rounded in-process, where a pool would
+# take longer to start than it saves
+PARALLEL_THRESHOLD = 100000
+
+# chunks handed out per worker, so that a slow chunk does not hold up the rest
+_CHUNKS_PER_WORKER = 4
+
+
+def _round_chunk(args):
+    values, period, tzinfo, mode, force = args
+    function = MODES[mode]
+    period = Period.get(period)
+    return [function(dt, period, tzinfo, force) for dt in values]
+
+
+def round_many(values, period, tzinfo=None, mode='floor', workers=None, force=False):
+    """
+    Round every datetime in values, in a pool of processes when there are
+    enough of them to be worth it.
+
+    The results are those of round_datetime_down ('floor'),
+    round_datetime_up ('ceil') or round_datetime ('nearest') for each
+    value, in the order of values.
+
+    :type values: iterable
+    :param values: Naive or aware datetime objects.
+
+    :type period: str or Period
+    :param period: Options are microsecond, millisecond, second, minute, hour, day, week,
+        month, quarter, year or multiples such as minute-15
+
+    :type tzinfo: tzinfo or str
+    :param tzinfo: A pytz or zoneinfo timezone, a fixed offset or a timezone name. If given, the round will
+        be performed with respect to the timezone. Else it is done in the
+        timezone of each datetime, also for 'nearest'.
+
+    :type mode: str
+    :param mode: 'floor', 'ceil' or 'nearest'.
+
+    :type workers: int
+    :param workers: The number of processes, by default one per CPU. With
+        1, or fewer than PARALLEL_THRESHOLD values, everything is rounded
+        in this process.
+
+    :type force: bool
+    :param force: A boolean value. If force=True,
+        it causes pre-rounded values to jump another step anyway.
+
+    :rtype: list
+    :returns: The rounded datetime objects.
+
+    :raises: Exception if the period or the mode is not supported
+
+    .. code-block:: python
+
+        >>> import datetime
+        >>> from datetime_utils import round_many
+        >>> round_many([datetime.datetime(2013, 4, 5, 2, 33), datetime.datetime(2013, 4, 5, 2, 10)], 'hour',
+        ...            mode='nearest')
+        [datetime.datetime(2013, 4, 5, 3, 0), datetime.datetime(2013, 4, 5, 2, 0)]
+    """
+    if mode not in MODES:
+        raise Exception('Unrecognized mode: %s' % mode)
+    # workers are sent the period's name, which is checked here first
+    name = Period.get(period).name
+
+    values = list(values)
+    if len(values) < PARALLEL_THRESHOLD:
+        return _round_chunk((values, name, tzinfo, mode, force))
+
+    # only imported here, as it takes longer to import than the rest of datetime_utils
+    import multiprocessing
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if workers <= 1:
+        return _round_chunk((values, name, tzinfo, mode, force))
+
+    size = -(-len(values) // (workers * _CHUNKS_PER_WORKER))
+    chunks = [(values[i:i + size], name, tzinfo, mode, force) for i in range(0, len(values), size)]
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        results = pool.map(_round_chunk, chunks, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+    return [dt for chunk in results for dt in chunk]
@@ -0,0 +1,360 @@
+"""
+Benchmarks for the public rounding functions.
+
+Run with ``python -m datetime_utils.bench``. Every function is timed for
+naive datetimes and for UTC, a fixed offset and three DST zones, for
+every period it supports, one value at a time (scalar) and, where there
+is one, over a whole list or array (batch). The cost is printed per
+value, in microseconds.
+
+``--json results.json`` saves the results, and ``--baseline
+results.json`` compares a run with saved results, exiting with status 1
+if anything got slower than the threshold allows::
+
+    python -m datetime_utils.bench --json before.json
+    # ... change something ...
+    python -m datetime_utils.bench --baseline before.json
+
+The batch forms in datetime_utils.vector are only timed when numpy is
+installed.
+
+round_datetime is also timed for aware datetimes in each timezone
+backend, keyed 'round_datetime/<backend>/<zone>/<period>': pytz, a
+datetime.timezone fixed offset and, where it is available, zoneinfo.
+
+``--startup`` times ``import datetime_utils`` in a new interpreter
+instead, exiting with status 1 if it takes longer than IMPORT_BUDGET or
+imports pytz, multiprocessing, numpy or asyncio, which are left until a
+function needs them.
+"""
+from __future__ import print_function
+
+import argparse
+import array
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+import pytz
+
+from .batch import round_many
+from .datetime_utils import (
+    is_snapped_to, is_snapped_to_15min, iter_periods, round_datetime, round_datetime_down, round_datetime_to_15min,
+    round_datetime_up, snapped_mask)
+from .epoch import ceil_epoch, ceil_epoch_buffer, floor_epoch, floor_epoch_buffer
+from .iso import floor_iso
+from .streams import bucketize, watermark_bucketize
+from .windows import HoppingWindowAggregator, WindowAggregator
+from .zones import EPOCH, UTC
+
+try:
+    import numpy
+    from . import vector
+except ImportError:  # pragma: no cover
+    numpy = None
+
+PERIODS = ['millisecond-100', 'minute', 'minute-15', 'hour', 'day', 'week', 'month', 'quarter', 'year']
+
+ZONES = [
+    ('naive', None),
+    ('UTC', pytz.UTC),
+    ('fixed', pytz.FixedOffset(-150)),
+    ('America/Sao_Paulo', pytz.timezone('America/Sao_Paulo')),
+    ('Asia/Amman', pytz.timezone('Asia/Amman')),
+    ('Canada/Newfoundland', pytz.timezone('Canada/Newfoundland')),
+]
+
+# (backend, zone name, tzinfo) of the timezones round_datetime is timed
+# with for aware datetimes
+BACKEND_ZONES = [
+    ('pytz', 'America/Sao_Paulo', pytz.timezone('America/Sao_Paulo')),
+]
+
+try:
+    from datetime import timezone
+    BACKEND_ZONES.append(('timezone', 'fixed', timezone(timedelta(minutes=-150))))
+    import zoneinfo
+    BACKEND_ZONES.append(('zoneinfo', 'America/Sao_Paulo', zoneinfo.ZoneInfo('America/Sao_Paulo')))
+except ImportError:  # pragma: no cover (Python < 3.9)
+    pass
+
+# three weeks over the 2015-10-18 Sao Paulo, 2015-10-30 Amman and
+# 2015-11-01 Newfoundland transitions
+SAMPLES = [datetime(2015, 10, 15) + timedelta(minutes=step, seconds=step % 60) for step in range(0, 60 * 24 * 21, 97)]
+
+
+def _scalar(function):
+    def run(samples, period, tzinfo):
+        for dt in samples:
+            function(dt, period, tzinfo)
+    return run
+
+
+def _scalar_15min(function):
+    def run(samples, period, tzinfo):
+        for dt in samples:
+            function(dt, tzinfo)
+    return run
+
+
+def _epoch(function):
+    def setup(samples):
+        return [int((dt - EPOCH).total_seconds()) for dt in samples]
+
+    def run(values, period, tzinfo):
+        for value in values:
+            function(value, period, tzinfo)
+    return run, setup
+
+
+def _buffer(function):
+    def setup(samples):
+        return array.array('q', [int((dt - EPOCH).total_seconds()) for dt in samples])
+
+    def run(values, period, tzinfo):
+        function(values, period, tzinfo, out=array.array('q', values))
+    return run, setup
+
+
+def _setup_iso(samples):
+    return [dt.isoformat() for dt in samples]
+
+
+def _run_floor_iso(values, period, tzinfo):
+    floor_iso(values, period, tzinfo)
+
+
+def _run_bucketize(samples, period, tzinfo):
+    for _ in bucketize(samples, period, tzinfo):
+        pass
+
+
+def _run_watermark_bucketize(samples, period, tzinfo):
+    for _ in watermark_bucketize(samples, period, tzinfo, timedelta(minutes=5)):
+        pass
+
+
+def _run_window_aggregator(samples, period, tzinfo):
+    aggregator = WindowAggregator(period, tzinfo, ('count', 'sum'))
+    aggregator.add_many((dt, 1) for dt in samples)
+    aggregator.flush()
+
+
+def _run_hopping_window_aggregator(samples, period, tzinfo):
+    # days starting every period
+    aggregator = HoppingWindowAggregator('day', period, tzinfo, ('count', 'sum'))
+    aggregator.add_many((dt, 1) for dt in samples)
+    aggregator.flush()
+
+
+def _run_iter_periods(samples, period, tzinfo):
+    for _ in iter_periods(samples[0], samples[-1], period, tzinfo):
+        pass
+
+
+def _run_snapped_mask(samples, period, tzinfo):
+    snapped_mask(samples, period, tzinfo)
+
+
+def _run_round_many(samples, period, tzinfo):
+    round_many(samples, period, tzinfo, 'nearest')
+
+
+def _aware(tzinfo):
+    # the samples as aware datetimes in tzinfo, as its backend makes them
+    def setup(samples):
+        return [tzinfo.fromutc(dt.replace(tzinfo=tzinfo)) for dt in samples]
+    return setup
+
+
+def _count_iter_periods(samples, period, tzinfo):
+    return sum(1 for _ in iter_periods(samples[0], samples[-1], period, tzinfo)) or 1
+
+
+def _vector(function):
+    def setup(samples):
+        return numpy.array([dt - EPOCH for dt in samples], dtype='timedelta64[us]') + numpy.datetime64(0, 'us')
+
+    def run(values, period, tzinfo):
+        function(values, period, tzinfo)
+    return run, setup
+
+
+# (function name, form, run, setup, periods); run(values, period, tzinfo)
+# handles every value, setup turns the sample datetimes into the values
+BENCHMARKS = [
+    ('round_datetime', 'scalar', _scalar(round_datetime), None, PERIODS),
+    ('round_datetime_down', 'scalar', _scalar(round_datetime_down), None, PERIODS),
+    ('round_datetime_up', 'scalar', _scalar(round_datetime_up), None, PERIODS),
+    ('round_datetime_to_15min', 'scalar', _scalar_15min(round_datetime_to_15min), None, ['minute-15']),
+    ('is_snapped_to', 'scalar', _scalar(is_snapped_to), None, PERIODS),
+    ('is_snapped_to_15min', 'scalar', _scalar_15min(is_snapped_to_15min), None, ['minute-15']),
+    ('floor_epoch', 'scalar') + _epoch(floor_epoch) + (PERIODS,),
+    ('ceil_epoch', 'scalar') + _epoch(ceil_epoch) + (PERIODS,),
+    ('floor_epoch_buffer', 'batch') + _buffer(floor_epoch_buffer) + (PERIODS,),
+    ('ceil_epoch_buffer', 'batch') + _buffer(ceil_epoch_buffer) + (PERIODS,),
+    ('floor_iso', 'batch', _run_floor_iso, _setup_iso, PERIODS),
+    ('bucketize', 'batch', _run_bucketize, None, PERIODS),
+    ('watermark_bucketize', 'batch', _run_watermark_bucketize, None, PERIODS),
+    ('WindowAggregator', 'batch', _run_window_aggregator, None, PERIODS),
+    ('HoppingWindowAggregator', 'batch', _run_hopping_window_aggregator, None, ['minute-15', 'hour']),
+    ('iter_periods', 'batch', _run_iter_periods, None, PERIODS),
+    ('round_many', 'batch', _run_round_many, None, PERIODS),
+    ('snapped_mask', 'batch', _run_snapped_mask, None, PERIODS),
+]
+
+if numpy is not None:  # pragma: no branch
+    BENCHMARKS += [
+        ('vector.round_datetime', 'batch') + _vector(vector.round_datetime) + (PERIODS,),
+        ('vector.round_datetime_down', 'batch') + _vector(vector.round_datetime_down) + (PERIODS,),
+        ('vector.round_datetime_up', 'batch') + _vector(vector.round_datetime_up) + (PERIODS,),
+        ('vector.is_snapped_to', 'batch') + _vector(vector.is_snapped_to) + (PERIODS,),
+    ]
+
+# the number of values a run handles, when it is not one per sample
+_COUNTS = {
+    'iter_periods': _count_iter_periods,
+}
+
+
+# the longest importing datetime_utils may take, in seconds
+IMPORT_BUDGET = 0.05
+
+# modules importing datetime_utils leaves until a function needs them
+LAZY_MODULES = ('pytz', 'multiprocessing', 'numpy', 'asyncio')
+
+_IMPORT_SCRIPT = '''
+import sys
+import timeit
+start = timeit.default_timer()
+import datetime_utils
+print(timeit.default_timer() - start)
+print(' '.join(name for name in %r if name in sys.modules))
+'''
+
+
+def import_time(repeat=5):
+    """
+    Return the best time, in seconds, importing datetime_utils takes in a
+    new interpreter, and the LAZY_MODULES it imported.
+    """
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, (root, env.get('PYTHONPATH'))))
+
+    times, loaded = [], set()
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', _IMPORT_SCRIPT % (LAZY_MODULES,)], env=env,
+                                         universal_newlines=True).split('\n')
+        times.append(float(output[0]))
+        loaded.update(output[1].split())
+    return min(times), sorted(loaded)
+
+
+def startup(repeat=5):
+    """
+    Print the import time, and return 1 if it is over IMPORT_BUDGET or
+    any of LAZY_MODULES was imported, else 0.
+    """
+    seconds, loaded = import_time(repeat)
+    print('import datetime_utils: %.2fms (budget %.2fms)' % (seconds * 1000, IMPORT_BUDGET * 1000))
+    if loaded:
+        print('imported eagerly: %s' % ', '.join(loaded))
+    return 1 if seconds > IMPORT_BUDGET or loaded else 0
+
+
+def time_per_call(run, values, period, tzinfo, count, repeat=3):
+    """
+    Return the best time, in microseconds, of run divided by count.
+    """
+    best = min(timeit.repeat(lambda: run(values, period, tzinfo), number=1, repeat=repeat))
+    return best / count * 10 ** 6
+
+
+def run_benchmarks(samples=SAMPLES, repeat=3, pattern=None):
+    """
+    Run every benchmark whose name contains pattern.
+
+    :rtype: dict
+    :returns: microseconds per value, keyed by 'function/form/zone/period'.
+    """
+    results = {}
+    for name, form, run, setup, periods in BENCHMARKS:
+        values = setup(samples) if setup else samples
+        for zone_name, tzinfo in ZONES:
+            for period in periods:
+                key = '/'.join((name, form, zone_name, period))
+                if pattern and pattern not in key:
+                    continue
+                count = _COUNTS[name](samples, period, tzinfo) if name in _COUNTS else len(samples)
+                results[key] = time_per_call(run, values, period, tzinfo, count, repeat)
+
+    run = _scalar(round_datetime)
+    for backend, zone_name, tzinfo in BACKEND_ZONES:
+        values = _aware(tzinfo)(samples)
+        for period in PERIODS:
+            key = '/'.join(('round_datetime', backend, zone_name, period))
+            if pattern and pattern not in key:
+                continue
+            results[key] = time_per_call(run, values, period, UTC, len(samples), repeat)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Return the keys of results that are more than threshold times slower
+    than in baseline, and print the ratios.
+    """
+    slower = []
+    for key in sorted(results):
+        if key not in baseline:
+            continue
+        ratio = results[key] / baseline[key]
+        flag = ''
+        if ratio > threshold:
+            slower.append(key)
+            flag = ' SLOWER'
+        print('%-60s %9.2fus %9.2fus %6.2f%s' % (key, baseline[key], results[key], ratio, flag))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m datetime_utils.bench', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--json', metavar='PATH', help='save the results to PATH')
+    parser.add_argument('--baseline', metavar='PATH', help='compare with the results saved in PATH')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='slowdown ratio that counts as a regression (default 1.25)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per benchmark, the best is kept (default 3)')
+    parser.add_argument('--samples', type=int, default=len(SAMPLES), help='values per run (default %(default)s)')
+    parser.add_argument('--filter', metavar='TEXT', help='only run benchmarks whose name contains TEXT')
+    parser.add_argument('--startup', action='store_true', help='time importing datetime_utils instead')
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        return startup(args.repeat)
+
+    results = run_benchmarks(SAMPLES[:args.samples], args.repeat, args.filter)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'python': platform.python_version(), 'pytz': pytz.__version__, 'results': results}, f,
+                      indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        print('%-60s %11s %11s %6s' % ('benchmark', 'baseline', 'now', 'ratio'))
+        return 1 if compare(results, baseline, args.threshold) else 0
+
+    print('%-60s %11s' % ('benchmark', 'per value'))
+    for key in sorted(results):
+        print('%-60s %9.2fus' % (key, results[key]))
+    return 0
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Integer bucket ids for periods, as compact keys for aggregation.
+"""
+from .cache import _to_datetime
+from .periods import DAY, Period, to_microseconds
+from .zones import get_zone_table, wall_microseconds
+
+
+def _last_instant(zone, local):
+    # the last UTC instant at which the wall time in zone goes from before
+    # local to local or after: the second time if the clocks go back over
+    # local, and the instant they jump if they skip it
+    starts, ends, offsets = zone.starts, zone.ends, zone.offsets
+    # no offset is a day or more, so these are all the intervals local can be in
+    first = zone._index(local - 2 * DAY)
+    for index in range(zone._index(local + 2 * DAY), first, -1):
+        if starts[index] < local - offsets[index] < ends[index]:
+            return local - offsets[index]
+        # at the instant the clocks go back to local the wall time was after it
+        if starts[index] + offsets[index - 1] <= local <= starts[index] + offsets[index]:
+            return starts[index]
+    return local - offsets[first]
+
+
+def start_us(zone, period, bucket):
+    """
+    Return the UTC start of a bucket in microseconds since the Unix epoch;
+    zone is a ZoneTable, or None for naive UTC.
+    """
+    start = period.start_us(bucket)
+    return start if zone is None else zone.to_utc(start)
+
+
+def end_us(zone, period, bucket):
+    """
+    Return the UTC end of a bucket in microseconds since the Unix epoch;
+    zone is a ZoneTable, or None for naive UTC.
+    """
+    end = period.start_us(bucket + 1)
+    return end if zone is None else _last_instant(zone, end)
+
+
+def bucket_id(dt, period, tzinfo=None):
+    """
+    Return the number of the period dt falls in: the period round_datetime_down
+    snaps it to, counted in wall time from the one containing 1970-01-01
+    00:00 in the timezone, which is 0.
+
+    The numbers are dense and in the order of the periods, so they can
+    index arrays and key dicts or sorts where the rounded datetimes are
+    slower to hash and compare. bucket_start and bucket_end turn them back
+    into datetimes. Periods whose wall times the clocks skip entirely get
+    a number no datetime has.
+
+    :type dt: datetime
+    :param dt: A datetime object, naive UTC or aware.
+
+    :type period: str or Period
+    :param period: Options are microsecond, millisecond, second, minute, hour, day, week,
+        month, quarter, year or multiples such as minute-15
+
+    :type tzinfo: tzinfo or str
+    :param tzinfo: A pytz or zoneinfo timezone, a fixed offset or a timezone name. If given, the round will
+        be performed with respect to the timezone. Else it is done in the
+        timezone of dt, which is the one to give bucket_start and
+        bucket_end.
+
+    :rtype: int
+
+    .. code-block:: python
+
+        >>> import datetime
+        >>> from datetime_utils import bucket_id, bucket_start
+        >>> bucket_id(datetime.datetime(2013, 4, 5, 2, 33), 'hour', 'America/Los_Angeles')
+        379195
+        >>> print(bucket_start(379195, 'hour', 'America/Los_Angeles'))
+        2013-04-04 19:00:00-07:00
+    """
+    period = Period.get(period)
+    local = wall_microseconds(dt)
+    if tzinfo:
+        if dt.tzinfo:
+            local -= to_microseconds(dt.utcoffset())
+        local = get_zone_table(tzinfo).to_local(local)[0]
+    return period.index_us(local)
+
+
+def bucket_start(bucket, period, tzinfo=None):
+    """
+    Return the start of the period numbered bucket by bucket_id, which is
+    the round_datetime_down of every datetime in it.
+
+    :type bucket: int
+    :param bucket: A number bucket_id returned.
+
+    :type period: str or Period
+    :param period: The period given to bucket_id.
+
+    :type tzinfo: tzinfo or str
+    :param tzinfo: The timezone the bucket is in. If None, the start is a
+        naive datetime: UTC, or the wall time of bucket_id's timezone.
+
+    :rtype: datetime
+    :returns: An aware datetime in tzinfo, or a naive datetime.
+    """
+    period = Period.get(period)
+    zone = get_zone_table(tzinfo) if tzinfo else None
+    return _to_datetime(start_us(zone, period, bucket), zone)
+
+
+def bucket_end(bucket, period, tzinfo=None):
+    """
+    Return the end of the period numbered bucket by bucket_id: the instant
+    from which on every datetime has a later bucket. Across a DST change
+    this is not the same length after the start as other periods, and
+    when the clocks go back from after the end to before it, it is where
+    the wall time reaches the end the second time.
+
+    The arguments are those of bucket_start.
+
+    :rtype: datetime
+    :returns: An aware datetime in tzinfo, or a naive datetime.
+    """
+    period = Period.get(period)
+    zone = get_zone_table(tzinfo) if tzinfo else None
+    return _to_datetime(end_us(zone, period, bucket), zone)
@@ -0,0 +1,211 @@
+"""
+A bounded cache of the period boundaries the rounding functions compute.
+
+Timestamps tend to come in clusters, many of them in the same hour or
+day. round_datetime_down and round_datetime_up keep the boundaries of
+the periods they have recently rounded in a least recently used cache,
+keyed by the zone, the period and the wall time the period starts at,
+so that rounding another time in one of these periods only has to find
+the period, and the datetime it returns is the one already built.
+
+The cache holds up to 4096 periods by default. Rounding without any
+timezone is plain arithmetic and does not use it.
+
+.. code-block:: python
+
+    >>> import datetime
+    >>> import pytz
+    >>> import datetime_utils
+    >>> datetime_utils.set_cache_size(1024)
+    >>> datetime_utils.clear_cache()
+    >>> tz = pytz.timezone('America/Los_Angeles')
+    >>> for minute in range(60):
+    ...     _ = datetime_utils.round_datetime(datetime.datetime(2013, 4, 5, 2, minute), 'hour', tz)
+    >>> datetime_utils.cache_info()
+    CacheInfo(hits=59, misses=1, evictions=0, maxsize=1024, currsize=1)
+"""
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+
+from .periods import DAY
+from .zones import EPOCH
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses evictions maxsize currsize')
+
+DEFAULT_MAXSIZE = 4096
+
+# a period this far from an offset change has the one offset throughout,
+# and to_utc finds no other offset to consider for its wall times
+_MARGIN = 2 * DAY
+
+if hasattr(OrderedDict, 'move_to_end'):
+    def _touch(entries, key):
+        entries.move_to_end(key)
+else:  # pragma: no cover (Python 2)
+    def _touch(entries, key):
+        entries[key] = entries.pop(key)
+
+
+def _to_datetime(utc, out_zone):
+    if out_zone is None:
+        return EPOCH + timedelta(microseconds=utc)
+    return out_zone.to_datetime(utc)
+
+
+class _Bucket(object):
+    """
+    The boundaries of the period starting at the wall time start in zone,
+    as datetimes in out_zone (naive UTC if None), built when first asked.
+    """
+
+    __slots__ = ('zone', 'period', 'start', 'out_zone', 'utc', '_floor', '_next', '_wall_next')
+
+    def __init__(self, zone, period, start, out_zone, index):
+        self.zone = zone
+        self.period = period
+        self.start = start
+        self.out_zone = out_zone
+        self.utc = zone.to_utc(start, index)
+        self._floor = self._next = self._wall_next = None
+
+    def floor(self):
+        if self._floor is None:
+            self._floor = _to_datetime(self.utc, self.out_zone)
+        return self._floor
+
+    def next(self):
+        # the first boundary after the period's own
+        if self._next is None:
+            self._next = _to_datetime(self.zone.ceil(self.utc, self.period, force=True), self.out_zone)
+        return self._next
+
+    def wall_next(self):
+        # the start of the following period of wall times
+        if self._wall_next is None:
+            period = self.period
+            utc = self.zone.to_utc(period.next_us(self.start))
+            self._wall_next = _to_datetime(utc, self.out_zone)
+        return self._wall_next
+
+
+class BoundaryCache(object):
+    """
+    A least recently used cache of _Bucket objects, safe to share between
+    threads.
+
+    :type maxsize: int
+    :param maxsize: The number of periods kept. 0 turns caching off.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def _get(self, zone, period, start, out_zone, index=None):
+        if not self.maxsize:
+            return _Bucket(zone, period, start, out_zone, index)
+
+        key = (zone, period.name, start, out_zone)
+        entries = self._entries
+        with self._lock:
+            try:
+                bucket = entries[key]
+            except KeyError:
+                pass
+            else:
+                self.hits += 1
+                _touch(entries, key)
+                return bucket
+
+            self.misses += 1
+            bucket = entries[key] = _Bucket(zone, period, start, out_zone, index)
+            if len(entries) > self.maxsize:
+                entries.popitem(last=False)
+                self.evictions += 1
+            return bucket
+
+    def floor(self, zone, local, period, out_zone, index=None):
+        """
+        Return the start of the period of the wall time local in zone.
+        """
+        return self._get(zone, period, period.floor_us(local), out_zone, index).floor()
+
+    def ceil(self, zone, utc, period, force, out_zone):
+        """
+        Return ZoneTable.ceil(utc, period, force) as a datetime.
+        """
+        local, index = zone.to_local(utc)
+        start = period.floor_us(local)
+
+        # Away from offset changes the period starts where start is in
+        # utc's offset, no other period starts inside it, and so the
+        # first boundary after utc is that of the period's start.
+        # Elsewhere the boundaries can be out of order.
+        floor = start - zone.offsets[index]
+        if not (zone.starts[index] <= floor - _MARGIN and floor + period.step + _MARGIN <= zone.ends[index]):
+            return _to_datetime(zone.ceil(utc, period, force), out_zone)
+
+        bucket = self._get(zone, period, start, out_zone, index)
+        if utc == floor and not force:
+            return bucket.floor()
+        return bucket.next()
+
+    def wall_ceil(self, zone, local, utc, period, out_zone):
+        """
+        Return the start of the period of the wall time local in zone if
+        it is the instant utc, else the start of the following period.
+        """
+        bucket = self._get(zone, period, period.floor_us(local), out_zone)
+        if bucket.utc == utc:
+            return bucket.floor()
+        return bucket.wall_next()
+
+    def resize(self, maxsize):
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._entries) > maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.evictions, self.maxsize, len(self._entries))
+
+
+boundaries = BoundaryCache()
+
+
+def set_cache_size(maxsize):
+    """
+    Set how many periods the boundary cache keeps, evicting the least
+    recently used ones if there are more. 0 turns the cache off.
+    """
+    if maxsize < 0:
+        raise Exception('Invalid cache size: %s' % maxsize)
+    boundaries.resize(maxsize)
+
+
+def clear_cache():
+    """
+    Empty the boundary cache and reset its statistics.
+    """
+    boundaries.clear()
+
+
+def cache_info():
+    """
+    Return the boundary cache statistics.
+
+    :rtype: CacheInfo
+    :returns: A named tuple of hits, misses, evictions, maxsize and
+        currsize (the number of periods cached).
+    """
+    return boundaries.info()
@@ -0,0 +1,240 @@
+"""
+A command line filter that rounds the timestamps in text, run as
+``python -m datetime_utils``.
+
+Every line of the files (or of stdin) is a timestamp, or with --column
+has one in that field, and blank lines are passed through. The
+timestamps are ISO-8601 strings or integer epoch values, and are written
+back rounded in the same form, a Z suffix included, the rest of each
+line unchanged. With --count only the periods are written, each with the
+number of timestamps in it::
+
+    python -m datetime_utils --period minute-15 --zone America/New_York < times.txt
+    python -m datetime_utils --period hour --column 3 --mode nearest events.csv
+    python -m datetime_utils --period day --unit ms --count --workers 4 big.log
+
+Input is read and written a chunk of lines at a time, and epoch values
+are rounded a chunk at a time with datetime_utils.vector when numpy is
+installed. ISO-8601 strings are rounded down with floor_iso. With
+--workers the chunks are handed to a pool of processes. Needs Python 3.7.
+"""
+from __future__ import print_function
+
+import argparse
+import sys
+from collections import OrderedDict
+from itertools import chain
+
+from .batch import MODES
+from .epoch import UNITS, ceil_epoch, floor_epoch, get_unit
+from .iso import _parse as _parse_iso, floor_iso
+from .periods import Period
+
+try:
+    import numpy
+    from . import vector
+except ImportError:  # pragma: no cover
+    numpy = None
+
+# the input read at a time, in bytes
+CHUNK_SIZE = 1 << 20
+
+# mode -> the datetime_utils.vector function for epoch values
+_VECTOR_MODES = {
+    'floor': 'round_datetime_down',
+    'ceil': 'round_datetime_up',
+    'nearest': 'round_datetime',
+}
+
+
+def _is_epoch(value):
+    return value.lstrip('-').isdigit()
+
+
+def _parse_epoch(value):
+    try:
+        return int(value)
+    except ValueError:
+        raise Exception('Unrecognized timestamp: %s' % value)
+
+
+def _round_epoch(values, period, tzinfo, mode, unit):
+    values = [_parse_epoch(value) for value in values]
+
+    if numpy is not None:
+        function = getattr(vector, _VECTOR_MODES[mode])
+        return function(numpy.array(values, dtype=numpy.int64), period, tzinfo, unit=unit).tolist()
+
+    multiplier, divisor = get_unit(unit)
+    rounded = []
+    for value in values:
+        # round_datetime decides from the UTC fields, as for naive datetimes
+        down = mode == 'floor' or mode == 'nearest' and period.rounds_down_us(value * multiplier // divisor)
+        rounded.append((floor_epoch if down else ceil_epoch)(value, period, tzinfo, unit))
+    return rounded
+
+
+def _round_iso(values, period, tzinfo, mode):
+    if mode == 'floor':
+        rounded = floor_iso(values, period, tzinfo, output='iso')
+    else:
+        function = MODES[mode]
+        rounded = []
+        for value in values:
+            separator = ' ' if value[10:11] == ' ' else 'T'
+            rounded.append(function(_parse_iso(value), period, tzinfo).isoformat(separator))
+
+    # UTC given as Z is written back as Z
+    return [result[:-6] + 'Z' if value[-1:] == 'Z' and result[-6:] == '+00:00' else result
+            for value, result in zip(values, rounded)]
+
+
+def round_values(values, period, tzinfo=None, mode='floor', unit=None):
+    """
+    Round timestamp strings, keeping their form.
+
+    :type values: list
+    :param values: ISO-8601 strings, or epoch values in unit as strings.
+        Naive ISO-8601 times are UTC.
+
+    :type unit: str
+    :param unit: 's', 'ms', 'us' or 'ns' if the values are epoch values,
+        else None.
+
+    The other arguments are those of :func:`datetime_utils.round_many`.
+
+    :rtype: list
+    :returns: The rounded values as strings.
+
+    :raises: Exception if a value is not a timestamp
+    """
+    period = Period.get(period)
+    if unit is None:
+        return _round_iso(values, period, tzinfo, mode)
+    return [str(value) for value in _round_epoch(values, period, tzinfo, mode, unit)]
+
+
+def _process(args):
+    # round the timestamps in a chunk of lines; returns the output text,
+    # or with count the rounded values
+    lines, period, tzinfo, mode, unit, column, delimiter, count = args
+    lines = [line.rstrip('\r\n') for line in lines]
+    # blank lines are written back as they are
+    filled = [line for line in lines if line.strip()]
+    if column is None:
+        rows = None
+        values = filled
+    else:
+        rows = [line.split(delimiter) for line in filled]
+        try:
+            values = [row[column] for row in rows]
+        except IndexError:
+            raise Exception('Line without column %d: %s' % (column + 1, next(
+                delimiter.join(row) for row in rows if len(row) <= column)))
+
+    rounded = round_values(values, period, tzinfo, mode, unit)
+    if count:
+        return rounded
+    if rows is not None:
+        for row, value in zip(rows, rounded):
+            row[column] = value
+        rounded = [delimiter.join(row) for row in rows]
+    results = iter(rounded)
+    return '\n'.join(next(results) if line.strip() else line for line in lines) + '\n'
+
+
+def _chunks(paths, header, output):
+    # the lines of every file, CHUNK_SIZE bytes or so at a time, passing
+    # headers through to output
+    for path in paths:
+        f = sys.stdin if path == '-' else open(path)
+        try:
+            if header:
+                output.write(f.readline())
+            while True:
+                lines = f.readlines(CHUNK_SIZE)
+                if not lines:
+                    break
+                yield lines
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+def _first_value(chunks, column, delimiter):
+    # the chunks up to the first line that is not blank, and its timestamp,
+    # whose form is that of them all; '' if there is none
+    first = []
+    for lines in chunks:
+        first.append(lines)
+        line = next((line.rstrip('\r\n') for line in lines if line.strip()), None)
+        if line is not None:
+            if column is None:
+                return first, line
+            fields = line.split(delimiter)
+            return first, fields[column - 1] if len(fields) >= column else ''
+    return first, ''
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog='python -m datetime_utils', description=__doc__.split('\n\n')[0])
+    parser.add_argument('files', nargs='*', metavar='FILE', help='files to read, stdin by default or for -')
+    parser.add_argument('--period', '-p', required=True, help='e.g. minute-15, hour or day')
+    parser.add_argument('--zone', '-z', help='timezone name to round in, e.g. America/New_York (default UTC)')
+    parser.add_argument('--mode', '-m', choices=sorted(MODES), default='floor', help='default floor')
+    parser.add_argument('--column', '-c', type=int, metavar='N', help='round field N (from 1) of each line')
+    parser.add_argument('--delimiter', '-d', default=',', help='field delimiter for --column (default ,)')
+    parser.add_argument('--header', action='store_true', help='pass the first line of each file through')
+    parser.add_argument('--unit', '-u', choices=sorted(UNITS), default='s',
+                        help='unit of epoch values (default s)')
+    parser.add_argument('--count', action='store_true', help='write each period and its number of timestamps')
+    parser.add_argument('--workers', '-w', type=int, default=1, help='processes to round in (default 1)')
+    return parser
+
+
+def main(argv=None, stdout=None):
+    parser = _parser()
+    args = parser.parse_args(argv)
+    output = stdout or sys.stdout
+    if args.column is not None and args.column < 1:
+        parser.error('--column starts at 1')
+
+    try:
+        period = Period.get(args.period).name
+        chunks = _chunks(args.files or ['-'], args.header, output)
+
+        first, value = _first_value(chunks, args.column, args.delimiter)
+        unit = args.unit if _is_epoch(value) else None
+
+        column = None if args.column is None else args.column - 1
+        options = (period, args.zone, args.mode, unit, column, args.delimiter, args.count)
+        tasks = ((lines,) + options for lines in chain(first, chunks))
+
+        if args.workers > 1:
+            # only imported here, as it takes longer to import than the rest of datetime_utils
+            import multiprocessing
+            pool = multiprocessing.Pool(args.workers)
+            results = pool.imap(_process, tasks)
+        else:
+            pool = None
+            results = map(_process, tasks)
+
+        try:
+            counts = OrderedDict()
+            for result in results:
+                if not args.count:
+                    output.write(result)
+                    continue
+                for value in result:
+                    counts[value] = counts.get(value, 0) + 1
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+        for value, number in counts.items():
+            output.write('%s%s%d\n' % (value, args.delimiter, number))
+    except Exception as e:
+        print('python -m datetime_utils: error: %s' % e, file=sys.stderr)
+        return 1
+    return 0
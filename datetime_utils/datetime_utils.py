@@ -1,52 +1,40 @@
-from datetime import datetime, timedelta
+from datetime import timedelta
 
-import pytz
-
-
-def parse_period(period):
-    """
-    Parse a 'period' out to it's two parts
-
-    >>> parse_period('minute-15')
-    ('minute', 15)
-    >>> parse_period('day')
-    ('day', 1)
-    """
-    unit = period.split('-')[0]
-    quantity = int((period.split('-') + ['1'])[1])
-    return (unit, quantity)
+from .cache import boundaries
+from .periods import MINUTE, Period, get_isoweek_monday, parse_period, to_microseconds  # noqa: F401
+from .zones import EPOCH, UTC, get_zone_table, wall_microseconds
 
 
 def period_to_timedelta(period):
     """
     Valid periods are:
-        minute, minute-15, hour, day, week
-    'month' is not supported - months are varrying lengths of time
+        microsecond, millisecond, second, minute, hour, day, week or
+        multiples such as minute-15
+    'month', 'quarter' and 'year' are not supported - months are varying lengths of time
     """
-    unit, quantity = parse_period(period)
-    return timedelta(**{unit+'s': quantity})
+    period = Period.get(period)
+    if period.timedelta is None:
+        raise Exception('Unrecognized period: %s' % period.name)
+    return period.timedelta
 
 
-def get_isoweek_monday(dt):
-    # if it's a week we want to find the iso-week's monday
-    return dt - timedelta(days=dt.weekday())
-
-
-def round_datetime(dt, period, tzinfo=pytz.UTC, force=False):
+def round_datetime(dt, period, tzinfo=UTC, force=False):
     """
     Rounds a datetime to the nearest period.
     Valid periods are:
-    minute, minute-15, hour, day, week
+    microsecond, millisecond, second, minute, hour, day, week, month,
+    quarter, year or multiples such as minute-15
 
     :type dt: datetime
     :param dt: A naive or aware datetime object.
 
-    :type period: str
-    :param period: Options are minute, minute-15, hour, day, week
+    :type period: str or Period
+    :param period: Options are microsecond, millisecond, second, minute, hour, day, week,
+        month, quarter, year or multiples such as minute-15
 
-    :type tzinfo: pytz timezone
-    :param tzinfo: A pytz timezone object. If given, the round will
-        be performed with respect to the timezone.
+    :type tzinfo: tzinfo or str
+    :param tzinfo: A pytz or zoneinfo timezone, a fixed offset or a timezone name. If given, the round will
+        be performed with respect to the timezone. UTC by default.
 
     :type force: bool
     :param force: A boolean value. If force=True,
@@ -92,37 +80,12 @@ def round_datetime(dt, period, tzinfo=pytz.UTC, force=False):
         2013-02-01 01:00:00-05:00
     """
 
-    if period == 'week':
-        if dt.weekday() <= 4:
-            return round_datetime_down(dt, 'week', tzinfo, force)
-        else:
-            return round_datetime_up(dt, 'week', tzinfo, force)
+    period = Period.get(period)
 
-    if period == 'day':
-        if dt.hour <= 12:
-            return round_datetime_down(dt, 'day', tzinfo, force)
-        else:
-            return round_datetime_up(dt, 'day', tzinfo, force)
-
-    if period == 'hour':
-        if dt.minute <= 30:
-            return round_datetime_down(dt, 'hour', tzinfo, force)
-        else:
-            return round_datetime_up(dt, 'hour', tzinfo, force)
-
-    if period == 'minute-15':
-        if dt.minute % 15 <= 7:
-            return round_datetime_down(dt, 'minute-15', tzinfo, force)
-        else:
-            return round_datetime_up(dt, 'minute-15', tzinfo, force)
-
-    if period == 'minute':
-        if dt.second <= 30:
-            return round_datetime_down(dt, 'minute', tzinfo, force)
-        else:
-            return round_datetime_up(dt, 'minute', tzinfo, force)
-
-    raise Exception('Unrecognized period')
+    if period.rounds_down_us(wall_microseconds(dt)):
+        return round_datetime_down(dt, period, tzinfo, force)
+    else:
+        return round_datetime_up(dt, period, tzinfo, force)
 
 
 def round_datetime_to_15min(dt, tzinfo=None, force=False):
@@ -132,8 +95,8 @@ def round_datetime_to_15min(dt, tzinfo=None, force=False):
     :type dt: datetime
     :param dt: A naive or aware datetime object.
 
-    :type tzinfo: pytz timezone
-    :param tzinfo: A pytz timezone object. If given, the round will
+    :type tzinfo: tzinfo or str
+    :param tzinfo: A pytz or zoneinfo timezone, a fixed offset or a timezone name. If given, the round will
         be performed with respect to the timezone.
 
     :type force: bool
@@ -186,60 +149,36 @@ def round_datetime_down(dt, period, tzinfo=None, force=False):
     Round the given datetime down by 'snapping' it to the period.
 
     Valid periods are:
-        minute, minute-15, hour, day, week
+        microsecond, millisecond, second, minute, hour, day, week, month,
+        quarter, year or multiples such as minute-15
 
     If a timezone is specified, the rounding is done in that timezone.
     Else it is done in the timezone of the datetime.
 
     Specify force=True to cause pre-rounded values to jump another step anyway.
     """
-    if force:
-        dt = dt - timedelta.resolution
+    period = Period.get(period)
 
     org_tz = dt.tzinfo
-    if not org_tz:
-        dt = pytz.UTC.localize(dt)
+    local = wall_microseconds(dt)
+    if force:
+        local -= 1
 
     if tzinfo:
-        dt = tzinfo.normalize(dt)
-
-    rounded = None
-
-    if period == 'week':
-        monday = get_isoweek_monday(dt)
-        args = [monday.year, monday.month, monday.day]
-        rounded = datetime(*args)
-
-    args = [dt.year, dt.month, dt.day]
-    if period == 'day':
-        rounded = datetime(*args)
-
-    args.append(dt.hour)
-    if period == 'hour':
-        rounded = datetime(*args)
-    if period == 'minute-15':
-        args.append(dt.minute/15*15)
-        rounded = datetime(*args)
-
-    args.append(dt.minute)
-    if period == 'minute':
-        rounded = datetime(*args)
-
-    args.append(dt.second)
-    if period == 'second':
-        rounded = datetime(*args)
-
-    if rounded is None:
-        raise Exception('Unrecognized period')
-
-    rounded = dt.tzinfo.localize(rounded)
-
-    if org_tz:
-        rounded = org_tz.normalize(rounded)
+        # round the instant in tzinfo
+        if org_tz:
+            local -= to_microseconds(dt.utcoffset())
+        zone = get_zone_table(tzinfo)
+        local, index = zone.to_local(local)
+    elif org_tz:
+        # round the wall time of dt in its own timezone
+        zone = get_zone_table(org_tz)
+        index = None
     else:
-        rounded = pytz.UTC.normalize(rounded).replace(tzinfo=None)
+        # a naive datetime is UTC, there is nothing to look up
+        return EPOCH + timedelta(microseconds=period.floor_us(local))
 
-    return rounded
+    return boundaries.floor(zone, local, period, get_zone_table(org_tz) if org_tz else None, index)
 
 
 def round_datetime_up(dt, period, tzinfo=None, force=False):
@@ -247,25 +186,107 @@ def round_datetime_up(dt, period, tzinfo=None, force=False):
     Round the given datetime up by 'snapping' it to the period.
 
     Valid periods are:
-        minute, minute-15, hour, day, week
+        microsecond, millisecond, second, minute, hour, day, week, month,
+        quarter, year or multiples such as minute-15
 
     If a timezone is specified, the rounding is done in that timezone.
     Else it is done in the timezone of the datetime.
 
     Specify force=True to cause pre-rounded values to jump another step anyway.
     """
-    if force:
-        dt = dt + timedelta.resolution
+    period = Period.get(period)
+
+    org_tz = dt.tzinfo
+    local = wall_microseconds(dt)
+    out_zone = get_zone_table(org_tz) if org_tz else None
+
+    if tzinfo:
+        # round the instant in tzinfo
+        if org_tz:
+            local -= to_microseconds(dt.utcoffset())
+        return boundaries.ceil(get_zone_table(tzinfo), local, period, force, out_zone)
+    elif org_tz:
+        # round the wall time of dt in its own timezone; a forced dt is
+        # compared a resolution later, and can still be on a boundary if
+        # dt's own tzinfo is not the zone's current one (e.g. pytz LMT)
+        utc = local + (1 if force else 0) - to_microseconds(dt.utcoffset())
+        return boundaries.wall_ceil(out_zone, local, utc, period, out_zone)
+
+    # a naive datetime is UTC, there is nothing to look up
+    rounded = period.floor_us(local)
+    if force or rounded != local:
+        rounded = period.next_us(local)
+    return EPOCH + timedelta(microseconds=rounded)
+
+
+def iter_periods(start, end, period, tzinfo=None):
+    """
+    Generate the period boundaries from start up to (but excluding) end.
+
+    The first boundary is round_datetime_up(start, period, tzinfo) and each
+    following one is round_datetime_up of the previous one with force=True.
+    The next boundary is found from the wall time, so days that are 23 or
+    25 hours long across DST transitions come out as one period each. The
+    boundaries are produced lazily, one step at a time.
 
-    # we're already 'snapped' to the period
-    previous = round_datetime_down(dt, period, tzinfo=tzinfo, force=force)
+    :type start: datetime
+    :param start: A naive or aware datetime object.
 
-    if previous == dt:
-        return previous
+    :type end: datetime
+    :param end: A datetime object, naive if start is naive.
 
-    # add the period, then round down.
-    ahead = dt + period_to_timedelta(period)
-    return round_datetime_down(ahead, period, tzinfo=tzinfo, force=force)
+    :type period: str or Period
+    :param period: Options are microsecond, millisecond, second, minute, hour, day, week,
+        month, quarter, year or multiples such as minute-15
+
+    :type tzinfo: tzinfo or str
+    :param tzinfo: A pytz or zoneinfo timezone, a fixed offset or a timezone name. If given, the periods are
+        those of the timezone. Else they are those of start's timezone.
+
+    :rtype: generator
+    :returns: datetime objects in the timezone of start (naive if start is
+        naive), as round_datetime_up returns them.
+
+    .. code-block:: python
+
+        >>> import datetime
+        >>> import pytz
+        >>> import datetime_utils
+        >>> # the day the clocks went forward in Sao Paulo is 23 hours long
+        >>> for dt in datetime_utils.iter_periods(datetime.datetime(2015, 10, 17, 3), datetime.datetime(2015, 10, 20),
+        ... 'day', tzinfo=pytz.timezone('America/Sao_Paulo')):
+        ...     print dt
+        2015-10-17 03:00:00
+        2015-10-18 03:00:00
+        2015-10-19 02:00:00
+    """
+    period = Period.get(period)
+
+    org_tz = start.tzinfo
+    first = round_datetime_up(start, period, tzinfo)
+    utc = wall_microseconds(first)
+    limit = wall_microseconds(end)
+    if org_tz:
+        utc -= to_microseconds(first.utcoffset())
+    if end.tzinfo:
+        limit -= to_microseconds(end.utcoffset())
+
+    # a naive datetime is UTC, and without tzinfo an aware one is rounded in wall time
+    zone = get_zone_table(tzinfo or org_tz or UTC)
+    out_zone = get_zone_table(org_tz) if org_tz else None
+    wall = not tzinfo and org_tz is not None
+
+    while utc < limit:
+        if out_zone:
+            yield out_zone.to_datetime(utc)
+        else:
+            yield EPOCH + timedelta(microseconds=utc)
+
+        if wall:
+            local, index = zone.to_local(utc)
+            utc = zone.to_utc(period.next_us(local), index)
+        else:
+            utc = zone.ceil(utc, period, force=True)
 
 
 def is_snapped_to_15min(dt, tzinfo=None):
@@ -275,8 +296,8 @@ def is_snapped_to_15min(dt, tzinfo=None):
     :type dt: datetime
     :param dt: A naive or aware datetime object.
 
-    :type tzinfo: pytz timezone
-    :param tzinfo: A pytz timezone object.
+    :type tzinfo: tzinfo or str
+    :param tzinfo: A pytz or zoneinfo timezone, a fixed offset or a timezone name.
         If a timezone is specified, the check is done in that timezone.
         Else it is done in the timezone of the datetime.
 
@@ -306,11 +327,12 @@ def is_snapped_to(dt, period, tzinfo=None):
     :type dt: datetime
     :param dt: A naive or aware datetime object.
 
-    :type period: str
-    :param period: Options are minute, minute-15, hour, day
+    :type period: str or Period
+    :param period: Options are microsecond, millisecond, second, minute, hour, day, week,
+        month, quarter, year or multiples such as minute-15
 
-    :type tzinfo: pytz timezone
-    :param tzinfo: A pytz timezone object.
+    :type tzinfo: tzinfo or str
+    :param tzinfo: A pytz or zoneinfo timezone, a fixed offset or a timezone name.
         If a timezone is specified, the check is done in that timezone.
         Else it is done in the timezone of the datetime.
 
@@ -351,30 +373,118 @@ def is_snapped_to(dt, period, tzinfo=None):
         ... tzinfo=pytz.timezone('US/Eastern'))
         True
     """
+    period = Period.get(period)
+
     tz = tzinfo or dt.tzinfo
-    dt_local = tz.normalize(dt) if tz else dt
+    local = wall_microseconds(dt)
+    if not tz:
+        return period.snap_key_us(local - 1) != period.snap_key_us(local)
+
+    if dt.tzinfo:
+        local -= to_microseconds(dt.utcoffset())
+    return _is_snapped_us(get_zone_table(tz), local, period)
+
+
+def _is_snapped_us(zone, utc, period):
+    """
+    Return whether the UTC instant utc is snapped to period in zone, i.e.
+    whether its wall time starts a period the one before it is not in.
+    """
+    local, index = zone.to_local(utc)
+    if zone.starts[index] < utc:
+        # the instant before has the same offset
+        return period.snap_key_us(local - 1) != period.snap_key_us(local)
+
+    local_less, index_less = zone.to_local(utc - 1)
+    if period.snap_key_us(local_less) != period.snap_key_us(local):
+        return True
+
+    # handling the case where there's a 'double hour' DST transition,
+    # which for several hours only counts on one of their boundaries
+    return (period.unit == 'hour' and zone.kinds[index_less] != zone.kinds[index] and
+            local_less // MINUTE % 60 > local // MINUTE % 60 and
+            (period.quantity == 1 or period.floor_us(local) == local))
+
+
+def _iter_snapped(values, period, tzinfo):
+    period = Period.get(period)
+    zone = get_zone_table(tzinfo) if tzinfo else None
+    snap_key = period.snap_key_us
+    org_tz = org_zone = None
+
+    for dt in values:
+        local = wall_microseconds(dt)
+        if dt.tzinfo:
+            local -= to_microseconds(dt.utcoffset())
+            if not tzinfo and dt.tzinfo is not org_tz:
+                org_tz = dt.tzinfo
+                org_zone = get_zone_table(org_tz)
+        if tzinfo:
+            yield _is_snapped_us(zone, local, period)
+        elif dt.tzinfo:
+            yield _is_snapped_us(org_zone, local, period)
+        else:
+            yield snap_key(local - 1) != snap_key(local)
+
+
+def snapped_mask(values, period, tzinfo=None, packed=False):
+    """
+    Check every datetime in values with is_snapped_to at once.
+
+    :type values: iterable
+    :param values: Naive or aware datetime objects.
+
+    :type period: str or Period
+    :param period: Options are microsecond, millisecond, second, minute, hour, day, week,
+        month, quarter, year or multiples such as minute-15
+
+    :type tzinfo: tzinfo or str
+    :param tzinfo: A pytz or zoneinfo timezone, a fixed offset or a timezone name.
+        If a timezone is specified, the check is done in that timezone.
+        Else it is done in the timezone of each datetime.
 
-    dt_less = dt - timedelta.resolution
-    dt_less = tz.normalize(dt_less) if tz else dt_less
+    :type packed: bool
+    :param packed: If True, pack the mask eight values to a byte, the
+        first value in the highest bit of the first byte.
 
-    if period == 'minute':
-        return dt_less.minute != dt_local.minute
+    :rtype: bytearray
+    :returns: 1 for every snapped value and 0 for the others, or the bits
+        of these if packed.
 
-    if period == 'minute-15':
-        return dt_less.minute / 15 != dt_local.minute / 15
+    .. code-block:: python
 
-    if period == 'hour':
-        if dt_less.hour != dt_local.hour:
-            return True
+        >>> import datetime
+        >>> from datetime_utils import snapped_mask
+        >>> snapped_mask([datetime.datetime(2013, 3, 3), datetime.datetime(2013, 3, 3, 5)], 'day')
+        bytearray(b'\\x01\\x00')
+    """
+    mask = bytearray(_iter_snapped(values, period, tzinfo))
+    if not packed:
+        return mask
 
-        # handling the case where there's a 'double hour' DST transition
-        if (dt_less.tzinfo != dt_local.tzinfo and
-                dt_less.minute > dt_local.minute):
-            return True
+    bits = bytearray((len(mask) + 7) // 8)
+    for i, snapped in enumerate(mask):
+        if snapped:
+            bits[i >> 3] |= 0x80 >> (i & 7)
+    return bits
 
-        return False
 
-    if period == 'day':
-        return dt_less.day != dt_local.day
+def all_snapped(values, period, tzinfo=None):
+    """
+    Return whether every datetime in values is snapped to the period,
+    stopping at the first one that is not. Takes the arguments of
+    :func:`snapped_mask`.
+    """
+    return all(_iter_snapped(values, period, tzinfo))
+
 
-    raise Exception('Unrecognized period: %s' % period)
+def first_unsnapped(values, period, tzinfo=None):
+    """
+    Return the index of the first datetime in values that is not snapped
+    to the period, or None if they all are. Takes the arguments of
+    :func:`snapped_mask`.
+    """
+    for i, snapped in enumerate(_iter_snapped(values, period, tzinfo)):
+        if not snapped:
+            return i
+    return None
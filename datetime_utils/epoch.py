@@ -0,0 +1,277 @@
+"""
+Rounding for integer epoch timestamps, without building datetimes.
+"""
+from .periods import Period
+from .zones import get_zone_table
+
+# unit -> (multiplier, divisor) converting epoch values to microseconds
+UNITS = {
+    's': (10 ** 6, 1),
+    'ms': (1000, 1),
+    'us': (1, 1),
+    'ns': (1, 1000),
+}
+
+
+def get_unit(unit):
+    """
+    Return the (multiplier, divisor) pair of an epoch unit.
+
+    :raises: Exception if the unit is not supported
+    """
+    try:
+        return UNITS[unit]
+    except KeyError:
+        raise Exception('Unrecognized unit: %s' % unit)
+
+
+def _floor(utc, period, tzinfo):
+    if tzinfo:
+        return get_zone_table(tzinfo).floor(utc, period)
+    return period.floor_us(utc)
+
+
+def floor_epoch(value, period, tzinfo=None, unit='s', force=False):
+    """
+    Round an epoch timestamp down by 'snapping' it to the period.
+
+    This is round_datetime_down for an integer timestamp, treated like a
+    naive UTC datetime. UTC and fixed offset zones are rounded with
+    integer arithmetic alone.
+
+    :type value: int
+    :param value: Time since the Unix epoch, in unit.
+
+    :type period: str or Period
+    :param period: Options are microsecond, millisecond, second, minute, hour, day, week,
+        month, quarter, year or multiples such as minute-15
+
+    :type tzinfo: tzinfo or str
+    :param tzinfo: A pytz or zoneinfo timezone, a fixed offset or a timezone name. If given, the round will
+        be performed with respect to the timezone.
+
+    :type unit: str
+    :param unit: 's' (the default), 'ms', 'us' or 'ns'.
+
+    :type force: bool
+    :param force: A boolean value. If force=True,
+        it causes pre-rounded values to jump another step anyway.
+
+    :rtype: int
+    :returns: The rounded time since the Unix epoch, in unit.
+
+    .. code-block:: python
+
+        >>> import pytz
+        >>> import datetime_utils
+        >>> # 2013-04-05 02:33 UTC, which is still April 4 in Los Angeles
+        >>> datetime_utils.floor_epoch(1365129180, 'day', pytz.timezone('America/Los_Angeles'))
+        1365058800
+    """
+    period = Period.get(period)
+    multiplier, divisor = get_unit(unit)
+
+    if force:
+        value -= 1
+
+    rounded = _floor(value * multiplier // divisor, period, tzinfo)
+    return rounded * divisor // multiplier
+
+
+def ceil_epoch(value, period, tzinfo=None, unit='s', force=False):
+    """
+    Round an epoch timestamp up by 'snapping' it to the period.
+
+    This is round_datetime_up for an integer timestamp, and takes the same
+    arguments as :func:`floor_epoch`.
+    """
+    period = Period.get(period)
+    multiplier, divisor = get_unit(unit)
+
+    utc = value * multiplier // divisor
+
+    # values between microseconds are never on a boundary
+    if value * multiplier % divisor:
+        force = True
+
+    if tzinfo:
+        rounded = get_zone_table(tzinfo).ceil(utc, period, force)
+    else:
+        rounded = period.floor_us(utc)
+        if force or rounded != utc:
+            rounded = period.next_us(utc)
+
+    return rounded * divisor // multiplier
+
+
+# memoryview formats of signed 64-bit integers, and of raw bytes
+_INT64_FORMATS = ('q', 'l', '<q', '=q', '@q', '<l', '=l', '@l')
+_BYTE_FORMATS = ('B', 'b', 'c')
+
+
+def _int64_view(buffer):
+    view = memoryview(buffer)
+    if view.format in _BYTE_FORMATS:
+        # e.g. an mmap'd file of native int64 values
+        view = view.cast('B').cast('q')
+    if view.format not in _INT64_FORMATS or view.itemsize != 8 or view.ndim != 1:
+        raise Exception('Unsupported buffer: format %s, itemsize %d, ndim %d' %
+                        (view.format, view.itemsize, view.ndim))
+    return view
+
+
+# the vector module, or None without numpy; imported when first needed,
+# as it imports this module
+_vector = []
+
+
+def _get_vector():
+    if not _vector:
+        try:
+            from . import vector
+        except ImportError:  # pragma: no cover
+            vector = None
+        _vector.append(vector)
+    return _vector[0]
+
+
+def _round_buffer(values, out, round_us, round_array):
+    source = _int64_view(values)
+    target = source if out is None else _int64_view(out)
+    if len(target) < len(source):
+        raise Exception('Output buffer too short: %d < %d' % (len(target), len(source)))
+    if target.readonly:
+        raise Exception('Output buffer is read-only')
+
+    vector = _get_vector()
+    if vector is not None and source.c_contiguous and target.c_contiguous:
+        # numpy arrays over the buffers themselves, without copying them
+        numpy = vector.numpy
+        data = numpy.frombuffer(source, dtype=numpy.int64)
+        numpy.frombuffer(target, dtype=numpy.int64)[:len(data)] = round_array(vector, data)
+    else:
+        for i, value in enumerate(source):
+            target[i] = round_us(value)
+    return out if out is not None else values
+
+
+def _floor_run(zone, period):
+    # the floor of the instants from lower up to upper is rounded; the
+    # runs are also kept by the wall time their period starts at, so that
+    # unsorted instants find theirs again without working out its end
+    run = [1, 0, None]
+    runs = {}
+
+    def floor(utc):
+        lower, upper, rounded = run
+        if not lower <= utc < upper:
+            local, index = zone.to_local(utc)
+            start = period.floor_us(local)
+            known = runs.get(start)
+            if known is None or not known[0] <= utc < known[1]:
+                rounded = zone.to_utc(start, index) if known is None else known[2]
+                known = runs[start] = (utc, zone.period_end(utc, period), rounded)
+            run[:] = known
+            rounded = known[2]
+        return rounded
+    return floor
+
+
+def _ceil_run(zone, period):
+    # every instant after lower and before upper ceils to rounded
+    run = [1, 0, None]
+
+    def ceil(utc, force):
+        lower, upper, rounded = run
+        if lower < utc < upper:
+            return rounded
+
+        after = zone.ceil(utc, period, force=True)
+        upper = zone.period_end(utc, period)
+        # a boundary before upper other than the floor would be out of order
+        run[:] = (utc, upper, after) if after >= upper else (1, 0, None)
+        if not force and zone.floor(utc, period) == utc:
+            return utc
+        return after
+    return ceil
+
+
+def floor_epoch_buffer(values, period, tzinfo=None, unit='s', out=None, force=False):
+    """
+    Round a column of int64 epoch timestamps down, like floor_epoch.
+
+    values is any object supporting the buffer protocol with signed 64-bit
+    integers (native byte order): an ``array.array('q')``, a memoryview, a
+    bytearray or an mmap of a file of them. No datetime is built. With
+    numpy installed, contiguous buffers are rounded as numpy arrays over
+    them by the functions of datetime_utils.vector; otherwise every value
+    is rounded in turn, and in a timezone a sorted column is mostly
+    rounded by comparing each value with the end of the current period.
+    Needs Python 3.
+
+    :type out: buffer
+    :param out: A writable int64 buffer at least as long as values, which
+        the results are written to. By default values is rounded in place.
+
+    The other arguments are those of :func:`floor_epoch`.
+
+    :rtype: buffer
+    :returns: out, or values if rounded in place.
+
+    .. code-block:: python
+
+        >>> import array
+        >>> from datetime_utils import floor_epoch_buffer
+        >>> values = array.array('q', [1365129180, 1365131400])
+        >>> floor_epoch_buffer(values, 'hour')
+        array('q', [1365127200, 1365130800])
+    """
+    period = Period.get(period)
+    multiplier, divisor = get_unit(unit)
+    shift = 1 if force else 0
+
+    if tzinfo:
+        zone = get_zone_table(tzinfo)
+        floor = period.floor_us if zone.fixed else _floor_run(zone, period)
+        offset = zone.offsets[0] if zone.fixed else 0
+    else:
+        floor, offset = period.floor_us, 0
+
+    def round_us(value):
+        return (floor((value - shift) * multiplier // divisor + offset) - offset) * divisor // multiplier
+
+    def round_array(vector, data):
+        return vector.round_datetime_down(data, period, tzinfo, force, unit)
+    return _round_buffer(values, out, round_us, round_array)
+
+
+def ceil_epoch_buffer(values, period, tzinfo=None, unit='s', out=None, force=False):
+    """
+    Round a column of int64 epoch timestamps up, like ceil_epoch.
+
+    This takes the same arguments as :func:`floor_epoch_buffer`.
+    """
+    period = Period.get(period)
+    multiplier, divisor = get_unit(unit)
+    zone = get_zone_table(tzinfo) if tzinfo else None
+
+    if zone is None or zone.fixed:
+        offset = zone.offsets[0] if zone else 0
+
+        def ceil(utc, force):
+            local = utc + offset
+            rounded = period.floor_us(local)
+            if force or rounded != local:
+                rounded = period.next_us(local)
+            return rounded - offset
+    else:
+        ceil = _ceil_run(zone, period)
+
+    def round_us(value):
+        # values between microseconds are never on a boundary
+        return ceil(value * multiplier // divisor, force or bool(value * multiplier % divisor)) * \
+            divisor // multiplier
+
+    def round_array(vector, data):
+        return vector.round_datetime_up(data, period, tzinfo, force, unit)
+    return _round_buffer(values, out, round_us, round_array)
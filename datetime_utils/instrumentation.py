@@ -0,0 +1,291 @@
+"""
+Opt-in counters and timings for the rounding functions.
+
+Nothing is counted until :func:`enable` is called, and until then the
+functions run exactly as they are, with no checks on the way. enable()
+swaps each public function (in its module and in the datetime_utils
+package) for a wrapper that counts the call, and wraps the cache lookups
+and the ZoneTable conversions that stand in for pytz's localize,
+normalize and datetime construction. disable() puts the originals back.
+
+A name imported before enable() (``from datetime_utils import
+round_datetime``) still refers to the original function and is not
+counted. Calls that the functions make to each other are counted, so a
+round_datetime call shows up with the round_datetime_down or
+round_datetime_up call it makes.
+
+.. code-block:: python
+
+    >>> import datetime
+    >>> import datetime_utils
+    >>> from datetime_utils import instrumentation
+    >>> instrumentation.enable()
+    >>> datetime_utils.round_datetime(datetime.datetime(2013, 4, 5, 2, 33), 'hour', tzinfo=None)
+    datetime.datetime(2013, 4, 5, 3, 0)
+    >>> calls = instrumentation.snapshot()['calls']
+    >>> calls[('round_datetime', 'hour', 'naive')], calls[('round_datetime_up', 'hour', 'naive')]
+    (1, 1)
+    >>> instrumentation.disable()
+"""
+import sys
+import timeit
+from functools import wraps
+
+from . import batch, buckets, datetime_utils, epoch, iso, streams, windows, zones
+from .cache import cache_info
+from .periods import Period
+
+# upper bounds, in microseconds, of the latency histogram buckets; the
+# last bucket has no bound
+LATENCY_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384)
+
+# (module, function name, period argument, tzinfo argument, value argument);
+# an argument is (position, name), and a period given as a string is fixed;
+# hopping_windows is counted by its hop
+_FUNCTIONS = [
+    (datetime_utils, 'round_datetime', (1, 'period'), (2, 'tzinfo'), (0, 'dt')),
+    (datetime_utils, 'round_datetime_down', (1, 'period'), (2, 'tzinfo'), (0, 'dt')),
+    (datetime_utils, 'round_datetime_up', (1, 'period'), (2, 'tzinfo'), (0, 'dt')),
+    (datetime_utils, 'round_datetime_to_15min', 'minute-15', (1, 'tzinfo'), (0, 'dt')),
+    (datetime_utils, 'is_snapped_to', (1, 'period'), (2, 'tzinfo'), (0, 'dt')),
+    (datetime_utils, 'is_snapped_to_15min', 'minute-15', (1, 'tzinfo'), (0, 'dt')),
+    (datetime_utils, 'iter_periods', (2, 'period'), (3, 'tzinfo'), (0, 'start')),
+    (datetime_utils, 'snapped_mask', (1, 'period'), (2, 'tzinfo'), None),
+    (datetime_utils, 'all_snapped', (1, 'period'), (2, 'tzinfo'), None),
+    (datetime_utils, 'first_unsnapped', (1, 'period'), (2, 'tzinfo'), None),
+    (epoch, 'floor_epoch', (1, 'period'), (2, 'tzinfo'), None),
+    (epoch, 'ceil_epoch', (1, 'period'), (2, 'tzinfo'), None),
+    (epoch, 'floor_epoch_buffer', (1, 'period'), (2, 'tzinfo'), None),
+    (epoch, 'ceil_epoch_buffer', (1, 'period'), (2, 'tzinfo'), None),
+    (streams, 'bucketize', (1, 'period'), (2, 'tzinfo'), None),
+    (streams, 'watermark_bucketize', (1, 'period'), (2, 'tzinfo'), None),
+    (batch, 'round_many', (1, 'period'), (2, 'tzinfo'), None),
+    (iso, 'floor_iso', (1, 'period'), (2, 'tzinfo'), None),
+    (buckets, 'bucket_id', (1, 'period'), (2, 'tzinfo'), (0, 'dt')),
+    (buckets, 'bucket_start', (1, 'period'), (2, 'tzinfo'), None),
+    (buckets, 'bucket_end', (1, 'period'), (2, 'tzinfo'), None),
+    (windows, 'hopping_windows', (2, 'hop'), (3, 'tzinfo'), (0, 'dt')),
+]
+
+_VECTOR_FUNCTIONS = ['round_datetime_down', 'round_datetime_up', 'round_datetime', 'is_snapped_to']
+
+# ZoneTable methods: to_utc is what localize did, to_local what normalize
+# did, and to_datetime builds the result
+_ZONE_OPERATIONS = ['to_utc', 'to_local', 'to_datetime', 'floor', 'ceil', 'period_end']
+
+_calls = {}
+_latency = {}
+_caches = {}
+_zone_operations = {}
+
+# (owner, attribute, original) of everything enable() replaced
+_patched = []
+
+_settings = {'latency': False, 'sample_every': 1, 'sampled': 0}
+
+
+def _argument(args, kwargs, spec, default=None):
+    position, name = spec
+    if len(args) > position:
+        return args[position]
+    return kwargs.get(name, default)
+
+
+def _period_label(period):
+    return period.name if isinstance(period, Period) else str(period)
+
+
+def _zone_label(tzinfo):
+    if tzinfo is None:
+        return 'naive'
+    return getattr(tzinfo, 'zone', None) or str(tzinfo)
+
+
+def _record_latency(name, seconds):
+    microseconds = seconds * 10 ** 6
+    histogram = _latency.setdefault(name, [0] * (len(LATENCY_BUCKETS) + 1))
+    for index, bound in enumerate(LATENCY_BUCKETS):
+        if microseconds <= bound:
+            break
+    else:
+        index = len(LATENCY_BUCKETS)
+    histogram[index] += 1
+
+
+def _timed():
+    # whether this call is one of the sampled ones
+    if not _settings['latency']:
+        return False
+    _settings['sampled'] += 1
+    return _settings['sampled'] % _settings['sample_every'] == 0
+
+
+def _count_calls(function, name, period_spec, tzinfo_spec, value_spec):
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        if isinstance(period_spec, str):
+            period = period_spec
+        else:
+            period = _period_label(_argument(args, kwargs, period_spec))
+
+        tzinfo = _argument(args, kwargs, tzinfo_spec)
+        if tzinfo is None and value_spec is not None:
+            tzinfo = getattr(_argument(args, kwargs, value_spec), 'tzinfo', None)
+
+        key = (name, period, _zone_label(tzinfo))
+        _calls[key] = _calls.get(key, 0) + 1
+
+        if not _timed():
+            return function(*args, **kwargs)
+        start = timeit.default_timer()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _record_latency(name, timeit.default_timer() - start)
+
+    return wrapper
+
+
+def _count_cache(function, name, cache, passthrough=()):
+    @wraps(function)
+    def wrapper(key):
+        # e.g. a Period handed to Period.get is not looked up
+        if isinstance(key, passthrough):
+            return function(key)
+        stats = _caches.setdefault(name, {'hits': 0, 'misses': 0})
+        try:
+            hit = key in cache
+        except TypeError:
+            hit = False
+        stats['hits' if hit else 'misses'] += 1
+        return function(key)
+
+    return wrapper
+
+
+def _count_zone_operation(function, name):
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        stats = _zone_operations.setdefault(name, {'calls': 0, 'seconds': 0.0})
+        stats['calls'] += 1
+        if not _settings['latency']:
+            return function(*args, **kwargs)
+        start = timeit.default_timer()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            stats['seconds'] += timeit.default_timer() - start
+
+    return wrapper
+
+
+def _patch(owner, attribute, replacement):
+    # a class attribute is put back as it was defined, e.g. as a classmethod
+    original = owner.__dict__[attribute] if isinstance(owner, type) else getattr(owner, attribute)
+    _patched.append((owner, attribute, original))
+    setattr(owner, attribute, replacement)
+
+
+def _patch_function(module, name, wrapper):
+    original = getattr(module, name)
+    _patch(module, name, wrapper)
+
+    # the names the package (and modules importing them) re-export
+    for other in list(sys.modules.values()):
+        if other is not module and getattr(other, '__name__', '').startswith('datetime_utils') and \
+                getattr(other, name, None) is original:
+            _patch(other, name, wrapper)
+
+
+def is_enabled():
+    """
+    Return whether the counters are on.
+    """
+    return bool(_patched)
+
+
+def enable(latency=False, sample_every=1):
+    """
+    Start counting calls, cache lookups and zone conversions.
+
+    :type latency: bool
+    :param latency: If True, also time calls into latency histograms and
+        add up the time spent in zone conversions.
+
+    :type sample_every: int
+    :param sample_every: Time only one call in sample_every.
+    """
+    _settings.update(latency=latency, sample_every=max(1, int(sample_every)), sampled=0)
+    if is_enabled():
+        return
+
+    for module, name, period_spec, tzinfo_spec, value_spec in _FUNCTIONS:
+        _patch_function(module, name, _count_calls(getattr(module, name), name, period_spec, tzinfo_spec, value_spec))
+
+    vector = sys.modules.get('datetime_utils.vector')
+    if vector is not None:  # pragma: no branch
+        for name in _VECTOR_FUNCTIONS:
+            _patch(vector, name, _count_calls(getattr(vector, name), 'vector.' + name, (1, 'period'),
+                                              (2, 'tzinfo'), None))
+
+    _patch(Period, 'get', staticmethod(_count_cache(Period.get, 'periods', Period._cache, Period)))
+    _patch_function(zones, 'get_zone_table', _count_cache(zones.get_zone_table, 'zones', zones._tzinfo_tables))
+
+    for name in _ZONE_OPERATIONS:
+        _patch(zones.ZoneTable, name, _count_zone_operation(getattr(zones.ZoneTable, name), name))
+
+
+def disable():
+    """
+    Stop counting and put the original functions back. The counts so far
+    are kept until :func:`reset`.
+    """
+    while _patched:
+        owner, attribute, original = _patched.pop()
+        setattr(owner, attribute, original)
+
+
+def reset():
+    """
+    Clear every count.
+    """
+    _calls.clear()
+    _latency.clear()
+    _caches.clear()
+    _zone_operations.clear()
+    _settings['sampled'] = 0
+
+
+def snapshot():
+    """
+    Return a copy of the counts so far.
+
+    :rtype: dict
+    :returns: A dict with:
+
+        - ``calls``: {(function, period, zone): calls}, where zone is the
+          zone's name, 'naive' for naive datetimes without a timezone.
+        - ``latency``: {function: {bound: calls}}, the number of timed
+          calls that took at most bound microseconds (and more than the
+          previous bound); the bound of the last bucket is None.
+        - ``caches``: {'periods', 'zones' or 'boundaries': {'hits': n,
+          'misses': n, 'size': n}} for the Period, ZoneTable and boundary
+          caches. The boundary cache keeps its own statistics, which
+          :func:`reset` leaves alone.
+        - ``zone_operations``: {ZoneTable method: {'calls': n, 'seconds':
+          s}}, seconds only being added up with latency on.
+    """
+    bounds = list(LATENCY_BUCKETS) + [None]
+    tables = {'periods': Period._cache, 'zones': zones._tzinfo_tables}
+    caches = dict(
+        (name, dict(_caches.get(name, {'hits': 0, 'misses': 0}), size=len(table)))
+        for name, table in tables.items())
+    boundaries = cache_info()
+    caches['boundaries'] = {'hits': boundaries.hits, 'misses': boundaries.misses, 'size': boundaries.currsize}
+    return {
+        'calls': dict(_calls),
+        'latency': dict(
+            (name, dict(zip(bounds, histogram))) for name, histogram in _latency.items()),
+        'caches': caches,
+        'zone_operations': dict((name, dict(stats)) for name, stats in _zone_operations.items()),
+    }
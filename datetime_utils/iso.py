@@ -0,0 +1,153 @@
+"""
+Rounding of ISO-8601 strings straight to epoch values or strings.
+"""
+from datetime import date, datetime, timedelta
+
+from .epoch import _floor_run, get_unit
+from .periods import DAY, HOUR, MINUTE, SECOND, Period, to_microseconds
+from .zones import EPOCH, get_zone_table
+
+_EPOCH_ORDINAL = EPOCH.toordinal()
+
+OUTPUTS = ('epoch', 'iso', 'datetime')
+
+
+def _parse(string):
+    # datetime.fromisoformat only takes a Z suffix from Python 3.11
+    try:
+        if string[-1:] == 'Z':
+            return datetime.fromisoformat(string[:-1] + '+00:00')
+        return datetime.fromisoformat(string)
+    except (TypeError, ValueError):
+        raise Exception('Unrecognized timestamp: %s' % (string,))
+
+
+def format_offset(offset):
+    """
+    Return a UTC offset in microseconds as datetime.isoformat writes it,
+    e.g. '+05:30'.
+    """
+    sign = '-' if offset < 0 else '+'
+    offset = abs(offset)
+    text = '%s%02d:%02d' % (sign, offset // HOUR, offset // MINUTE % 60)
+    if offset % MINUTE:
+        text += ':%02d' % (offset // SECOND % 60)
+        if offset % SECOND:
+            text += '.%06d' % (offset % SECOND)
+    return text
+
+
+def format_iso(local, offset=None, sep='T'):
+    """
+    Return the wall time local, in microseconds since the Unix epoch, as
+    datetime.isoformat writes it; with a UTC offset (in microseconds) if
+    one is given.
+    """
+    day = date.fromordinal(local // DAY + _EPOCH_ORDINAL)
+    time = local % DAY
+    text = '%04d-%02d-%02d%s%02d:%02d:%02d' % (
+        day.year, day.month, day.day, sep, time // HOUR, time // MINUTE % 60, time // SECOND % 60)
+    if time % SECOND:
+        text += '.%06d' % (time % SECOND)
+    if offset is not None:
+        text += format_offset(offset)
+    return text
+
+
+def floor_iso(strings, period, tzinfo=None, output='epoch', unit='s', force=False):
+    """
+    Round ISO-8601 strings down by 'snapping' them to the period.
+
+    Every string gets what
+    ``round_datetime_down(datetime.fromisoformat(string), period, tzinfo, force)``
+    gets, but the string is only parsed into its fields and worked on as
+    an integer from then on, and the result is only made a datetime if
+    asked for. A Z suffix is UTC, as is a string without an offset.
+
+    :type strings: iterable
+    :param strings: ISO-8601 strings, in any form datetime.fromisoformat
+        takes.
+
+    :type period: str or Period
+    :param period: Options are microsecond, millisecond, second, minute, hour, day, week,
+        month, quarter, year or multiples such as minute-15
+
+    :type tzinfo: tzinfo or str
+    :param tzinfo: A pytz or zoneinfo timezone, a fixed offset or a timezone name. If given, the round will
+        be performed with respect to the timezone. Else it is done in the
+        offset of each string.
+
+    :type output: str
+    :param output: 'epoch' for the start of each period as an epoch value
+        in unit, 'iso' for it as an ISO-8601 string in the offset (and
+        with the date and time separator) of its string, or 'datetime' for
+        the datetime round_datetime_down returns.
+
+    :type unit: str
+    :param unit: 's' (the default), 'ms', 'us' or 'ns', for 'epoch'.
+
+    :type force: bool
+    :param force: A boolean value. If force=True,
+        it causes pre-rounded values to jump another step anyway.
+
+    :rtype: list
+    :returns: The rounded values.
+
+    :raises: Exception if a string is not a timestamp, or the period,
+        output or unit is not supported
+
+    .. code-block:: python
+
+        >>> from datetime_utils import floor_iso
+        >>> floor_iso(['2013-04-05T02:33:00', '2013-04-05T19:10:00Z'], 'day', 'America/Los_Angeles')
+        [1365058800, 1365145200]
+        >>> floor_iso(['2013-04-05 02:33:00-07:00'], 'hour', output='iso')
+        ['2013-04-05 02:00:00-07:00']
+    """
+    period = Period.get(period)
+    if output not in OUTPUTS:
+        raise Exception('Unrecognized output: %s' % output)
+    multiplier, divisor = get_unit(unit)
+    shift = 1 if force else 0
+
+    if tzinfo:
+        zone = get_zone_table(tzinfo)
+        floor = period.floor_us if zone.fixed else _floor_run(zone, period)
+        fixed = zone.offsets[0] if zone.fixed else 0
+    else:
+        zone = None
+
+    # (start, offset or None if naive, separator) -> the formatted start, for iso and datetime
+    formatted = {}
+    floor_us = period.floor_us
+    rounded = []
+    for string in strings:
+        dt = _parse(string)
+        # wall_microseconds, inlined
+        local = ((dt.toordinal() - _EPOCH_ORDINAL) * 86400 + dt.hour * 3600 + dt.minute * 60 + dt.second) * SECOND + \
+            dt.microsecond - shift
+        aware = dt.tzinfo is not None
+        offset = to_microseconds(dt.utcoffset()) if aware else 0
+
+        if zone is None:
+            # in the offset of the string, naive strings in UTC
+            start = floor_us(local) - offset
+        else:
+            start = floor(local - offset + fixed) - fixed
+
+        if output == 'epoch':
+            rounded.append(start * divisor // multiplier)
+            continue
+
+        key = (start, offset if aware else None, ' ' if string[10:11] == ' ' else 'T')
+        value = formatted.get(key)
+        if value is None:
+            if output == 'iso':
+                value = format_iso(start + offset, offset if aware else None, key[2])
+            else:
+                value = EPOCH + timedelta(microseconds=start + offset)
+                if aware:
+                    value = value.replace(tzinfo=dt.tzinfo)
+            formatted[key] = value
+        rounded.append(value)
+    return rounded
@@ -0,0 +1,332 @@
+from array import array
+from bisect import bisect_right
+from datetime import date, timedelta
+from numbers import Integral
+
+# lengths in microseconds, the unit of the integer arithmetic below
+MILLISECOND = 1000
+SECOND = 10 ** 6
+MINUTE = 60 * SECOND
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+WEEK = 7 * DAY
+
+# The Unix epoch was a Thursday, three days after the Monday weeks start on.
+_WEEK_ANCHOR = 3 * DAY
+
+# calendar units -> the number of months in one
+_MONTHS = {'month': 1, 'quarter': 3, 'year': 12}
+
+# January 1970 in months since January of year 0
+_EPOCH_MONTHS = 1970 * 12
+
+# the start of every month from 0001-01 to 10000-01 (the end of the last
+# month a datetime can be in), as wall times in microseconds since the
+# Unix epoch; built the first time a calendar period is used
+_month_starts = []
+_month_starts_array = []
+
+
+def month_starts():
+    """
+    Return the calendar table of month starts, an array('q').
+    """
+    if not _month_starts:
+        lengths = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+        starts = array('q')
+        day = 1 - date(1970, 1, 1).toordinal()
+        for year in range(1, 10000):
+            leap = year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+            for month, length in enumerate(lengths):
+                starts.append(day * DAY)
+                day += 29 if leap and month == 1 else length
+        starts.append(day * DAY)
+        _month_starts.append(starts)
+    return _month_starts[0]
+
+
+def _month_starts_numpy():
+    # the same table as a numpy array, for the vector functions
+    if not _month_starts_array:
+        import numpy
+        _month_starts_array.append(numpy.frombuffer(month_starts(), dtype=numpy.int64))
+    return _month_starts_array[0]
+
+
+def to_microseconds(td):
+    """
+    Return a timedelta as an integer number of microseconds.
+    """
+    return (td.days * 86400 + td.seconds) * SECOND + td.microseconds
+
+
+def parse_period(period):
+    """
+    Parse a 'period' out to it's two parts
+
+    >>> parse_period('minute-15')
+    ('minute', 15)
+    >>> parse_period('day')
+    ('day', 1)
+    """
+    parts = period.split('-')
+    unit = parts[0]
+    quantity = int((parts + ['1'])[1])
+    return (unit, quantity)
+
+
+def format_period(unit, quantity):
+    """
+    Return the canonical name of a period, the inverse of parse_period.
+
+    >>> format_period('minute', 15)
+    'minute-15'
+    >>> format_period('day', 1)
+    'day'
+    """
+    if quantity == 1:
+        return unit
+    return '%s-%d' % (unit, quantity)
+
+
+def get_isoweek_monday(dt):
+    # if it's a week we want to find the iso-week's monday
+    return dt - timedelta(days=dt.weekday())
+
+
+# unit -> (length, field) in microseconds, where field is the next
+# smaller unit. A period rounds down while the fields since its start are
+# at most half of it, e.g. up to 30 seconds into a minute and up to 90
+# minutes into hour-3.
+_UNITS = {
+    'microsecond': (1, 1),
+    'millisecond': (MILLISECOND, 1),
+    'second': (SECOND, MILLISECOND),
+    'minute': (MINUTE, SECOND),
+    'hour': (HOUR, MINUTE),
+    'day': (DAY, HOUR),
+    'week': (WEEK, DAY),
+}
+
+# (unit, quantity) -> rounds_down, compiled by _dispatch the first time a
+# period is used. rounds_down is (shift, modulus, divisor, threshold): a
+# time t rounds down when (t + shift) % modulus // divisor <= threshold.
+_DISPATCH = {
+    # these have always rounded down up to Friday and up to 7:59
+    ('week', 1): (_WEEK_ANCHOR, WEEK, DAY, 4),
+    ('minute', 15): (0, 15 * MINUTE, MINUTE, 7),
+}
+
+
+def _dispatch(unit, quantity):
+    """
+    Return the rounds_down of a period, None for calendar periods.
+    """
+    try:
+        return _DISPATCH[unit, quantity]
+    except KeyError:
+        pass
+
+    if unit in _MONTHS:
+        return None
+
+    length, field = _UNITS[unit]
+    step = length * quantity
+    shift = _WEEK_ANCHOR if unit == 'week' else 0
+    rounds_down = _DISPATCH[unit, quantity] = (shift, step, field, step // field // 2)
+    return rounds_down
+
+
+class Period(object):
+    """
+    A rounding period such as 'minute-15' or 'day', parsed once.
+
+    Use :meth:`Period.get` rather than the constructor so that every
+    period string is only parsed the first time it is seen. A Period is
+    accepted anywhere a period string is. 'month', 'quarter' and 'year'
+    give a :class:`CalendarPeriod`.
+
+    A period is a unit ('microsecond', 'millisecond', 'second', 'minute',
+    'hour', 'day', 'week', 'month', 'quarter' or 'year') or a multiple of
+    one, such as 'millisecond-100' or 'hour-6'. Multiples are counted from
+    these starts, in wall time:
+
+    - microseconds to days from the Unix epoch, 1970-01-01 00:00. A
+      multiple that divides the next unit starts with it, e.g. 'minute-5'
+      at every hour and 'hour-6' at midnight, while 'minute-7' or 'day-7'
+      run on regardless.
+    - weeks from Monday 1969-12-29, so 'week' starts on Mondays.
+    - months, quarters and years from January of year 0, so 'month-2'
+      starts in odd months, 'quarter-2' in January and July and 'year-10'
+      in 2010, 2020 and so on. Periods before year 1 start at year 1.
+
+    .. code-block:: python
+
+        >>> from datetime_utils import Period
+        >>> period = Period.get('minute-15')
+        >>> period.unit, period.quantity, period.timedelta
+        ('minute', 15, datetime.timedelta(seconds=900))
+        >>> Period.get('minute-15') is period
+        True
+    """
+
+    _cache = {}
+
+    def __init__(self, name):
+        try:
+            key = parse_period(name)
+        except (AttributeError, ValueError):
+            key = None
+
+        # only the canonical spelling is accepted, not e.g. 'day-1' or 'minute-015'
+        if key is None or key[0] not in _UNITS and key[0] not in _MONTHS or key[1] < 1 or \
+                name != format_period(*key):
+            raise Exception('Unrecognized period: %s' % name)
+
+        self.name = name
+        self.unit, self.quantity = key
+        self.anchor = _WEEK_ANCHOR if self.unit == 'week' else 0
+        self._rounds_down_us = _dispatch(*key)
+
+        if self.unit in _MONTHS:
+            # months vary in length, step is the longest the period can be
+            self.months = _MONTHS[self.unit] * self.quantity
+            self.timedelta = None
+            self.step = self.months * 31 * DAY
+        else:
+            self.timedelta = timedelta(**{self.unit + 's': self.quantity})
+            # the length of the period in microseconds
+            self.step = to_microseconds(self.timedelta)
+
+    @classmethod
+    def get(cls, period):
+        """
+        Return the cached Period for a period string (or the Period itself).
+
+        :raises: Exception if the period is not supported
+        """
+        if isinstance(period, Period):
+            return period
+
+        try:
+            return cls._cache[period]
+        except KeyError:
+            pass
+        except TypeError:
+            raise Exception('Unrecognized period: %s' % (period,))
+
+        try:
+            calendar = period.split('-')[0] in _MONTHS
+        except AttributeError:
+            raise Exception('Unrecognized period: %s' % (period,))
+
+        instance = cls._cache[period] = (CalendarPeriod if calendar else cls)(period)
+        return instance
+
+    def __repr__(self):
+        return 'Period(%r)' % self.name
+
+    # The *_us methods work on integer microseconds since the Unix epoch,
+    # either plain ints or numpy arrays of them.
+
+    def floor_us(self, t):
+        """
+        Return the start of the period containing the wall time t.
+        """
+        return t - (t + self.anchor) % self.step
+
+    def next_us(self, t):
+        """
+        Return the start of the period after the one containing the wall
+        time t.
+        """
+        return self.floor_us(t) + self.step
+
+    def rounds_down_us(self, t):
+        """
+        Return True where round_datetime should round the wall time t down.
+        """
+        shift, modulus, divisor, threshold = self._rounds_down_us
+        return (t + shift) % modulus // divisor <= threshold
+
+    def snap_key_us(self, t):
+        """
+        Return the key of the wall time t that is_snapped compares: the
+        start of its period, which changes exactly at the boundaries.
+        """
+        return self.floor_us(t)
+
+    def index_us(self, t):
+        """
+        Return the number of the period containing the wall time t,
+        counted from the one containing 1970-01-01 00:00, which is 0.
+        """
+        return (t + self.anchor) // self.step
+
+    def start_us(self, index):
+        """
+        Return the start of the period numbered index, the inverse of
+        index_us.
+        """
+        return index * self.step - self.anchor
+
+
+class CalendarPeriod(Period):
+    """
+    A period of whole months ('month', 'quarter' or 'year'), which vary
+    in length. The boundaries are looked up in the month_starts table.
+
+    Its timedelta is None, and its step the longest it can be, for uses
+    that only need a bound.
+    """
+
+    def _index(self, t):
+        # the index in month_starts of the start of the period containing
+        # t; month_starts begins with January of year 1, 12 months after
+        # the periods are counted from, and an index below 0 is a period
+        # that starts before year 1
+        if isinstance(t, Integral):
+            index = max(0, bisect_right(month_starts(), t) - 1)
+            return index - (index + 12) % self.months, month_starts()
+
+        import numpy
+        starts = _month_starts_numpy()
+        index = numpy.maximum(numpy.searchsorted(starts, t, side='right') - 1, 0)
+        return index - (index + 12) % self.months, starts
+
+    def floor_us(self, t):
+        index, starts = self._index(t)
+        if isinstance(t, Integral):
+            return starts[max(index, 0)]
+        import numpy
+        return starts[numpy.maximum(index, 0)]
+
+    def next_us(self, t):
+        # the last entry, 10000-01, is the end of every period past it
+        index, starts = self._index(t)
+        if isinstance(t, Integral):
+            return starts[min(index + self.months, len(starts) - 1)]
+        import numpy
+        return starts[numpy.minimum(index + self.months, len(starts) - 1)]
+
+    def rounds_down_us(self, t):
+        """
+        Return True where round_datetime should round the wall time t
+        down: up to and including the middle of the period.
+        """
+        return 2 * t <= self.floor_us(t) + self.next_us(t)
+
+    def index_us(self, t):
+        index, _ = self._index(t)
+        # index + 12 months since January of year 0, which is a start
+        return (index + 12) // self.months - _EPOCH_MONTHS // self.months
+
+    def start_us(self, index):
+        # the periods before year 1 start at year 1 and past 10000-01 at 10000-01
+        index = (index + _EPOCH_MONTHS // self.months) * self.months - 12
+        starts = month_starts()
+        if isinstance(index, Integral):
+            return starts[min(max(index, 0), len(starts) - 1)]
+        import numpy
+        starts = _month_starts_numpy()
+        return starts[numpy.clip(index, 0, len(starts) - 1)]
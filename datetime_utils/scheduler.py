@@ -0,0 +1,257 @@
+"""
+An asyncio scheduler for jobs that run on period boundaries.
+
+Every job runs at the boundaries round_datetime_up gives for its period
+and timezone, e.g. on every quarter hour or at every midnight in New
+York. Jobs with the same period and timezone form a group whose next
+boundary is computed once, from the boundary before rather than from
+when the job last woke up, so nothing drifts. The groups are kept in
+slots keyed by the UTC instant of their next boundary, and all the jobs
+in the slots due at an instant run on one wakeup, however many there
+are and whichever zones they are in.
+
+Boundaries are found with the zone's offset history, so a day across a
+DST change is 23 or 25 hours long and a boundary at a wall time that
+does not exist moves to when the clocks allow, as iter_periods has them.
+
+The clock and the sleep function can be replaced, for example by a fake
+clock in tests. This module needs Python 3.7 and imports asyncio, which
+is why it is not imported with datetime_utils.
+
+.. code-block:: python
+
+    >>> import asyncio
+    >>> from datetime_utils.scheduler import Scheduler
+    >>> scheduler = Scheduler()
+    >>> job = scheduler.add(print, 'minute-15', 'America/New_York')
+    >>> asyncio.run(scheduler.run())  # doctest: +SKIP
+    2013-04-05 02:45:00-04:00
+    2013-04-05 03:00:00-04:00
+"""
+import asyncio
+import heapq
+import time
+from datetime import timedelta
+
+from .periods import SECOND, Period
+from .zones import EPOCH, UTC, get_zone_table
+
+# the longest the scheduler sleeps for at once, in seconds, so that it
+# notices when the wall clock is changed
+MAX_SLEEP = 60
+
+
+class Job(object):
+    """
+    A callback the scheduler runs at every boundary of a period.
+    """
+
+    __slots__ = ('callback', '_group')
+
+    def __init__(self, callback, group):
+        self.callback = callback
+        self._group = group
+
+    @property
+    def period(self):
+        return self._group.period
+
+    @property
+    def tzinfo(self):
+        return self._group.tzinfo
+
+    def cancel(self):
+        """
+        Stop running the job. Cancelling it again does nothing.
+        """
+        self._group.jobs.pop(self, None)
+
+
+class _Group(object):
+    """
+    The jobs with the same period and timezone, and the UTC instant of
+    their next boundary in microseconds since the Unix epoch.
+    """
+
+    __slots__ = ('zone', 'period', 'tzinfo', 'jobs', 'next')
+
+    def __init__(self, zone, period, tzinfo):
+        self.zone = zone
+        self.period = period
+        self.tzinfo = tzinfo
+        # job -> None, a set that keeps the order jobs were added in
+        self.jobs = {}
+        self.next = None
+
+    def boundary(self):
+        # the boundary as the datetime the jobs are given: naive UTC
+        # without a timezone, else aware in it
+        if self.tzinfo is None:
+            return EPOCH + timedelta(microseconds=self.next)
+        return self.zone.to_datetime(self.next)
+
+
+class Scheduler(object):
+    """
+    Runs jobs on period boundaries, sharing one wakeup per boundary.
+
+    :type clock: callable
+    :param clock: Returns the current time in seconds since the Unix
+        epoch, time.time by default.
+
+    :type sleep: coroutine function
+    :param sleep: Sleeps for a number of seconds, asyncio.sleep by default.
+
+    :type max_sleep: float
+    :param max_sleep: The longest the scheduler sleeps for at once, in
+        seconds.
+
+    ticks counts the wakeups that ran jobs.
+    """
+
+    def __init__(self, clock=time.time, sleep=asyncio.sleep, max_sleep=MAX_SLEEP):
+        self.clock = clock
+        self.sleep = sleep
+        self.max_sleep = max_sleep
+        self.ticks = 0
+        # (zone table, period name, naive) -> _Group
+        self._groups = {}
+        # boundary -> the groups due at it, and a heap of those boundaries
+        self._slots = {}
+        self._heap = []
+        self._tasks = set()
+        self._waker = None
+        self._stopped = False
+
+    def _now(self):
+        return int(round(self.clock() * SECOND))
+
+    def add(self, callback, period, tzinfo=None):
+        """
+        Run callback at every boundary of period from now on.
+
+        callback is called with the boundary, a naive UTC datetime if
+        tzinfo is None and else an aware datetime in tzinfo. If it returns
+        a coroutine, that is run as a task so that it does not hold up the
+        other jobs. If now is on a boundary, the job is run at once.
+
+        :type period: str or Period
+        :param period: Options are microsecond, millisecond, second, minute, hour, day, week,
+            month, quarter, year or multiples such as minute-15
+
+        :type tzinfo: tzinfo or str
+        :param tzinfo: A pytz or zoneinfo timezone, a fixed offset or a timezone name. If given, the
+            boundaries are those of the timezone, else those of UTC.
+
+        :rtype: Job
+        """
+        period = Period.get(period)
+        zone = get_zone_table(tzinfo or UTC)
+        key = (zone, period.name, tzinfo is None)
+
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = _Group(zone, period, tzinfo)
+            self._schedule(group, zone.ceil(self._now(), period))
+
+        job = Job(callback, group)
+        group.jobs[job] = None
+        return job
+
+    def _schedule(self, group, boundary):
+        group.next = boundary
+        slot = self._slots.get(boundary)
+        if slot is None:
+            slot = self._slots[boundary] = []
+            heapq.heappush(self._heap, boundary)
+        slot.append(group)
+        self._wake()
+
+    def _wake(self):
+        if self._waker is not None and not self._waker.done():
+            self._waker.set_result(None)
+
+    def stop(self):
+        """
+        Make run return, once the jobs due now have been started.
+        """
+        self._stopped = True
+        self._wake()
+
+    async def run(self):
+        """
+        Run the jobs until stop is called.
+
+        Boundaries that passed while the scheduler was held up are skipped:
+        each group runs once for the latest of them and then carries on
+        from the next boundary after now.
+        """
+        self._stopped = False
+        while not self._stopped:
+            now = self._now()
+            if self._heap and self._heap[0] <= now:
+                self._tick(heapq.heappop(self._heap))
+                continue
+
+            delay = self.max_sleep
+            if self._heap:
+                delay = min(delay, (self._heap[0] - now) / float(SECOND))
+            await self._wait(delay)
+
+    async def _wait(self, delay):
+        # sleep for delay seconds, or until a job is added or stop is called
+        self._waker = asyncio.get_running_loop().create_future()
+        sleeper = asyncio.ensure_future(self.sleep(delay))
+        try:
+            await asyncio.wait([sleeper, self._waker], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            sleeper.cancel()
+            self._waker = None
+
+    def _tick(self, boundary):
+        self.ticks += 1
+        for group in self._slots.pop(boundary):
+            if not group.jobs:
+                # every job was cancelled; a new one starts a new group
+                del self._groups[group.zone, group.period.name, group.tzinfo is None]
+                continue
+
+            # the jobs run once for the latest boundary that has passed
+            now = self._now()
+            latest = group.zone.floor(now, group.period)
+            if latest > group.next:
+                group.next = latest
+            dt = group.boundary()
+            for job in list(group.jobs):
+                self._run(job, dt)
+
+            following = group.zone.ceil(group.next, group.period, force=True)
+            now = self._now()
+            if following <= now:
+                following = group.zone.ceil(now, group.period, force=True)
+            self._schedule(group, following)
+
+    def _run(self, job, dt):
+        try:
+            result = job.callback(dt)
+        except Exception as e:
+            self._report(job, e)
+            return
+
+        if asyncio.iscoroutine(result):
+            task = asyncio.ensure_future(result)
+            self._tasks.add(task)
+            task.add_done_callback(lambda task: self._done(job, task))
+
+    def _done(self, job, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self._report(job, task.exception())
+
+    def _report(self, job, exception):
+        # an exception in one job must not stop the others
+        asyncio.get_event_loop().call_exception_handler({
+            'message': 'Exception in scheduled job %r' % (job.callback,),
+            'exception': exception,
+            'job': job,
+        })
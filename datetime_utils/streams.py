@@ -0,0 +1,225 @@
+"""
+Grouping of timestamp streams into periods.
+"""
+import heapq
+from datetime import timedelta
+from itertools import count
+
+from .buckets import end_us
+from .datetime_utils import round_datetime_down
+from .periods import Period, to_microseconds
+from .windows import _utc
+from .zones import EPOCH, get_zone_table, wall_microseconds
+
+
+def _period_end(dt, period, tzinfo):
+    """
+    Return the first datetime after dt whose round_datetime_down differs
+    from dt's, as something dt can be compared with.
+
+    When dt is aware and rounded in its own timezone (tzinfo is None) the
+    period is one of wall times, and the end only holds for datetimes
+    with the same tzinfo; that tzinfo is returned too, else None.
+    """
+    org_tz = dt.tzinfo
+    local = wall_microseconds(dt)
+
+    if tzinfo:
+        if org_tz:
+            local -= to_microseconds(dt.utcoffset())
+        end = get_zone_table(tzinfo).period_end(local, period)
+    else:
+        end = period.next_us(local)
+        if org_tz:
+            return (EPOCH + timedelta(microseconds=end)).replace(tzinfo=org_tz), org_tz
+
+    if org_tz:
+        return get_zone_table(org_tz).to_datetime(end), None
+    return EPOCH + timedelta(microseconds=end), None
+
+
+def bucketize(iterable, period, tzinfo=None, key=None):
+    """
+    Group a sorted stream of datetimes (or of items with a datetime key)
+    into the periods they fall in.
+
+    This yields the same groups as
+    ``itertools.groupby(iterable, lambda item: round_datetime_down(key(item), period, tzinfo))``,
+    but only rounds an item when it is past the end of the current
+    period, so that every other item costs a comparison. Only the items
+    of the current period are held in memory.
+
+    :type iterable: iterable
+    :param iterable: Items sorted by their datetime.
+
+    :type period: str or Period
+    :param period: Options are microsecond, millisecond, second, minute, hour, day, week,
+        month, quarter, year or multiples such as minute-15
+
+    :type tzinfo: tzinfo or str
+    :param tzinfo: A pytz or zoneinfo timezone, a fixed offset or a timezone name. If given, the periods are
+        those of the timezone.
+
+    :type key: callable
+    :param key: Returns the datetime of an item. By default the items
+        are the datetimes.
+
+    :rtype: generator
+    :returns: (bucket_start, items) pairs, where bucket_start is the
+        round_datetime_down of every item in the list items.
+
+    .. code-block:: python
+
+        >>> import datetime
+        >>> from datetime_utils import bucketize
+        >>> events = [datetime.datetime(2013, 4, 5, 2, 10), datetime.datetime(2013, 4, 5, 2, 40),
+        ...           datetime.datetime(2013, 4, 5, 4, 5)]
+        >>> for start, items in bucketize(events, 'hour'):
+        ...     print(start, len(items))
+        2013-04-05 02:00:00 2
+        2013-04-05 04:00:00 1
+    """
+    period = Period.get(period)
+
+    started = False
+    start = items = lower = upper = wall_tzinfo = None
+
+    for item in iterable:
+        value = item if key is None else key(item)
+
+        if started and lower <= value < upper and (wall_tzinfo is None or value.tzinfo is wall_tzinfo):
+            items.append(item)
+            continue
+
+        value_start = round_datetime_down(value, period, tzinfo)
+        if not started or value_start != start:
+            if started:
+                yield start, items
+            started = True
+            start, items = value_start, []
+
+        items.append(item)
+        lower = value
+        upper, wall_tzinfo = _period_end(value, period, tzinfo)
+
+    if started:
+        yield start, items
+
+
+def _bucket_key(value, utc, period, zone):
+    # the period of value in zone, or if zone is None in its own timezone as
+    # round_datetime_down has it, with the zone table of that timezone
+    if zone is None:
+        zone = get_zone_table(value.tzinfo) if value.tzinfo else None
+        return period.index_us(wall_microseconds(value)), zone
+    return period.index_us(zone.to_local(utc)[0]), zone
+
+
+def watermark_bucketize(iterable, period, tzinfo=None, lateness=timedelta(0), key=None, late=None):
+    """
+    Group a stream of datetimes (or of items with a datetime key) that is
+    only roughly sorted into the periods they fall in.
+
+    The watermark is the latest datetime seen so far less lateness. A
+    period is yielded, with its items in the order they came, as soon as
+    the watermark reaches its end, and the periods are yielded in the
+    order they end. An item that comes after the watermark has passed its
+    period's end is late: it is given to late rather than grouped. So an
+    item at most lateness behind the latest one is never late, and with
+    lateness 0 a sorted stream is grouped as bucketize groups it. Only
+    the items of the periods still open are held in memory, which is
+    those within lateness of the latest item, however long the stream.
+
+    :type iterable: iterable
+    :param iterable: Items roughly sorted by their datetime.
+
+    :type period: str or Period
+    :param period: Options are microsecond, millisecond, second, minute, hour, day, week,
+        month, quarter, year or multiples such as minute-15
+
+    :type tzinfo: tzinfo or str
+    :param tzinfo: A pytz or zoneinfo timezone, a fixed offset or a timezone name. If given, the periods are
+        those of the timezone.
+
+    :type lateness: timedelta
+    :param lateness: How far the watermark is behind the latest datetime.
+
+    :type key: callable
+    :param key: Returns the datetime of an item. By default the items
+        are the datetimes.
+
+    :type late: callable
+    :param late: Called with every late item, e.g. the append of a list.
+        By default late items are dropped.
+
+    :rtype: generator
+    :returns: (bucket_start, items) pairs, where bucket_start is the
+        round_datetime_down of the first item in the list items, and that
+        of all of them.
+
+    .. code-block:: python
+
+        >>> import datetime
+        >>> from datetime_utils import watermark_bucketize
+        >>> events = [datetime.datetime(2013, 4, 5, 2, 40), datetime.datetime(2013, 4, 5, 3, 5),
+        ...           datetime.datetime(2013, 4, 5, 2, 55), datetime.datetime(2013, 4, 5, 4, 30),
+        ...           datetime.datetime(2013, 4, 5, 3, 50), datetime.datetime(2013, 4, 5, 2, 10)]
+        >>> dropped = []
+        >>> for start, items in watermark_bucketize(events, 'hour', lateness=datetime.timedelta(minutes=15),
+        ...                                         late=dropped.append):
+        ...     print(start, len(items))
+        2013-04-05 02:00:00 2
+        2013-04-05 03:00:00 1
+        2013-04-05 04:00:00 1
+        >>> print(', '.join(str(dt) for dt in dropped))
+        2013-04-05 03:50:00, 2013-04-05 02:10:00
+    """
+    period = Period.get(period)
+    lateness = to_microseconds(lateness)
+    zone = get_zone_table(tzinfo) if tzinfo else None
+
+    # (bucket, zone table) -> (bucket_start, items) of the open periods,
+    # and a heap of their (end, order opened, key)
+    buckets = {}
+    ends = []
+    opened = count()
+    watermark = None
+    # the UTC instants from the first item of the latest period opened to
+    # the end of its wall time period, and the items of that period, which
+    # the items in between go to without a lookup
+    run = (0, 0, None)
+
+    for item in iterable:
+        value = item if key is None else key(item)
+        utc = _utc(value)
+
+        if run[0] <= utc < run[1] and (tzinfo or value.tzinfo is None):
+            run[2].append(item)
+        else:
+            bucket_key = _bucket_key(value, utc, period, zone)
+            bucket_zone = bucket_key[1]
+
+            entry = buckets.get(bucket_key)
+            if entry is None:
+                end = end_us(bucket_zone, period, bucket_key[0])
+                if watermark is not None and end <= watermark:
+                    if late is not None:
+                        late(item)
+                    continue
+                entry = buckets[bucket_key] = (round_datetime_down(value, period, tzinfo), [])
+                heapq.heappush(ends, (end, next(opened), bucket_key))
+                if tzinfo:
+                    run = (utc, zone.period_end(utc, period), entry[1])
+                elif bucket_zone is None:
+                    run = (utc, period.next_us(utc), entry[1])
+            entry[1].append(item)
+
+        if watermark is None or utc - lateness > watermark:
+            watermark = utc - lateness
+            if ends and ends[0][0] <= watermark:
+                run = (0, 0, None)
+                while ends and ends[0][0] <= watermark:
+                    yield buckets.pop(heapq.heappop(ends)[2])
+
+    while ends:
+        yield buckets.pop(heapq.heappop(ends)[2])
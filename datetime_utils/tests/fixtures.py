@@ -0,0 +1,77 @@
+"""
+Timezones and sample datetimes shared by the test modules.
+"""
+from datetime import datetime, timedelta
+
+import pytz
+
+EPOCH = datetime(1970, 1, 1)
+
+PERIODS = ['minute', 'minute-15', 'hour', 'day', 'week', 'month', 'quarter', 'year']
+
+ZONES = [
+    None,
+
+    pytz.UTC,
+
+    # UTC/GMT -2:30 hours, and a fixed -5 hours
+    pytz.FixedOffset(-150),
+    pytz.timezone('Etc/GMT+5'),
+
+    # UTC/GMT +5:30 hours
+    pytz.timezone('Asia/Kolkata'),
+
+    # UTC/GMT -3:30 hours
+    # Transition from 2015-03-08 02:00:00 -> 03:00:00
+    # Transition from 2015-11-01 02:00:00 -> 01:00:00
+    pytz.timezone('Canada/Newfoundland'),
+
+    # UTC/GMT -3 hours
+    # Transition from 2015-02-22 24:00:00 -> 23:00:00
+    # Transition from 2015-10-18 00:00:00 -> 01:00:00 (midnight doesn't exist)
+    pytz.timezone('America/Sao_Paulo'),
+
+    # UTC/GMT +2 hours
+    # Transition from 2015-03-27 00:00:00 -> 01:00:00 (midnight doesn't exist)
+    # Transition from 2015-10-30 01:00:00 -> 00:00:00 (midnight exists twice)
+    pytz.timezone('Asia/Amman'),
+
+    # UTC/GMT -8 hours
+    # Transition from 2015-11-01 02:00:00 -> 01:00:00
+    pytz.timezone('America/Los_Angeles'),
+
+    # UTC/GMT +10:30 hours
+    # Transition from 2016-04-03 02:00:00 -> 01:30:00 (a half hour change)
+    pytz.timezone('Australia/Lord_Howe'),
+]
+
+# the transitions above, in UTC
+TRANSITIONS = [
+    datetime(2015, 2, 22, 2),
+    datetime(2015, 3, 8, 5, 30),
+    datetime(2015, 3, 26, 22),
+    datetime(2015, 10, 18, 3),
+    datetime(2015, 10, 29, 22),
+    datetime(2015, 11, 1, 4, 30),
+    datetime(2015, 11, 1, 9),
+    datetime(2016, 4, 2, 15),
+]
+
+
+def sample_datetimes():
+    """
+    Sorted naive UTC datetimes around each transition, some of them on
+    boundaries.
+    """
+    samples = set()
+    for transition in TRANSITIONS:
+        start = transition - timedelta(hours=30)
+        for step in range(0, 60 * 60, 53):
+            samples.add(start + timedelta(minutes=step, seconds=step % 60))
+        for step in range(0, 60 * 4, 5):
+            samples.add(start + timedelta(minutes=15 * step))
+    return sorted(samples)
+
+
+def to_seconds(dt):
+    return int((dt - EPOCH).total_seconds())
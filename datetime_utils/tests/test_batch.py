@@ -0,0 +1,75 @@
+"""
+Tests for round_many.
+"""
+import multiprocessing
+from datetime import datetime, timedelta
+from unittest import TestCase, main
+
+import pytz
+
+from datetime_utils import batch, round_many
+from datetime_utils.datetime_utils import round_datetime, round_datetime_down, round_datetime_up
+
+from .fixtures import sample_datetimes
+
+
+class TestRoundMany(TestCase):
+    tz = pytz.timezone('America/Sao_Paulo')
+
+    def setUp(self):
+        self.threshold = batch.PARALLEL_THRESHOLD
+        samples = sample_datetimes()[::5]
+        self.values = samples + [self.tz.normalize(pytz.UTC.localize(dt)) for dt in samples]
+
+    def tearDown(self):
+        batch.PARALLEL_THRESHOLD = self.threshold
+
+    def expected(self, function, period, tzinfo, force=False):
+        return [function(dt, period, tzinfo, force) for dt in self.values]
+
+    def test_in_process(self):
+        for mode, function in (('floor', round_datetime_down), ('ceil', round_datetime_up),
+                               ('nearest', round_datetime)):
+            for tzinfo in (None, self.tz):
+                self.assertEqual(round_many(self.values, 'hour', tzinfo, mode), self.expected(function, 'hour', tzinfo))
+        self.assertEqual(round_many(iter(self.values), 'day', self.tz, 'ceil', force=True),
+                         self.expected(round_datetime_up, 'day', self.tz, True))
+
+    def test_sub_second(self):
+        values = [dt + timedelta(microseconds=i * 7919) for i, dt in enumerate(self.values)]
+        for period in ('millisecond-100', 'microsecond-250'):
+            self.assertEqual(round_many(values, period, self.tz, 'nearest'),
+                             [round_datetime(dt, period, self.tz) for dt in values])
+
+    def test_pool(self):
+        batch.PARALLEL_THRESHOLD = 10
+        results = round_many(self.values, 'minute-15', self.tz, 'nearest', workers=3)
+        self.assertEqual(results, self.expected(round_datetime, 'minute-15', self.tz))
+        self.assertEqual([str(dt.tzinfo) for dt in results],
+                         [str(dt.tzinfo) for dt in self.expected(round_datetime, 'minute-15', self.tz)])
+
+    def test_default_workers(self):
+        batch.PARALLEL_THRESHOLD = 10
+        self.assertEqual(round_many(self.values[:20], 'day'), self.expected(round_datetime_down, 'day', None)[:20])
+
+    def test_small_inputs_stay_in_process(self):
+        pool = multiprocessing.Pool
+        multiprocessing.Pool = None
+        try:
+            self.assertEqual(round_many([datetime(2013, 4, 5, 2, 33)], 'hour', workers=4),
+                             [datetime(2013, 4, 5, 2)])
+            batch.PARALLEL_THRESHOLD = 1
+            self.assertEqual(round_many([datetime(2013, 4, 5, 2, 33)], 'hour', workers=1),
+                             [datetime(2013, 4, 5, 2)])
+        finally:
+            multiprocessing.Pool = pool
+
+    def test_invalid(self):
+        with self.assertRaises(Exception):
+            round_many(self.values, 'hour', mode='up')
+        with self.assertRaises(Exception):
+            round_many(self.values, 'fortnight')
+
+
+if __name__ == '__main__':
+    main()
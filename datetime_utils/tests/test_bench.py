@@ -0,0 +1,93 @@
+"""
+Tests for the benchmarks.
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+from unittest import TestCase, main
+
+from datetime_utils import bench
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+class TestBench(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.stdout, sys.stdout = sys.stdout, StringIO()
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+        shutil.rmtree(self.directory)
+
+    def run_main(self, *args):
+        return bench.main(['--samples', '3', '--repeat', '1'] + list(args))
+
+    def test_run_benchmarks(self):
+        results = bench.run_benchmarks(bench.SAMPLES[:3], repeat=1, pattern='/Asia/Amman/')
+
+        self.assertIn('round_datetime_up/scalar/Asia/Amman/week', results)
+        self.assertIn('iter_periods/batch/Asia/Amman/minute', results)
+        self.assertIn('is_snapped_to/scalar/Asia/Amman/week', results)
+        self.assertNotIn('round_datetime_up/scalar/naive/week', results)
+
+    def test_backends(self):
+        results = bench.run_benchmarks(bench.SAMPLES[:3], repeat=1, pattern='/hour')
+
+        for backend, zone_name, tzinfo in bench.BACKEND_ZONES:
+            self.assertIn('round_datetime/%s/%s/hour' % (backend, zone_name), results)
+        self.assertIn('round_datetime/pytz/America/Sao_Paulo/hour', results)
+        self.assertNotIn('round_datetime/pytz/America/Sao_Paulo/day', results)
+
+    def test_json_and_baseline(self):
+        path = os.path.join(self.directory, 'results.json')
+        self.assertEqual(self.run_main('--filter', 'round_datetime_down/scalar/UTC', '--json', path), 0)
+
+        with open(path) as f:
+            saved = json.load(f)
+        self.assertEqual(sorted(saved['results']), ['round_datetime_down/scalar/UTC/%s' % period
+                                                    for period in sorted(bench.PERIODS)])
+
+        self.assertEqual(self.run_main('--filter', 'round_datetime_down/scalar/UTC', '--baseline', path,
+                                       '--threshold', '1000'), 0)
+
+        # everything is slower than a baseline of (almost) nothing, and
+        # benchmarks the baseline doesn't have are skipped
+        saved['results'] = dict((key, 1e-9) for key in saved['results'] if not key.endswith('/week'))
+        with open(path, 'w') as f:
+            json.dump(saved, f)
+        sys.stdout = StringIO()
+        self.assertEqual(self.run_main('--filter', 'round_datetime_down/scalar/UTC', '--baseline', path), 1)
+        self.assertIn('SLOWER', sys.stdout.getvalue())
+        self.assertNotIn('UTC/week', sys.stdout.getvalue())
+
+    def test_import_time(self):
+        seconds, loaded = bench.import_time(repeat=3)
+        self.assertLess(seconds, bench.IMPORT_BUDGET)
+        self.assertEqual(loaded, [])
+
+    def test_startup(self):
+        self.assertEqual(self.run_main('--startup'), 0)
+        self.assertIn('import datetime_utils: ', sys.stdout.getvalue())
+
+        budget, lazy = bench.IMPORT_BUDGET, bench.LAZY_MODULES
+        bench.IMPORT_BUDGET, bench.LAZY_MODULES = 0, ('datetime',)
+        try:
+            self.assertEqual(bench.startup(repeat=1), 1)
+        finally:
+            bench.IMPORT_BUDGET, bench.LAZY_MODULES = budget, lazy
+        self.assertIn('imported eagerly: datetime', sys.stdout.getvalue())
+
+    def test_print(self):
+        self.assertEqual(self.run_main('--filter', 'floor_epoch/scalar/fixed/day'), 0)
+        self.assertIn('floor_epoch/scalar/fixed/day', sys.stdout.getvalue())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Tests for integer bucket ids.
+"""
+from datetime import datetime, timedelta
+from unittest import TestCase, main, skipIf
+
+import pytz
+
+from datetime_utils import bucket_end, bucket_id, bucket_start, datetime_utils
+from datetime_utils.periods import Period
+from datetime_utils.tests.fixtures import EPOCH, PERIODS, ZONES, sample_datetimes
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MORE_PERIODS = PERIODS + ['millisecond-100', 'minute-7', 'hour-6', 'day-7', 'week-2', 'month-7', 'quarter-2', 'year-10']
+
+
+def to_utc(dt):
+    if dt.tzinfo is None:
+        return dt
+    return dt.replace(tzinfo=None) - dt.utcoffset()
+
+
+class TestBucketsMatchScalar(TestCase):
+
+    samples = sample_datetimes()
+
+    def test_round_trip(self):
+        for tzinfo in ZONES:
+            for period in MORE_PERIODS:
+                ids = [bucket_id(dt, period, tzinfo) for dt in self.samples]
+                starts = [bucket_start(bucket, period, tzinfo) for bucket in ids]
+                ends = [bucket_end(bucket, period, tzinfo) for bucket in ids]
+                expected = [datetime_utils.round_datetime_down(dt, period, tzinfo) for dt in self.samples]
+                message = (tzinfo, period)
+
+                self.assertEqual([to_utc(dt) for dt in starts], [to_utc(dt) for dt in expected], message)
+                # one bucket for every start
+                self.assertEqual(len(set(ids)), len(set(zip(ids, map(to_utc, expected)))), message)
+                self.assertEqual(len(set(ids)), len(set(to_utc(dt) for dt in expected)), message)
+                for dt, bucket, end in zip(self.samples, ids, ends):
+                    self.assertLess(to_utc(dt), to_utc(end), message)
+                    self.assertGreater(bucket_id(end, period, tzinfo), bucket, message)
+                    if tzinfo is None:
+                        self.assertEqual(bucket_id(end, period), bucket + 1, message)
+
+    def test_wall_time(self):
+        # aware datetimes without tzinfo are bucketed in their own timezone
+        tz = pytz.timezone('America/Sao_Paulo')
+        for period in MORE_PERIODS:
+            for dt in self.samples:
+                dt = tz.fromutc(dt.replace(tzinfo=tz))
+                expected = datetime_utils.round_datetime_down(dt, period)
+                self.assertEqual(to_utc(bucket_start(bucket_id(dt, period), period, tz)), to_utc(expected),
+                                 (period, dt))
+
+
+class TestBuckets(TestCase):
+
+    def test_ids(self):
+        self.assertEqual(bucket_id(EPOCH, 'hour'), 0)
+        self.assertEqual(bucket_id(datetime(1970, 1, 1, 5, 59), 'hour'), 5)
+        self.assertEqual(bucket_id(datetime(1969, 12, 31, 23), 'day'), -1)
+        self.assertEqual(bucket_id(datetime(1969, 12, 29), 'week'), 0)
+        self.assertEqual(bucket_id(datetime(1970, 2, 1), 'month'), 1)
+        self.assertEqual(bucket_id(datetime(2015, 6, 1), 'year'), 45)
+        self.assertEqual(bucket_id(datetime(2015, 6, 1), 'year-10'), 4)
+        self.assertEqual(bucket_start(4, 'year-10'), datetime(2010, 1, 1))
+        self.assertEqual(bucket_end(4, 'year-10'), datetime(2020, 1, 1))
+        self.assertEqual(bucket_start(-10 ** 6, 'year'), datetime(1, 1, 1))
+
+    def test_dst(self):
+        # the clocks in New York went back from 02:00 EDT to 01:00 EST
+        tz = pytz.timezone('America/New_York')
+        first = tz.localize(datetime(2015, 11, 1, 1, 30), is_dst=True)
+        second = tz.localize(datetime(2015, 11, 1, 1, 30), is_dst=False)
+        hour = bucket_id(first, 'hour', tz)
+        self.assertEqual(bucket_id(second, 'hour', tz), hour)
+        self.assertEqual(str(bucket_start(hour, 'hour', tz)), '2015-11-01 01:00:00-05:00')
+        self.assertEqual(str(bucket_end(hour - 1, 'hour', tz)), '2015-11-01 01:00:00-04:00')
+        self.assertEqual(str(bucket_end(hour, 'hour', tz)), '2015-11-01 02:00:00-05:00')
+        # minutes in the repeated hour end when the wall time leaves them the second time
+        minute = bucket_id(first, 'minute', tz)
+        self.assertEqual(str(bucket_end(minute, 'minute', tz)), '2015-11-01 01:31:00-05:00')
+
+        day = bucket_id(first, 'day', 'America/New_York')
+        self.assertEqual(bucket_end(day, 'day', tz) - bucket_start(day, 'day', tz), timedelta(hours=25))
+
+        # midnight did not exist in Sao Paulo on 2015-10-18
+        tz = pytz.timezone('America/Sao_Paulo')
+        day = bucket_id(datetime(2015, 10, 18, 12), 'day', tz)
+        self.assertEqual(str(bucket_start(day, 'day', tz)), '2015-10-18 01:00:00-02:00')
+        self.assertEqual(str(bucket_end(day - 1, 'day', tz)), '2015-10-18 01:00:00-02:00')
+        self.assertEqual(str(bucket_end(bucket_id(datetime(2015, 10, 18, 2, 59), 'hour', tz), 'hour', tz)),
+                         '2015-10-18 01:00:00-02:00')
+
+    def test_period_numbers(self):
+        values = [-10 ** 17, -1, 0, 1, 10 ** 15, 2 * 10 ** 17]
+        for name in MORE_PERIODS:
+            period = Period.get(name)
+            self.assertEqual([period.start_us(period.index_us(value)) for value in values],
+                             [period.floor_us(value) for value in values], name)
+
+    @skipIf(numpy is None, 'numpy is not installed')
+    def test_period_numbers_vector(self):
+        values = numpy.array([-10 ** 17, -1, 0, 1, 10 ** 15, 2 * 10 ** 17], dtype=numpy.int64)
+        for name in MORE_PERIODS:
+            period = Period.get(name)
+            self.assertEqual(period.start_us(period.index_us(values)).tolist(), period.floor_us(values).tolist(), name)
+
+
+if __name__ == '__main__':
+    main()
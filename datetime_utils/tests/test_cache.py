@@ -0,0 +1,129 @@
+"""
+Tests for the boundary cache.
+"""
+import sys
+import threading
+from datetime import datetime, timedelta
+from unittest import TestCase, main
+
+import pytz
+
+import datetime_utils
+from datetime_utils import cache
+from datetime_utils.datetime_utils import round_datetime_down, round_datetime_up
+
+from .fixtures import PERIODS, ZONES, sample_datetimes
+
+
+class TestBoundaryCache(TestCase):
+    tz = pytz.timezone('America/Sao_Paulo')
+
+    def setUp(self):
+        datetime_utils.clear_cache()
+
+    def tearDown(self):
+        datetime_utils.set_cache_size(cache.DEFAULT_MAXSIZE)
+        datetime_utils.clear_cache()
+
+    def round_all(self, values):
+        results = []
+        for dt in values:
+            for tzinfo in ZONES:
+                for period in PERIODS:
+                    for force in (False, True):
+                        results.append(round_datetime_down(dt, period, tzinfo, force))
+                        results.append(round_datetime_up(dt, period, tzinfo, force))
+        return results
+
+    def test_same_results_as_uncached(self):
+        samples = sample_datetimes()[::7]
+        values = samples + [pytz.UTC.localize(dt) for dt in samples] + \
+            [self.tz.normalize(pytz.UTC.localize(dt)) for dt in samples]
+
+        datetime_utils.set_cache_size(0)
+        expected = self.round_all(values)
+        self.assertEqual(datetime_utils.cache_info(), (0, 0, 0, 0, 0))
+
+        for maxsize in (3, 10000):
+            datetime_utils.set_cache_size(maxsize)
+            results = self.round_all(values)
+            self.assertEqual([(dt, str(dt.tzinfo)) for dt in results],
+                             [(dt, str(dt.tzinfo)) for dt in expected])
+
+    def test_clustered(self):
+        for minute in range(60):
+            round_datetime_down(datetime(2015, 7, 17, 12, minute), 'hour', self.tz)
+            round_datetime_up(datetime(2015, 7, 17, 12, minute, 30), 'hour', self.tz)
+        self.assertEqual(datetime_utils.cache_info(), (119, 1, 0, cache.DEFAULT_MAXSIZE, 1))
+
+    def test_cached_datetime(self):
+        dt = self.tz.localize(datetime(2015, 10, 17, 12, 10))
+        first = round_datetime_down(dt, 'hour')
+        self.assertIs(round_datetime_down(dt + timedelta(minutes=5), 'hour'), first)
+        self.assertEqual(first, self.tz.localize(datetime(2015, 10, 17, 12)))
+
+    def test_eviction(self):
+        datetime_utils.set_cache_size(2)
+        for hour in (1, 2, 1, 3, 1):
+            round_datetime_down(datetime(2015, 10, 17, hour), 'hour', self.tz)
+        # hour 2 was the least recently used when hour 3 came in
+        self.assertEqual(datetime_utils.cache_info(), (2, 3, 1, 2, 2))
+
+        datetime_utils.set_cache_size(1)
+        self.assertEqual(datetime_utils.cache_info().evictions, 2)
+        round_datetime_down(datetime(2015, 10, 17, 1), 'hour', self.tz)
+        self.assertEqual(datetime_utils.cache_info().hits, 3)
+
+    def test_near_transitions_bypass_the_cache(self):
+        # the day the clocks go forward is not cached for round_datetime_up
+        round_datetime_up(datetime(2015, 10, 18, 12), 'day', self.tz)
+        self.assertEqual(datetime_utils.cache_info().currsize, 0)
+
+    def test_naive_bypasses_the_cache(self):
+        round_datetime_down(datetime(2015, 10, 18, 12), 'day')
+        round_datetime_up(datetime(2015, 10, 18, 12), 'day')
+        self.assertEqual(datetime_utils.cache_info().currsize, 0)
+
+    def test_threads(self):
+        # threads rounding at once share the cache, evicting from it
+        datetime_utils.set_cache_size(8)
+        tz = pytz.timezone('America/New_York')
+        values = [datetime(2015, 7, 17) + timedelta(minutes=13 * n) for n in range(2000)]
+        expected = [round_datetime_down(dt, 'hour', tz) for dt in values]
+        errors, results = [], {}
+
+        def run(number):
+            try:
+                results[number] = [round_datetime_down(dt, 'hour', tz) for dt in values[number::3] + values]
+            except Exception as error:  # pragma: no cover
+                errors.append(error)
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=run, args=(number,)) for number in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+
+        self.assertEqual(errors, [])
+        for number in range(8):
+            self.assertEqual(results[number], expected[number::3] + expected)
+        # and no lookup was lost from the statistics
+        info = datetime_utils.cache_info()
+        self.assertTrue(info.currsize <= 8)
+        datetime_utils.clear_cache()
+        for number in range(8):
+            run(number)
+        self.assertEqual(sum(info[:2]), sum(datetime_utils.cache_info()[:2]) + len(values))
+
+    def test_invalid_size(self):
+        with self.assertRaises(Exception):
+            datetime_utils.set_cache_size(-1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Tests for the command line rounding filter.
+"""
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+from io import StringIO
+from unittest import TestCase, main
+
+import pytz
+
+from datetime_utils import __main__, cli, datetime_utils, floor_epoch
+from datetime_utils.tests.fixtures import sample_datetimes, to_seconds
+
+SAMPLES = sample_datetimes()[::3]
+
+
+class TestCli(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.stdin, self.stderr = sys.stdin, sys.stderr
+        sys.stderr = StringIO()
+        self.chunk_size = cli.CHUNK_SIZE
+
+    def tearDown(self):
+        sys.stdin, sys.stderr = self.stdin, self.stderr
+        cli.CHUNK_SIZE = self.chunk_size
+        shutil.rmtree(self.directory)
+
+    def write(self, name, lines):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            f.write(''.join(line + '\n' for line in lines))
+        return path
+
+    def run_main(self, *args, **kwargs):
+        sys.stdin = StringIO(kwargs.get('stdin', ''))
+        output = StringIO()
+        self.assertEqual(cli.main(list(args), output), kwargs.get('status', 0), sys.stderr.getvalue())
+        return output.getvalue().splitlines()
+
+    def test_iso(self):
+        tz = pytz.timezone('America/Sao_Paulo')
+        values = [dt.isoformat() for dt in SAMPLES]
+        for mode, function in (('floor', datetime_utils.round_datetime_down),
+                               ('ceil', datetime_utils.round_datetime_up),
+                               ('nearest', datetime_utils.round_datetime)):
+            result = self.run_main('--period', 'minute-15', '--zone', 'America/Sao_Paulo', '--mode', mode,
+                                   stdin='\n'.join(values) + '\n')
+            self.assertEqual(result, [function(dt, 'minute-15', tz).isoformat() for dt in SAMPLES], mode)
+
+        # aware times keep their offset and separator, and Z its suffix
+        self.assertEqual(self.run_main('-p', 'hour', stdin='2015-11-01 05:37:12-02:00\n2015-11-01T05:37:12Z\n'),
+                         ['2015-11-01 05:00:00-02:00', '2015-11-01T05:00:00Z'])
+        for mode in ('floor', 'ceil', 'nearest'):
+            self.assertEqual(self.run_main('-p', 'hour', '-m', mode, stdin='2015-11-01 05:37:12Z\n'),
+                             ['2015-11-01 0%d:00:00Z' % (5 if mode == 'floor' else 6)], mode)
+        self.assertEqual(self.run_main('-p', 'hour', '-z', 'Asia/Kolkata', stdin='2015-11-01T05:37:12Z\n'),
+                         ['2015-11-01T05:30:00Z'])
+        self.assertEqual(self.run_main('-p', 'day', stdin='2015-11-01\n'), ['2015-11-01T00:00:00'])
+
+    def test_epoch(self):
+        values = [str(to_seconds(dt)) for dt in SAMPLES]
+        expected = {
+            mode: self.run_main('-p', 'hour', '-z', 'Asia/Amman', '-m', mode, stdin='\n'.join(values))
+            for mode in ('floor', 'ceil', 'nearest')
+        }
+        self.assertEqual(expected['floor'], [str(floor_epoch(int(value), 'hour', 'Asia/Amman')) for value in values])
+
+        # the same without numpy
+        numpy = cli.numpy
+        cli.numpy = None
+        try:
+            for mode in ('floor', 'ceil', 'nearest'):
+                self.assertEqual(self.run_main('-p', 'hour', '-z', 'Asia/Amman', '-m', mode, stdin='\n'.join(values)),
+                                 expected[mode], mode)
+        finally:
+            cli.numpy = numpy
+
+        self.assertEqual(self.run_main('-p', 'second', '-u', 'ms', stdin='1446356232123\n-1500\n'),
+                         ['1446356232000', '-2000'])
+
+    def test_columns_and_files(self):
+        first = self.write('first.csv', ['id,time,name', '1,2015-11-01T05:37:12,a', '', '2,2015-11-01T06:10:00,b'])
+        second = self.write('second.csv', ['id,time,name', '3,2015-11-01T07:00:00,c'])
+        self.assertEqual(self.run_main('-p', 'hour', '-c', '2', '--header', first, '-', second,
+                                       stdin='id,time,name\n4,2015-11-01T08:30:00,d\r\n'), [
+            'id,time,name', '1,2015-11-01T05:00:00,a', '', '2,2015-11-01T06:00:00,b',
+            'id,time,name', '4,2015-11-01T08:00:00,d',
+            'id,time,name', '3,2015-11-01T07:00:00,c',
+        ])
+        self.assertEqual(self.run_main('-p', 'day', '-c', '1', '-d', '\t', stdin='1446356232\tx\n'),
+                         ['1446336000\tx'])
+
+    def test_count(self):
+        values = ['2015-11-01T05:37:12', '2015-11-01T05:10:00', '2015-11-01T06:10:00', '2015-11-01T05:59:59']
+        self.assertEqual(self.run_main('-p', 'hour', '--count', stdin='\n'.join(values)),
+                         ['2015-11-01T05:00:00,3', '2015-11-01T06:00:00,1'])
+
+    def test_workers(self):
+        cli.CHUNK_SIZE = 100
+        values = [str(to_seconds(dt)) for dt in SAMPLES]
+        path = self.write('values.txt', values)
+        self.assertEqual(self.run_main('-p', 'minute-15', '-z', 'America/Los_Angeles', '-w', '2', path),
+                         self.run_main('-p', 'minute-15', '-z', 'America/Los_Angeles', path))
+        self.assertEqual(self.run_main('-p', 'day', '-w', '2', '--count', path),
+                         self.run_main('-p', 'day', '--count', path))
+
+    def test_errors(self):
+        for args, stdin in ((['-p', 'fortnight'], '1446356232\n'),
+                            (['-p', 'hour'], '1446356232\n2015-11-01\n'),
+                            (['-p', 'hour'], '2015-11-01\n1446356232x\n'),
+                            (['-p', 'hour', '-c', '3'], '1446356232,x\n'),
+                            (['-p', 'hour', '-c', '2'], '1,1446356232\n2\n'),
+                            (['-p', 'hour', '-z', 'No/Such_Zone'], '1446356232\n')):
+            sys.stderr = StringIO()
+            self.run_main(*args, stdin=stdin, status=1)
+            self.assertIn('python -m datetime_utils: error: ', sys.stderr.getvalue())
+        sys.stderr = StringIO()
+        self.run_main('-p', 'hour', stdin='1446356232\n2015-11-01\n', status=1)
+        self.assertEqual(sys.stderr.getvalue(), 'python -m datetime_utils: error: Unrecognized timestamp: 2015-11-01\n')
+
+        with self.assertRaises(SystemExit):
+            self.run_main('-p', 'hour', '-c', '0')
+
+    def test_blank_lines(self):
+        # blank lines are passed through, so the output lines match the input lines
+        self.assertEqual(self.run_main('-p', 'hour', stdin='\n  \n1446356232\n\n1446359999\n'),
+                         ['', '  ', '1446354000', '', '1446357600'])
+        self.assertEqual(self.run_main('-p', 'hour', '--count', stdin='\n2015-11-01T05:37:12\n\n'),
+                         ['2015-11-01T05:00:00,1'])
+
+        cli.CHUNK_SIZE = 1
+        self.assertEqual(self.run_main('-p', 'hour', '-c', '2', stdin='\n\n1,1446356232\n'),
+                         ['', '', '1,1446354000'])
+
+    def test_empty(self):
+        self.assertEqual(self.run_main('-p', 'hour', stdin=''), [])
+        self.assertEqual(self.run_main('-p', 'hour', stdin='\n\n'), ['', ''])
+
+    def test_module(self):
+        self.assertIs(__main__.main, cli.main)
+        self.assertEqual(cli.round_values(['2013-04-05T02:33:00'], 'hour', mode='nearest'), ['2013-04-05T03:00:00'])
+        self.assertEqual(datetime_utils.round_datetime(datetime(2013, 4, 5, 2, 33), 'hour'), datetime(2013, 4, 5, 3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Tests for rounding integer epoch timestamps.
+"""
+import array
+from datetime import datetime
+from unittest import TestCase, main
+
+import pytz
+
+from datetime_utils import ceil_epoch, ceil_epoch_buffer, datetime_utils, floor_epoch, floor_epoch_buffer
+from datetime_utils.tests.fixtures import PERIODS, ZONES, sample_datetimes, to_seconds
+
+
+class TestEpochMatchesScalar(TestCase):
+
+    samples = sample_datetimes()
+
+    def test_floor_epoch(self):
+        for tzinfo in ZONES:
+            for period in PERIODS:
+                for force in (False, True):
+                    result = [floor_epoch(to_seconds(dt), period, tzinfo, force=force) for dt in self.samples]
+                    expected = [
+                        to_seconds(datetime_utils.round_datetime_down(dt, period, tzinfo, force))
+                        for dt in self.samples
+                    ]
+                    self.assertEqual(result, expected, (tzinfo, period, force))
+
+    def test_ceil_epoch(self):
+        for tzinfo in ZONES:
+            for period in PERIODS:
+                for force in (False, True):
+                    result = [ceil_epoch(to_seconds(dt), period, tzinfo, force=force) for dt in self.samples]
+                    expected = [
+                        to_seconds(datetime_utils.round_datetime_up(dt, period, tzinfo, force))
+                        for dt in self.samples
+                    ]
+                    self.assertEqual(result, expected, (tzinfo, period, force))
+
+
+class TestEpochUnits(TestCase):
+    tz = pytz.FixedOffset(330)
+
+    def test_units(self):
+        seconds = to_seconds(datetime(2013, 4, 5, 2, 33))
+        expected = to_seconds(datetime(2013, 4, 4, 18, 30))
+
+        self.assertEqual(floor_epoch(seconds, 'day', self.tz), expected)
+        self.assertEqual(floor_epoch(seconds * 1000 + 999, 'day', self.tz, unit='ms'), expected * 1000)
+        self.assertEqual(floor_epoch(seconds * 10 ** 6, 'day', self.tz, unit='us'), expected * 10 ** 6)
+        self.assertEqual(floor_epoch(seconds * 10 ** 9, 'day', self.tz, unit='ns'), expected * 10 ** 9)
+
+    def test_ceil_between_microseconds(self):
+        value = to_seconds(datetime(2013, 4, 5, 2)) * 10 ** 9
+        self.assertEqual(ceil_epoch(value, 'hour', unit='ns'), value)
+        self.assertEqual(ceil_epoch(value + 1, 'hour', unit='ns'), value + 3600 * 10 ** 9)
+
+    def test_sub_second(self):
+        ms = to_seconds(datetime(2013, 4, 5, 2, 33)) * 1000 + 1234
+        self.assertEqual(floor_epoch(ms, 'millisecond-100', unit='ms'), ms - 34)
+        self.assertEqual(ceil_epoch(ms, 'millisecond-100', unit='ms'), ms + 66)
+        self.assertEqual(floor_epoch(ms, 'second', self.tz, unit='ms'), ms - 234)
+        self.assertEqual(floor_epoch(ms * 10 ** 6 + 300999, 'microsecond-250', unit='ns'), ms * 10 ** 6 + 250000)
+        self.assertEqual(ceil_epoch(ms * 10 ** 6 + 1, 'microsecond', unit='ns'), ms * 10 ** 6 + 1000)
+        self.assertEqual(ceil_epoch(ms * 10 ** 6 + 1000, 'millisecond', unit='ns', force=True),
+                         ms * 10 ** 6 + 10 ** 6)
+
+        values = array.array('q', [ms * 1000 + 1, ms * 1000 + 250, ms * 1000 + 251])
+        self.assertEqual(floor_epoch_buffer(values, 'microsecond-250', unit='us').tolist(),
+                         [ms * 1000, ms * 1000 + 250, ms * 1000 + 250])
+
+    def test_negative(self):
+        self.assertEqual(floor_epoch(-1, 'day'), -86400)
+        self.assertEqual(ceil_epoch(-86399, 'day'), 0)
+
+    def test_unrecognized(self):
+        with self.assertRaises(Exception):
+            floor_epoch(0, 'day', unit='minutes')
+        with self.assertRaises(Exception):
+            ceil_epoch(0, 'fortnight')
+
+
+class TestEpochBuffers(TestCase):
+
+    samples = [to_seconds(dt) for dt in sample_datetimes()]
+
+    def test_matches_epoch(self):
+        # sorted, then reversed so that every value starts a new period
+        for values in (self.samples, self.samples[::-1]):
+            for tzinfo in ZONES:
+                for period in PERIODS:
+                    for force in (False, True):
+                        floored = array.array('q', values)
+                        floor_epoch_buffer(floored, period, tzinfo, force=force)
+                        expected = [floor_epoch(v, period, tzinfo, force=force) for v in values]
+                        self.assertEqual(floored.tolist(), expected)
+
+                        ceiled = array.array('q', values)
+                        ceil_epoch_buffer(ceiled, period, tzinfo, force=force)
+                        expected = [ceil_epoch(v, period, tzinfo, force=force) for v in values]
+                        self.assertEqual(ceiled.tolist(), expected)
+
+    def test_units(self):
+        tz = pytz.timezone('America/Sao_Paulo')
+        values = [value * 10 ** 9 + offset for value in self.samples[::20] for offset in (-1, 0, 1)]
+        for function, scalar in ((floor_epoch_buffer, floor_epoch), (ceil_epoch_buffer, ceil_epoch)):
+            result = function(array.array('q', values), 'hour', tz, unit='ns')
+            self.assertEqual(result.tolist(), [scalar(v, 'hour', tz, unit='ns') for v in values])
+
+    def test_out(self):
+        values = array.array('q', [1365129180, 1365131400])
+        out = bytearray(16)
+
+        self.assertIs(ceil_epoch_buffer(values, 'hour', out=out), out)
+        self.assertEqual(memoryview(out).cast('q').tolist(), [1365130800, 1365134400])
+        self.assertEqual(values.tolist(), [1365129180, 1365131400])
+
+        view = memoryview(values)
+        self.assertIs(floor_epoch_buffer(view, 'hour'), view)
+        self.assertEqual(values.tolist(), [1365127200, 1365130800])
+
+    def test_strided(self):
+        # buffers numpy cannot take without a copy are rounded value by value
+        tz = pytz.timezone('America/Sao_Paulo')
+        for function, scalar in ((floor_epoch_buffer, floor_epoch), (ceil_epoch_buffer, ceil_epoch)):
+            values = array.array('q', self.samples)
+            out = array.array('q', [0]) * (len(values) + 1)
+            function(memoryview(values)[::2], 'hour', tz, out=memoryview(out)[1::2])
+            self.assertEqual(out[1::2].tolist(), [scalar(v, 'hour', tz) for v in self.samples[::2]])
+            self.assertEqual(function(memoryview(values)[::3], 'day').tolist(),
+                             [scalar(v, 'day') for v in self.samples[::3]])
+            self.assertEqual(values[1::3].tolist(), self.samples[1::3])
+            self.assertEqual(function(memoryview(array.array('q', [0, 5, 86400]))[::2], 'day').tolist(), [0, 86400])
+
+    def test_bytes(self):
+        values = array.array('q', [1365129180]).tobytes()
+        out = array.array('q', [0])
+        floor_epoch_buffer(values, 'day', out=out)
+        self.assertEqual(out.tolist(), [1365120000])
+
+    def test_invalid(self):
+        with self.assertRaises(Exception):
+            floor_epoch_buffer(array.array('i', [0]), 'day')
+        with self.assertRaises(Exception):
+            floor_epoch_buffer(array.array('q', [0, 0]), 'day', out=array.array('q', [0]))
+        with self.assertRaises(Exception):
+            floor_epoch_buffer(array.array('q', [0]).tobytes(), 'day')
+
+
+if __name__ == '__main__':
+    main()
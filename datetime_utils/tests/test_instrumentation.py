@@ -0,0 +1,150 @@
+"""
+Tests for the opt-in counters.
+"""
+import array
+from datetime import datetime
+from unittest import TestCase, main
+
+import pytz
+
+import datetime_utils
+from datetime_utils import datetime_utils as functions, epoch, instrumentation, zones
+from datetime_utils.periods import Period
+
+try:
+    import numpy
+    from datetime_utils import vector
+except ImportError:
+    numpy = None
+
+
+class TestInstrumentation(TestCase):
+    tz = pytz.timezone('America/Sao_Paulo')
+
+    def setUp(self):
+        instrumentation.reset()
+
+    def tearDown(self):
+        instrumentation.disable()
+        instrumentation.reset()
+
+    def test_disabled_changes_nothing(self):
+        original = functions.round_datetime_down
+        datetime_utils.round_datetime(datetime(2015, 10, 18, 4), 'day', self.tz)
+
+        self.assertFalse(instrumentation.is_enabled())
+        self.assertIs(functions.round_datetime_down, original)
+        self.assertEqual(instrumentation.snapshot()['calls'], {})
+
+    def test_calls(self):
+        instrumentation.enable()
+        datetime_utils.round_datetime(datetime(2015, 10, 18, 4), 'day', self.tz)
+        datetime_utils.round_datetime_to_15min(datetime(2015, 10, 18, 4, 10))
+        functions.is_snapped_to(self.tz.localize(datetime(2015, 10, 17)), Period.get('hour'))
+        epoch.floor_epoch(0, 'week')
+        list(datetime_utils.bucketize([datetime(2015, 1, 1)], 'minute', tzinfo=pytz.UTC))
+        datetime_utils.round_many([datetime(2015, 1, 1)], 'hour', self.tz, 'ceil')
+
+        self.assertEqual(instrumentation.snapshot()['calls'], {
+            ('round_datetime', 'day', 'America/Sao_Paulo'): 1,
+            ('round_datetime_down', 'day', 'America/Sao_Paulo'): 1,
+            ('round_datetime_to_15min', 'minute-15', 'naive'): 1,
+            ('round_datetime', 'minute-15', 'naive'): 1,
+            ('round_datetime_up', 'minute-15', 'naive'): 1,
+            ('is_snapped_to', 'hour', 'America/Sao_Paulo'): 1,
+            ('floor_epoch', 'week', 'naive'): 1,
+            ('bucketize', 'minute', 'UTC'): 1,
+            ('round_datetime_down', 'minute', 'UTC'): 1,
+            ('round_many', 'hour', 'America/Sao_Paulo'): 1,
+        })
+
+    def test_entry_points(self):
+        # every public function is counted under its own name, not only the
+        # functions it calls
+        instrumentation.enable()
+        epoch.floor_epoch_buffer(array.array('q', [0]), 'hour', self.tz)
+        datetime_utils.ceil_epoch_buffer(array.array('q', [0]), 'day')
+        datetime_utils.snapped_mask([datetime(2015, 1, 1)], 'hour', tzinfo=self.tz)
+        datetime_utils.all_snapped([datetime(2015, 1, 1)], 'day')
+        datetime_utils.first_unsnapped([datetime(2015, 1, 1)], 'day')
+        datetime_utils.floor_iso(['2015-01-01T00:00:00'], 'minute-15', self.tz)
+        bucket = datetime_utils.bucket_id(self.tz.localize(datetime(2015, 1, 1)), 'week')
+        datetime_utils.bucket_start(bucket, 'week', self.tz)
+        datetime_utils.bucket_end(bucket, 'week')
+        datetime_utils.hopping_windows(datetime(2015, 1, 1), 'hour', 'minute-15', tzinfo=self.tz)
+        list(datetime_utils.watermark_bucketize([datetime(2015, 1, 1)], 'minute', pytz.UTC))
+
+        calls = instrumentation.snapshot()['calls']
+        self.assertEqual(calls[('floor_epoch_buffer', 'hour', 'America/Sao_Paulo')], 1)
+        self.assertEqual(calls[('ceil_epoch_buffer', 'day', 'naive')], 1)
+        self.assertEqual(calls[('snapped_mask', 'hour', 'America/Sao_Paulo')], 1)
+        self.assertEqual(calls[('all_snapped', 'day', 'naive')], 1)
+        self.assertEqual(calls[('first_unsnapped', 'day', 'naive')], 1)
+        self.assertEqual(calls[('floor_iso', 'minute-15', 'America/Sao_Paulo')], 1)
+        self.assertEqual(calls[('bucket_id', 'week', 'America/Sao_Paulo')], 1)
+        self.assertEqual(calls[('bucket_start', 'week', 'America/Sao_Paulo')], 1)
+        self.assertEqual(calls[('bucket_end', 'week', 'naive')], 1)
+        self.assertEqual(calls[('hopping_windows', 'minute-15', 'America/Sao_Paulo')], 1)
+        self.assertEqual(calls[('watermark_bucketize', 'minute', 'UTC')], 1)
+
+    def test_disable_restores(self):
+        originals = (functions.round_datetime, datetime_utils.round_datetime, zones.get_zone_table,
+                     Period.__dict__['get'], zones.ZoneTable.to_utc)
+        instrumentation.enable()
+        instrumentation.enable()
+        self.assertIsNot(datetime_utils.round_datetime, originals[1])
+        instrumentation.disable()
+
+        self.assertEqual((functions.round_datetime, datetime_utils.round_datetime, zones.get_zone_table,
+                          Period.__dict__['get'], zones.ZoneTable.to_utc), originals)
+        self.assertIs(Period.get('hour'), Period.get('hour'))
+
+    def test_caches(self):
+        Period.get('day')
+        instrumentation.enable()
+        Period.get('day')
+        Period.get(Period.get('day'))
+        with self.assertRaises(Exception):
+            Period.get(['day'])
+        zones.get_zone_table(self.tz)
+
+        caches = instrumentation.snapshot()['caches']
+        self.assertEqual(caches['periods']['hits'], 2)
+        self.assertEqual(caches['periods']['misses'], 1)
+        self.assertEqual(caches['periods']['size'], len(Period._cache))
+        self.assertEqual(caches['zones']['hits'] + caches['zones']['misses'], 1)
+        self.assertEqual(sorted(caches['boundaries']), ['hits', 'misses', 'size'])
+
+    def test_zone_operations_and_latency(self):
+        instrumentation.enable(latency=True, sample_every=2)
+        for hour in range(4):
+            functions.round_datetime_up(datetime(2015, 10, 17, hour), 'day', self.tz)
+
+        result = instrumentation.snapshot()
+        histogram = result['latency']['round_datetime_up']
+        self.assertEqual(sum(histogram.values()), 2)
+        self.assertEqual(sorted(histogram, key=lambda bound: bound or float('inf'))[-1], None)
+        self.assertEqual(result['zone_operations']['ceil']['calls'], 4)
+        self.assertGreater(result['zone_operations']['ceil']['seconds'], 0)
+
+    def test_slow_calls_land_in_the_last_bucket(self):
+        instrumentation._record_latency('slow', 1.0)
+        self.assertEqual(instrumentation.snapshot()['latency']['slow'][None], 1)
+
+    def test_reset(self):
+        instrumentation.enable()
+        functions.round_datetime_down(datetime(2015, 10, 17), 'day')
+        instrumentation.reset()
+        self.assertEqual(instrumentation.snapshot()['calls'], {})
+
+    def test_vector(self):
+        if numpy is None:
+            self.skipTest('numpy is not installed')
+        instrumentation.enable()
+        vector.round_datetime_down(numpy.array([0]), 'hour', self.tz)
+        self.assertEqual(instrumentation.snapshot()['calls'],
+                         {('vector.round_datetime_down', 'hour', 'America/Sao_Paulo'): 1})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Tests for rounding ISO-8601 strings.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+from unittest import TestCase, main
+
+import pytz
+
+from datetime_utils import datetime_utils, floor_iso
+from datetime_utils.iso import format_iso, format_offset
+from datetime_utils.tests.fixtures import EPOCH, PERIODS, ZONES, sample_datetimes
+
+OFFSETS = [None, timezone.utc, pytz.UTC, timezone(timedelta(hours=-3)), timezone(timedelta(hours=5, minutes=30)),
+           timezone(timedelta(minutes=-150))]
+
+
+def to_microseconds(dt):
+    if dt.tzinfo is not None:
+        dt = dt.replace(tzinfo=None) - dt.utcoffset()
+    return (dt - EPOCH) // timedelta(microseconds=1)
+
+
+class TestFloorIsoMatchesScalar(TestCase):
+
+    def test_outputs(self):
+        rnd = random.Random(1)
+        samples = sample_datetimes()
+        for tzinfo in ZONES:
+            for period in PERIODS:
+                for force in (False, True):
+                    dts = [dt.replace(tzinfo=rnd.choice(OFFSETS)) for dt in samples]
+                    strings = [dt.isoformat(rnd.choice('T ')) for dt in dts]
+                    expected = [datetime_utils.round_datetime_down(dt, period, tzinfo, force) for dt in dts]
+                    message = (tzinfo, period, force)
+
+                    result = floor_iso(strings, period, tzinfo, output='datetime', force=force)
+                    self.assertEqual([str(dt) for dt in result], [str(dt) for dt in expected], message)
+                    self.assertEqual(floor_iso(strings, period, tzinfo, output='iso', force=force),
+                                     [dt.isoformat(string[10]) for dt, string in zip(expected, strings)], message)
+                    self.assertEqual(floor_iso(strings, period, tzinfo, unit='us', force=force),
+                                     [to_microseconds(dt) for dt in expected], message)
+
+    def test_unsorted(self):
+        samples = sample_datetimes()
+        strings = [dt.isoformat() for dt in samples]
+        random.Random(2).shuffle(strings)
+        tz = pytz.timezone('America/Sao_Paulo')
+        for period in PERIODS:
+            self.assertEqual(floor_iso(strings, period, tz, output='datetime'), [
+                datetime_utils.round_datetime_down(datetime.fromisoformat(string), period, tz) for string in strings
+            ], period)
+
+
+class TestFloorIso(TestCase):
+
+    def test_forms(self):
+        self.assertEqual(floor_iso(['2013-04-05T02:33:00', '2013-04-05T19:10:00Z'], 'day', 'America/Los_Angeles'),
+                         [1365058800, 1365145200])
+        self.assertEqual(floor_iso(['2013-04-05 02:33:00-07:00', '2013-04-05T02:33:12.5Z', '2013-04-05'],
+                                   'hour', output='iso'),
+                         ['2013-04-05 02:00:00-07:00', '2013-04-05T02:00:00+00:00', '2013-04-05T00:00:00'])
+        self.assertEqual(floor_iso(['2013-04-05T02:33:12.345678'], 'millisecond', output='iso'),
+                         ['2013-04-05T02:33:12.345000'])
+        self.assertEqual(floor_iso(['2013-04-05T02:33:12.345678'], 'second', unit='ns'), [1365129192000000000])
+        self.assertEqual(floor_iso(['2013-04-05T02:00:00', '2013-04-05T02:00:00'], 'hour', output='datetime',
+                                   force=True), [datetime(2013, 4, 5, 1)] * 2)
+        self.assertEqual(floor_iso(iter([]), 'hour'), [])
+
+    def test_format(self):
+        self.assertEqual(format_offset(-150 * 60 * 10 ** 6), '-02:30')
+        self.assertEqual(format_offset(0), '+00:00')
+        self.assertEqual(format_offset(5 * 10 ** 6), '+00:00:05')
+        self.assertEqual(format_offset(5 * 10 ** 6 + 7), '+00:00:05.000007')
+        self.assertEqual(format_iso(-1), '1969-12-31T23:59:59.999999')
+        self.assertEqual(format_iso(0, 3600 * 10 ** 6, ' '), '1970-01-01 00:00:00+01:00')
+
+    def test_errors(self):
+        for strings, kwargs in ((['2013-04-05T02:33:00x'], {}),
+                                ([''], {}),
+                                ([None], {}),
+                                (['2013-04-05'], {'output': 'string'}),
+                                (['2013-04-05'], {'unit': 'h'}),
+                                (['2013-04-05'], {'period': 'fortnight'})):
+            kwargs.setdefault('period', 'hour')
+            with self.assertRaises(Exception):
+                floor_iso(strings, **kwargs)
+        with self.assertRaisesRegex(Exception, 'Unrecognized timestamp: 2013-04-05T02:33:00x'):
+            floor_iso(['2013-04-05T02:33:00x'], 'hour')
+
+
+if __name__ == '__main__':
+    main()
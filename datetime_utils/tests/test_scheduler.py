@@ -0,0 +1,212 @@
+"""
+Tests for the period boundary scheduler.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from unittest import TestCase, main
+
+import pytz
+
+from datetime_utils import datetime_utils
+from datetime_utils.scheduler import Scheduler
+from datetime_utils.tests.fixtures import EPOCH
+
+
+class FakeClock(object):
+    """
+    A clock that only moves when the scheduler sleeps, or when told to.
+    """
+
+    def __init__(self, start):
+        self.now = (start - EPOCH).total_seconds()
+        self.sleeps = 0
+
+    def time(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps += 1
+        self.now += seconds
+        await asyncio.sleep(0)
+
+
+def to_utc(dt):
+    if dt.tzinfo is None:
+        return dt
+    return dt.replace(tzinfo=None) - dt.utcoffset()
+
+
+def run(scheduler, timeout=5):
+    asyncio.run(asyncio.wait_for(scheduler.run(), timeout))
+
+
+class TestScheduler(TestCase):
+
+    def make(self, start):
+        self.clock = FakeClock(start)
+        return Scheduler(self.clock.time, self.clock.sleep, max_sleep=100 * 86400)
+
+    def collect(self, scheduler, period, tzinfo=None, count=None):
+        # add a job that records its boundaries, and stops the scheduler after count of them
+        fired = []
+
+        def callback(dt):
+            fired.append(dt)
+            if count is not None and len(fired) == count:
+                scheduler.stop()
+        scheduler.add(callback, period, tzinfo)
+        return fired
+
+    def test_boundaries(self):
+        start = datetime(2015, 11, 1, 3, 20)
+        for tzinfo in (None, pytz.UTC, pytz.timezone('America/New_York'), 'America/New_York',
+                       pytz.timezone('America/Sao_Paulo')):
+            for period in ('minute-15', 'hour', 'day'):
+                scheduler = self.make(start)
+                fired = self.collect(scheduler, period, tzinfo, 30)
+                run(scheduler)
+                expected = list(datetime_utils.iter_periods(start, start + timedelta(days=40), period, tzinfo))[:30]
+                self.assertEqual([to_utc(dt) for dt in fired], expected, (tzinfo, period))
+                self.assertEqual([dt.tzinfo is None for dt in fired], [tzinfo is None] * 30)
+
+    def test_dst(self):
+        # the clocks in New York went back from 02:00 EDT to 01:00 EST,
+        # and in Sao Paulo midnight did not exist on 2015-10-18
+        ny = pytz.timezone('America/New_York')
+        scheduler = self.make(datetime(2015, 11, 1, 3, 30))
+        fired = self.collect(scheduler, 'hour', ny, 3)
+        run(scheduler)
+        self.assertEqual([str(dt) for dt in fired],
+                         ['2015-11-01 00:00:00-04:00', '2015-11-01 01:00:00-05:00', '2015-11-01 02:00:00-05:00'])
+
+        scheduler = self.make(datetime(2015, 10, 17, 12))
+        fired = self.collect(scheduler, 'day', pytz.timezone('America/Sao_Paulo'), 2)
+        run(scheduler)
+        self.assertEqual([str(dt) for dt in fired], ['2015-10-18 01:00:00-02:00', '2015-10-19 00:00:00-02:00'])
+
+    def test_shared_wakeups(self):
+        scheduler = self.make(datetime(2015, 1, 5, 9, 50))
+        quarters = [self.collect(scheduler, 'minute-15', 'Europe/London') for _ in range(1000)]
+        hours = [self.collect(scheduler, 'hour') for _ in range(100)]
+        self.collect(scheduler, 'hour', 'Europe/London', 2)
+        run(scheduler)
+
+        # 10:00 and 11:00 in London are also 10:00 and 11:00 UTC in winter
+        self.assertEqual(scheduler.ticks, 5)
+        self.assertEqual(self.clock.sleeps, 5)
+        self.assertTrue(all(len(fired) == 5 for fired in quarters))
+        self.assertTrue(all(fired == [datetime(2015, 1, 5, 10), datetime(2015, 1, 5, 11)] for fired in hours))
+
+    def test_on_boundary(self):
+        scheduler = self.make(datetime(2015, 1, 5, 10))
+        fired = self.collect(scheduler, 'hour', None, 2)
+        run(scheduler)
+        self.assertEqual(fired, [datetime(2015, 1, 5, 10), datetime(2015, 1, 5, 11)])
+
+    def test_held_up(self):
+        # a job that takes two and a half hours skips the boundaries it missed
+        scheduler = self.make(datetime(2015, 1, 5, 9, 50))
+        fired = self.collect(scheduler, 'hour', None, 3)
+
+        def slow(dt):
+            if dt.hour == 10:
+                self.clock.now += 2.5 * 3600
+        scheduler.add(slow, 'hour')
+        run(scheduler)
+        self.assertEqual(fired, [datetime(2015, 1, 5, 10), datetime(2015, 1, 5, 13), datetime(2015, 1, 5, 14)])
+
+    def test_missed(self):
+        # after the scheduler is held up for 50 minutes the jobs run once, for
+        # the latest boundary missed
+        scheduler = self.make(datetime(2015, 1, 5, 7, 55))
+        fired = self.collect(scheduler, 'minute-15', 'America/New_York', 2)
+        self.clock.now += 50 * 60
+        run(scheduler)
+        self.assertEqual([str(dt) for dt in fired], ['2015-01-05 03:45:00-05:00', '2015-01-05 04:00:00-05:00'])
+
+    def test_cancel(self):
+        scheduler = self.make(datetime(2015, 1, 5, 9, 50))
+        cancelled = self.collect(scheduler, 'minute-15')
+        job = scheduler.add(lambda dt: cancelled.append(dt), 'minute-15')
+        self.assertEqual(job.period.name, 'minute-15')
+        self.assertIsNone(job.tzinfo)
+        job.cancel()
+        job.cancel()
+        scheduler._groups[next(iter(scheduler._groups))].jobs.clear()
+
+        fired = self.collect(scheduler, 'hour', None, 2)
+        run(scheduler)
+        self.assertEqual(cancelled, [])
+        self.assertEqual(len(fired), 2)
+        self.assertEqual(len(scheduler._groups), 1)
+
+        # a new job for the period starts a new group
+        fired = self.collect(scheduler, 'minute-15', None, 1)
+        run(scheduler)
+        self.assertEqual(fired, [datetime(2015, 1, 5, 11)])
+
+    def test_coroutines_and_errors(self):
+        scheduler = self.make(datetime(2015, 1, 5, 9, 50))
+        done, errors = [], []
+
+        async def job(dt):
+            await asyncio.sleep(0)
+            done.append(dt)
+
+        async def failing(dt):
+            raise ValueError(dt)
+
+        def broken(dt):
+            raise KeyError(dt)
+
+        scheduler.add(job, 'hour')
+        scheduler.add(failing, 'hour')
+        scheduler.add(broken, 'hour')
+        self.collect(scheduler, 'hour', None, 2)
+
+        async def main():
+            asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+            await scheduler.run()
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+        asyncio.run(main())
+
+        self.assertEqual(done, [datetime(2015, 1, 5, 10), datetime(2015, 1, 5, 11)])
+        self.assertEqual(sorted(type(context['exception']).__name__ for context in errors),
+                         ['KeyError', 'KeyError', 'ValueError', 'ValueError'])
+        self.assertFalse(scheduler._tasks)
+
+    def test_add_while_sleeping(self):
+        # the scheduler sleeps (for real) towards the next day, and wakes
+        # up for a job that is due at once
+        clock = FakeClock(datetime(2015, 1, 5, 9, 50))
+        scheduler = Scheduler(clock.time, max_sleep=3600)
+        scheduler.add(lambda dt: None, 'day')
+        fired = []
+
+        async def main():
+            running = asyncio.ensure_future(scheduler.run())
+            await asyncio.sleep(0.01)
+            clock.now = (datetime(2015, 1, 5, 10) - EPOCH).total_seconds()
+            fired.append(self.collect(scheduler, 'hour', None, 1))
+            await asyncio.wait_for(running, 5)
+        asyncio.run(main())
+        self.assertEqual(fired, [[datetime(2015, 1, 5, 10)]])
+        self.assertEqual(scheduler.ticks, 1)
+
+        # nothing to run: the scheduler sleeps max_sleep at a time
+        clock = FakeClock(datetime(2015, 1, 5, 9, 50))
+        scheduler = Scheduler(clock.time, clock.sleep, max_sleep=7)
+
+        async def stop():
+            await asyncio.sleep(0)
+            scheduler.stop()
+
+        async def main():
+            await asyncio.gather(scheduler.run(), stop())
+        asyncio.run(main())
+        self.assertEqual(clock.now, (datetime(2015, 1, 5, 9, 50, 7) - EPOCH).total_seconds())
+
+
+if __name__ == '__main__':
+    main()
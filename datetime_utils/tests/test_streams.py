@@ -0,0 +1,168 @@
+"""
+Tests for grouping timestamp streams into periods.
+"""
+import random
+from datetime import datetime, timedelta
+from itertools import groupby, islice
+from unittest import TestCase, main
+
+import pytz
+
+from datetime_utils import bucket_end, bucket_id, bucketize, datetime_utils, watermark_bucketize
+from datetime_utils.tests.fixtures import PERIODS, ZONES, sample_datetimes
+
+SAMPLES = sample_datetimes()
+
+
+def grouped(values, period, tzinfo, key=None):
+    key = key or (lambda value: value)
+    return [
+        (start, list(items))
+        for start, items in groupby(values, lambda item: datetime_utils.round_datetime_down(key(item), period, tzinfo))
+    ]
+
+
+def to_utc(dt):
+    if dt.tzinfo is None:
+        return dt
+    return dt.replace(tzinfo=None) - dt.utcoffset()
+
+
+def closed(values, period, tzinfo):
+    # the values grouped by bucket_id, as the watermark closes them when
+    # they are sorted: in the order their periods end
+    groups = {}
+    for value in values:
+        bucket = (bucket_id(value, period, tzinfo), getattr(value.tzinfo, 'zone', None))
+        if bucket not in groups:
+            end = to_utc(bucket_end(bucket[0], period, tzinfo or value.tzinfo))
+            groups[bucket] = (end, len(groups), datetime_utils.round_datetime_down(value, period, tzinfo), [])
+        groups[bucket][3].append(value)
+    return [(start, items) for _, _, start, items in sorted(groups.values(), key=lambda group: group[:2])]
+
+
+class TestBucketize(TestCase):
+
+    def test_naive(self):
+        for tzinfo in ZONES:
+            for period in PERIODS:
+                result = list(bucketize(SAMPLES, period, tzinfo))
+                self.assertEqual(result, grouped(SAMPLES, period, tzinfo), (tzinfo, period))
+
+    def test_aware(self):
+        values = [pytz.UTC.localize(dt) for dt in SAMPLES]
+        for tzinfo in ZONES[1:]:
+            for period in PERIODS:
+                result = list(bucketize(values, period, tzinfo))
+                self.assertEqual(result, grouped(values, period, tzinfo), (tzinfo, period))
+
+    def test_aware_in_own_timezone(self):
+        for tz in ZONES[1:]:
+            values = [tz.normalize(pytz.UTC.localize(dt)) for dt in SAMPLES]
+            for period in PERIODS:
+                result = list(bucketize(values, period))
+                expected = grouped(values, period, None)
+                self.assertEqual(result, expected, (tz, period))
+                self.assertEqual([start.tzinfo for start, _ in result], [start.tzinfo for start, _ in expected])
+
+    def test_key(self):
+        records = [{'at': dt, 'n': n} for n, dt in enumerate(SAMPLES[:500])]
+        key = lambda record: record['at']  # noqa: E731
+        tz = pytz.timezone('America/Sao_Paulo')
+
+        result = list(bucketize(records, 'hour', tz, key=key))
+        self.assertEqual(result, grouped(records, 'hour', tz, key=key))
+
+    def test_unsorted(self):
+        values = SAMPLES[:300] + SAMPLES[100:200] + SAMPLES[250:400]
+        result = list(bucketize(values, 'hour', pytz.timezone('Asia/Amman')))
+        self.assertEqual(result, grouped(values, 'hour', pytz.timezone('Asia/Amman')))
+
+    def test_empty(self):
+        self.assertEqual(list(bucketize([], 'hour')), [])
+
+    def test_lazy(self):
+        def forever():
+            dt = datetime(2015, 1, 1)
+            while True:
+                yield dt
+                dt += timedelta(minutes=1)
+
+        result = list(islice(bucketize(forever(), 'hour'), 3))
+        self.assertEqual([start for start, _ in result],
+                         [datetime(2015, 1, 1), datetime(2015, 1, 1, 1), datetime(2015, 1, 1, 2)])
+        self.assertEqual([len(items) for _, items in result], [60, 60, 60])
+
+
+class TestWatermarkBucketize(TestCase):
+
+    def test_sorted(self):
+        for tzinfo in ZONES:
+            for period in PERIODS:
+                late = []
+                result = list(watermark_bucketize(SAMPLES, period, tzinfo, late=late.append))
+                self.assertEqual(result, closed(SAMPLES, period, tzinfo), (tzinfo, period))
+                self.assertEqual(late, [])
+                # a wall time the clocks go back over is one period, else these are the groups of bucketize
+                if tzinfo in ZONES[:5]:
+                    self.assertEqual(result, grouped(SAMPLES, period, tzinfo), (tzinfo, period))
+
+    def test_aware_in_own_timezone(self):
+        for tz in ZONES[1:]:
+            values = [tz.normalize(pytz.UTC.localize(dt)) for dt in SAMPLES]
+            for period in PERIODS:
+                result = list(watermark_bucketize(values, period))
+                self.assertEqual(result, closed(values, period, None), (tz, period))
+
+    def test_within_lateness(self):
+        # items at most lateness behind the latest one are grouped, in the order they came
+        rnd = random.Random(1)
+        values = sorted(SAMPLES[:2000], key=lambda dt: dt + timedelta(minutes=rnd.uniform(0, 90)))
+        tz = pytz.timezone('Asia/Amman')
+        for period in PERIODS:
+            late = []
+            result = list(watermark_bucketize(values, period, tz, timedelta(minutes=90), late=late.append))
+            self.assertEqual(late, [], period)
+            self.assertEqual(sorted(item for _, items in result for item in items), sorted(values), period)
+            for start, items in result:
+                self.assertEqual(set(datetime_utils.round_datetime_down(dt, period, tz) for dt in items), {start})
+            self.assertEqual(len(set(start for start, _ in result)), len(result), period)
+
+    def test_late(self):
+        # items for periods the watermark has passed are given to late
+        records = [{'at': datetime(2015, 1, 5, hour, minute)} for hour, minute in
+                   ((1, 10), (2, 5), (1, 50), (2, 40), (1, 55), (3, 30), (2, 59), (1, 0))]
+        late = []
+        result = list(watermark_bucketize(records, 'hour', lateness=timedelta(minutes=20),
+                                          key=lambda record: record['at'], late=late.append))
+        self.assertEqual([(start.hour, [record['at'].minute for record in items]) for start, items in result],
+                         [(1, [10, 50]), (2, [5, 40]), (3, [30])])
+        self.assertEqual([(record['at'].hour, record['at'].minute) for record in late], [(1, 55), (2, 59), (1, 0)])
+
+        # without late they are dropped
+        values = [record['at'] for record in records]
+        self.assertEqual(list(watermark_bucketize(values, 'hour', lateness=timedelta(minutes=20))),
+                         [(start, [record['at'] for record in items]) for start, items in result])
+
+    def test_bounded(self):
+        # only the periods within lateness of the latest item are held
+        def forever():
+            dt = datetime(2015, 1, 1)
+            while True:
+                yield dt
+                yield dt - timedelta(minutes=25)
+                dt += timedelta(minutes=1)
+
+        result = list(islice(watermark_bucketize(forever(), 'minute-10', 'Europe/London', timedelta(minutes=30)),
+                             1000))
+        self.assertEqual([len(items) for _, items in result[3:]], [20] * 997)
+        self.assertEqual(str(result[-1][0]), '2015-01-07 22:00:00')
+
+    def test_empty(self):
+        self.assertEqual(list(watermark_bucketize([], 'hour')), [])
+        with self.assertRaises(Exception):
+            list(watermark_bucketize([datetime(2015, 1, 1)], 'fortnight'))
+
+
+if __name__ == '__main__':
+    main()
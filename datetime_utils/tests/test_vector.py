@@ -0,0 +1,171 @@
+"""
+Tests for the numpy rounding functions.
+"""
+from datetime import datetime, timedelta
+from unittest import TestCase, main, skipIf
+
+import pytz
+
+from datetime_utils import datetime_utils
+from datetime_utils.tests.fixtures import EPOCH, PERIODS, ZONES, sample_datetimes
+
+try:
+    import numpy
+    from datetime_utils import vector
+except ImportError:
+    numpy = None
+
+
+def to_array(samples):
+    return numpy.array([dt - EPOCH for dt in samples], dtype='timedelta64[us]') + numpy.datetime64(0, 'us')
+
+
+def to_datetimes(array):
+    return [EPOCH + timedelta(microseconds=int(us)) for us in array.astype('datetime64[us]').view(numpy.int64)]
+
+
+@skipIf(numpy is None, 'numpy is not installed')
+class TestVectorMatchesScalar(TestCase):
+
+    samples = sample_datetimes()
+
+    def assert_matches(self, vector_function, scalar_function, **kwargs):
+        for tzinfo in ZONES:
+            for period in PERIODS:
+                result = to_datetimes(vector_function(to_array(self.samples), period, tzinfo=tzinfo, **kwargs))
+                expected = [scalar_function(dt, period, tzinfo=tzinfo, **kwargs) for dt in self.samples]
+                self.assertEqual(result, expected, (tzinfo, period))
+
+    def test_round_datetime_down(self):
+        self.assert_matches(vector.round_datetime_down, datetime_utils.round_datetime_down)
+
+    def test_round_datetime_down_force(self):
+        self.assert_matches(vector.round_datetime_down, datetime_utils.round_datetime_down, force=True)
+
+    def test_round_datetime_up(self):
+        self.assert_matches(vector.round_datetime_up, datetime_utils.round_datetime_up)
+
+    def test_round_datetime_up_force(self):
+        self.assert_matches(vector.round_datetime_up, datetime_utils.round_datetime_up, force=True)
+
+    def test_round_datetime(self):
+        self.assert_matches(vector.round_datetime, datetime_utils.round_datetime)
+
+    def test_round_datetime_force(self):
+        self.assert_matches(vector.round_datetime, datetime_utils.round_datetime, force=True)
+
+    def test_is_snapped_to(self):
+        for tzinfo in ZONES:
+            for period in ['minute', 'minute-15', 'hour', 'day']:
+                result = list(vector.is_snapped_to(to_array(self.samples), period, tzinfo=tzinfo))
+                expected = [
+                    datetime_utils.is_snapped_to(pytz.UTC.localize(dt) if tzinfo else dt, period, tzinfo=tzinfo)
+                    for dt in self.samples
+                ]
+                self.assertEqual(result, expected, (tzinfo, period))
+
+
+@skipIf(numpy is None, 'numpy is not installed')
+class TestVectorValues(TestCase):
+    tz = pytz.timezone('America/Los_Angeles')
+
+    def test_keeps_datetime64_unit(self):
+        for unit in ('s', 'ms', 'us', 'ns'):
+            values = numpy.array(['2013-04-05T02:33:45'], dtype='datetime64[%s]' % unit)
+            result = vector.round_datetime_down(values, 'hour')
+            self.assertEqual(result.dtype, values.dtype)
+            self.assertEqual(result[0], numpy.datetime64('2013-04-05T02:00'))
+
+    def test_coarse_datetime64_units(self):
+        values = numpy.array(['2013-04-05T02:33'], dtype='datetime64[s]')
+        for unit in ('m', 'h', 'D', '10s'):
+            coarse = values.astype('datetime64[%s]' % unit)
+            result = vector.round_datetime_down(coarse, 'day', self.tz)
+            self.assertEqual(result.dtype, numpy.dtype('datetime64[us]'))
+            expected = datetime_utils.round_datetime_down(to_datetimes(coarse)[0], 'day', self.tz)
+            self.assertEqual(to_datetimes(result), [expected])
+
+    def test_dates(self):
+        values = numpy.array(['2013-04-05', '2013-04-06', 'NaT'], dtype='datetime64[D]')
+        result = vector.round_datetime_up(values, 'week')
+        self.assertEqual(list(result[:2]), [numpy.datetime64('2013-04-08')] * 2)
+        self.assertTrue(numpy.isnat(result[2]))
+        self.assertEqual(list(vector.is_snapped_to(values, 'day')), [True, True, False])
+
+    def test_integer_units(self):
+        seconds = int((datetime(2013, 4, 5, 2, 33) - EPOCH).total_seconds())
+        expected = int((datetime(2013, 4, 4, 7) - EPOCH).total_seconds())
+        values = numpy.array([seconds], dtype=numpy.int64)
+
+        self.assertEqual(list(vector.round_datetime_down(values, 'day', self.tz)), [expected])
+        self.assertEqual(list(vector.round_datetime_down(values * 1000, 'day', self.tz, unit='ms')), [expected * 1000])
+        self.assertEqual(list(vector.round_datetime_down(values * 10 ** 9, 'day', self.tz, unit='ns')),
+                         [expected * 10 ** 9])
+
+    def test_is_snapped_to_integers(self):
+        seconds = int((datetime(2013, 4, 5, 7) - EPOCH).total_seconds())
+        values = numpy.array([seconds, seconds + 60], dtype=numpy.int64)
+
+        self.assertEqual(list(vector.is_snapped_to(values, 'day', self.tz)), [True, False])
+        self.assertEqual(list(vector.is_snapped_to(values * 1000, 'minute', unit='ms')), [True, True])
+
+    def test_multiples(self):
+        # the clocks in Berlin went back from 03:00 to 02:00 on 2015-10-25,
+        # the second 02:00 is 01:00 UTC
+        values = numpy.array(['2015-10-25T00:00', '2015-10-25T01:00', '2015-10-25T01:30'], dtype='datetime64[s]')
+        berlin = pytz.timezone('Europe/Berlin')
+
+        self.assertEqual(list(vector.is_snapped_to(values, 'hour-2', berlin)), [True, True, False])
+        self.assertEqual(list(vector.is_snapped_to(values, 'hour-3', berlin)), [False, False, False])
+        self.assertEqual(vector.round_datetime_down(values, 'year-10')[0], numpy.datetime64('2010-01-01'))
+        self.assertEqual(vector.round_datetime_up(values, 'month-2')[0], numpy.datetime64('2015-11-01'))
+
+    def test_sub_second(self):
+        values = numpy.array(['2013-04-05T02:33:45.123456789', '2013-04-05T02:33:45.1'], dtype='datetime64[ns]')
+
+        self.assertEqual(list(vector.round_datetime_down(values, 'millisecond-100', self.tz)),
+                         list(numpy.array(['2013-04-05T02:33:45.1'] * 2, dtype='datetime64[ns]')))
+        self.assertEqual(vector.round_datetime_up(values, 'microsecond-250')[0],
+                         numpy.datetime64('2013-04-05T02:33:45.123500', 'ns'))
+        self.assertEqual(vector.round_datetime(values, 'millisecond')[0], numpy.datetime64('2013-04-05T02:33:45.123'))
+        self.assertEqual(list(vector.is_snapped_to(values, 'millisecond-100')), [False, True])
+
+    def test_repeated_hour(self):
+        values = numpy.array(['2015-11-01T05:30:00.0005', '2015-11-01T06:30:00.0006'], dtype='datetime64[us]')
+        ny = pytz.timezone('America/New_York')
+        self.assertEqual(list(vector.round_datetime_up(values, 'microsecond-250', ny)),
+                         list(numpy.array(['2015-11-01T06:00', '2015-11-01T06:30:00.00075'], dtype='datetime64[us]')))
+
+        values = numpy.array(['2015-10-25T01:30:00.0005'], dtype='datetime64[us]')
+        self.assertEqual(vector.round_datetime_up(values, 'millisecond', pytz.timezone('Europe/Dublin'))[0],
+                         numpy.datetime64('2015-10-25T02:00'))
+
+    def test_nanoseconds_between_microseconds(self):
+        values = numpy.array(['2013-04-05T02:00:00.000000001'], dtype='datetime64[ns]')
+        self.assertEqual(vector.round_datetime_down(values, 'hour')[0], numpy.datetime64('2013-04-05T02:00'))
+        self.assertEqual(vector.round_datetime_up(values, 'hour')[0], numpy.datetime64('2013-04-05T03:00'))
+        self.assertFalse(vector.is_snapped_to(values, 'hour')[0])
+
+    def test_nat(self):
+        values = numpy.array(['2013-04-05T02:33', 'NaT'], dtype='datetime64[s]')
+        result = vector.round_datetime_up(values, 'hour', self.tz)
+        self.assertEqual(result[0], numpy.datetime64('2013-04-05T03:00'))
+        self.assertTrue(numpy.isnat(result[1]))
+        self.assertEqual(list(vector.is_snapped_to(values, 'hour')), [False, False])
+
+    def test_unrecognized(self):
+        values = numpy.array(['2013-04-05T02:33'], dtype='datetime64[s]')
+        with self.assertRaises(Exception):
+            vector.round_datetime_down(values, 'fortnight')
+        with self.assertRaises(Exception):
+            vector.round_datetime(values, 'second-0')
+        with self.assertRaises(Exception):
+            vector.is_snapped_to(values, 'week-01')
+        with self.assertRaises(Exception):
+            vector.round_datetime_down(values.astype('datetime64[ps]'), 'day')
+        with self.assertRaises(Exception):
+            vector.round_datetime_down(numpy.array([1.5]), 'day')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+"""
+Tests for tumbling window aggregation.
+"""
+import random
+from datetime import datetime, timedelta
+from unittest import TestCase, main
+
+import pytz
+
+from datetime_utils import HoppingWindowAggregator, bucket_end, bucket_id, datetime_utils, hopping_windows
+from datetime_utils.tests.fixtures import PERIODS, ZONES, sample_datetimes
+from datetime_utils.windows import WindowAggregator
+
+AGGREGATIONS = ('count', 'sum', 'min', 'max', 'mean')
+
+
+def to_utc(dt):
+    if dt.tzinfo is None:
+        return dt
+    return dt.replace(tzinfo=None) - dt.utcoffset()
+
+
+def aggregate(records, period, tzinfo):
+    # the windows of records as round_datetime_down has them, by their UTC start
+    windows = {}
+    for dt, value in records:
+        start = to_utc(datetime_utils.round_datetime_down(dt, period, tzinfo or pytz.UTC))
+        windows.setdefault(start, []).append(value)
+    return dict((start, {'count': len(values), 'sum': sum(values), 'min': min(values), 'max': max(values),
+                         'mean': sum(values) / len(values)}) for start, values in windows.items())
+
+
+class TestWindowsMatchScalar(TestCase):
+
+    samples = sample_datetimes()
+
+    def test_sorted(self):
+        rnd = random.Random(1)
+        for tzinfo in ZONES:
+            for period in PERIODS:
+                records = [(dt, rnd.randint(-100, 100)) for dt in self.samples]
+                aggregator = WindowAggregator(period, tzinfo, AGGREGATIONS)
+                windows = []
+                for chunk in range(0, len(records), 50):
+                    windows += aggregator.add_many(records[chunk:chunk + 50])
+                self.assertTrue(len(aggregator) <= 2, (tzinfo, period))
+                windows += aggregator.flush()
+                message = (tzinfo, period)
+
+                self.assertEqual(dict((to_utc(window.start), window.aggregates) for window in windows),
+                                 aggregate(records, period, tzinfo), message)
+                self.assertEqual(len(aggregator), 0, message)
+                self.assertEqual(aggregator.late, 0, message)
+                for window in windows:
+                    self.assertEqual(window.end, bucket_end(window.bucket, period, tzinfo), message)
+                    self.assertEqual(window.bucket, bucket_id(window.start, period, tzinfo), message)
+                # in the order they end
+                self.assertEqual([to_utc(window.end) for window in windows],
+                                 sorted(to_utc(window.end) for window in windows), message)
+
+    def test_out_of_order(self):
+        # values for windows that have closed are late; the rest are aggregated
+        tz = pytz.timezone('Asia/Amman')
+        records = [(dt, 1) for dt in self.samples]
+        random.Random(2).shuffle(records)
+        for period in PERIODS:
+            aggregator = WindowAggregator(period, tz, ('count',))
+            windows, latest, on_time = [], None, []
+            for dt, value in records:
+                end = to_utc(bucket_end(bucket_id(dt, period, tz), period, tz))
+                if latest is None or end > latest:
+                    on_time.append((dt, value))
+                windows += aggregator.add(dt, value)
+                latest = max(latest or to_utc(dt), to_utc(dt))
+            windows += aggregator.flush()
+            self.assertEqual(aggregator.late, len(records) - len(on_time), period)
+            self.assertEqual(dict((to_utc(window.start), window.aggregates['count']) for window in windows),
+                             dict((start, aggregates['count'])
+                                  for start, aggregates in aggregate(on_time, period, tz).items()), period)
+
+
+class TestWindowAggregator(TestCase):
+
+    def test_dst(self):
+        # the day the clocks in New York went back is 25 hours long
+        tz = pytz.timezone('America/New_York')
+        aggregator = WindowAggregator('day', 'America/New_York', ('count', 'sum'))
+        start = tz.localize(datetime(2015, 10, 31, 23))
+        windows = aggregator.add_many((start + timedelta(hours=hour), hour) for hour in range(28))
+        self.assertEqual([(str(window.start), str(window.end), window.aggregates) for window in windows], [
+            ('2015-10-31 00:00:00-04:00', '2015-11-01 00:00:00-04:00', {'count': 1, 'sum': 0}),
+            ('2015-11-01 00:00:00-04:00', '2015-11-02 00:00:00-05:00', {'count': 25, 'sum': 325}),
+        ])
+        self.assertEqual([window.aggregates for window in aggregator.flush()], [{'count': 2, 'sum': 26 + 27}])
+
+    def test_memory(self):
+        aggregator = WindowAggregator('minute', aggregations=('count', 'max'))
+        empty = aggregator.memory_usage()
+        start = datetime(2015, 1, 5)
+        aggregator.add_many((start + timedelta(minutes=minute), minute) for minute in range(0, 600, 60))
+        aggregator.add_many((start + timedelta(minutes=minute), minute) for minute in range(30, 630, 60))
+        self.assertEqual(len(aggregator), 1)
+        self.assertEqual(aggregator.late, 9)
+        self.assertTrue(empty < aggregator.memory_usage() < empty + 1000)
+
+        # out of order within the open windows
+        aggregator = WindowAggregator('hour', aggregations=('count', 'max'))
+        self.assertEqual(aggregator.add_many([(start + timedelta(minutes=minute), minute) for minute in (50, 10, 30)]),
+                         [])
+        used = aggregator.memory_usage()
+        aggregator.add_many((start + timedelta(seconds=second), second) for second in range(3600))
+        self.assertEqual(aggregator.memory_usage(), used)
+        window, = aggregator.add(start + timedelta(hours=1), 0)
+        self.assertEqual(window.aggregates, {'count': 3603, 'max': 3599})
+
+    def test_aware(self):
+        aggregator = WindowAggregator('hour')
+        aggregator.add(pytz.timezone('Asia/Kolkata').localize(datetime(2015, 1, 5, 10, 40)))
+        window, = aggregator.flush()
+        self.assertEqual(window.start, datetime(2015, 1, 5, 5))
+        self.assertEqual(aggregator.flush(), [])
+
+        # without a timezone aware datetimes are in the windows of UTC, not their own
+        dt = pytz.timezone('America/New_York').localize(datetime(2013, 4, 5, 22))
+        aggregator = WindowAggregator('day')
+        aggregator.add(dt)
+        window, = aggregator.flush()
+        self.assertEqual(window.start, datetime(2013, 4, 6))
+        self.assertEqual(to_utc(window.start), to_utc(datetime_utils.round_datetime_down(dt, 'day', pytz.UTC)))
+        aggregator = WindowAggregator('day', 'America/New_York')
+        aggregator.add(dt)
+        window, = aggregator.flush()
+        self.assertEqual(window.start, datetime_utils.round_datetime_down(dt, 'day'))
+
+    def test_errors(self):
+        with self.assertRaises(Exception):
+            WindowAggregator('hour', aggregations=('median',))
+        with self.assertRaises(Exception):
+            WindowAggregator('fortnight')
+
+
+class TestHoppingWindowsMatchScalar(TestCase):
+
+    samples = sample_datetimes()
+
+    def test_windows(self):
+        # every window is the values of its panes, as bucket_id has them
+        rnd = random.Random(3)
+        for tzinfo in ZONES:
+            for size, hop in (('hour', 'minute-15'), ('day', 'hour'), ('week', 'day'), ('year', 'month')):
+                records = [(dt, rnd.randint(-100, 100)) for dt in self.samples]
+                aggregator = HoppingWindowAggregator(size, hop, tzinfo, AGGREGATIONS)
+                windows = []
+                for chunk in range(0, len(records), 50):
+                    windows += aggregator.add_many(records[chunk:chunk + 50])
+                windows += aggregator.flush()
+                message = (tzinfo, size, hop)
+
+                expected = {}
+                for dt, value in records:
+                    pane = bucket_id(dt, hop, tzinfo or pytz.UTC)
+                    for first in range(pane - aggregator.panes + 1, pane + 1):
+                        expected.setdefault(first, []).append(value)
+                self.assertEqual([window.bucket for window in windows], sorted(expected), message)
+                for window in windows:
+                    values = expected[window.bucket]
+                    self.assertEqual(window.aggregates, {
+                        'count': len(values), 'sum': sum(values), 'min': min(values), 'max': max(values),
+                        'mean': sum(values) / len(values)}, message)
+                    self.assertEqual(window.end, bucket_end(window.bucket + aggregator.panes - 1, hop, tzinfo),
+                                     message)
+                self.assertEqual(len(aggregator), 0, message)
+
+                for dt, _ in records[::20]:
+                    pane = bucket_id(dt, hop, tzinfo or pytz.UTC)
+                    starts = [window.start for window in windows
+                              if window.bucket <= pane < window.bucket + aggregator.panes]
+                    self.assertEqual([start for start, _ in hopping_windows(dt, size, hop, tzinfo)], starts, message)
+
+    def test_tumbling(self):
+        # windows as long as their hop are those of WindowAggregator
+        tz = pytz.timezone('Canada/Newfoundland')
+        records = [(dt, 1) for dt in self.samples]
+        for period in PERIODS:
+            hopping = HoppingWindowAggregator(period, period, tz)
+            tumbling = WindowAggregator(period, tz)
+            self.assertEqual(hopping.add_many(records) + hopping.flush(), tumbling.add_many(records) + tumbling.flush(),
+                             period)
+
+
+class TestHoppingWindowAggregator(TestCase):
+
+    def test_dst(self):
+        # days starting every hour are 25 hours long across the clocks in
+        # New York going back, and 23 across them going forward
+        tz = pytz.timezone('America/New_York')
+        for start, hours in ((datetime(2015, 11, 1), 25), (datetime(2015, 3, 8), 23)):
+            start = tz.localize(start)
+            aggregator = HoppingWindowAggregator('day', 'hour', tz, ('count',))
+            windows = aggregator.add_many((tz.normalize(start + timedelta(minutes=minute)), None)
+                                          for minute in range(0, hours * 60, 10))
+            windows += aggregator.flush()
+            window = [window for window in windows if window.start == start][0]
+            self.assertEqual(window.end - window.start, timedelta(hours=hours))
+            self.assertEqual(window.aggregates, {'count': hours * 6})
+            self.assertEqual([(str(start), str(end)) for start, end in hopping_windows(start, 'day', 'hour', tz)][-1],
+                             (str(window.start), str(window.end)))
+
+    def test_skipped_panes(self):
+        # the clocks in New York went forward from 02:00 EST to 03:00 EDT, so
+        # windows from the panes in between start at the jump
+        tz = pytz.timezone('America/New_York')
+        dt = pytz.UTC.localize(datetime(2015, 3, 8, 7, 5))
+        expected = [('2015-03-08 03:00:00-04:00', '2015-03-08 03:%s:00-04:00' % minute) for minute in (15, 30, 45)] + \
+            [('2015-03-08 03:00:00-04:00', '2015-03-08 04:00:00-04:00')]
+        self.assertEqual([(str(start), str(end)) for start, end in hopping_windows(dt, 'hour', 'minute-15', tz)],
+                         expected)
+
+        aggregator = HoppingWindowAggregator('hour', 'minute-15', tz)
+        aggregator.add(dt)
+        windows = aggregator.flush()
+        self.assertEqual([(str(window.start), str(window.end)) for window in windows], expected)
+        for window in windows:
+            self.assertLess(window.start, window.end)
+            self.assertTrue(window.start <= dt < window.end)
+
+    def test_memory(self):
+        # only the panes of the open windows are kept
+        aggregator = HoppingWindowAggregator('hour', 'minute')
+        start = datetime(2015, 1, 5)
+        aggregator.add_many((start + timedelta(seconds=second), None) for second in range(0, 7200, 10))
+        used = aggregator.memory_usage()
+        self.assertTrue(len(aggregator) <= 61)
+        windows = aggregator.add_many((start + timedelta(seconds=second), None) for second in range(7200, 86400, 10))
+        self.assertEqual(len(windows), 1320)
+        self.assertTrue(len(aggregator) <= 61)
+        self.assertTrue(aggregator.memory_usage() < used + 1000)
+
+        # gaps are skipped, and values for windows that have closed are late
+        windows = aggregator.add(start + timedelta(days=10))
+        self.assertEqual(len(windows), 60)
+        self.assertEqual(aggregator.add(start), [])
+        self.assertEqual(aggregator.late, 1)
+        self.assertEqual([window.start for window in aggregator.flush()],
+                         [start + timedelta(days=10, minutes=minute) for minute in range(-59, 1)])
+        self.assertEqual((len(aggregator), aggregator.flush()), (0, []))
+
+    def test_errors(self):
+        for size, hop in (('hour', 'minute-7'), ('month', 'day'), ('day', 'month'), ('quarter', 'month-2')):
+            with self.assertRaises(Exception):
+                HoppingWindowAggregator(size, hop)
+            with self.assertRaises(Exception):
+                hopping_windows(datetime(2015, 1, 5), size, hop)
+
+
+if __name__ == '__main__':
+    main()
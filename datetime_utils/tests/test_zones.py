@@ -0,0 +1,168 @@
+"""
+Tests for the timezone backends.
+"""
+from datetime import datetime, timedelta
+from unittest import TestCase, main, skipIf
+
+import pytz
+
+from datetime_utils import ceil_epoch, datetime_utils, floor_epoch, get_timezone, tzif, zones
+from datetime_utils.periods import SECOND
+from datetime_utils.tests.fixtures import PERIODS, sample_datetimes, to_seconds
+
+try:
+    from datetime import timezone
+    import zoneinfo
+except ImportError:
+    zoneinfo = None
+
+# the DST zones of the fixtures, which both backends have the same history for
+NAMES = [
+    'Canada/Newfoundland', 'America/Sao_Paulo', 'Asia/Amman', 'America/Los_Angeles', 'Australia/Lord_Howe',
+]
+
+
+@skipIf(zoneinfo is None, 'zoneinfo is not available')
+class TestZoneInfo(TestCase):
+
+    samples = sample_datetimes()
+    ny = zoneinfo.ZoneInfo('America/New_York') if zoneinfo else None
+
+    def test_same_instants_as_pytz(self):
+        for name in NAMES:
+            for period in PERIODS:
+                for function in (datetime_utils.round_datetime_down, datetime_utils.round_datetime_up,
+                                 datetime_utils.round_datetime):
+                    for force in (False, True):
+                        result = [function(dt, period, zoneinfo.ZoneInfo(name), force) for dt in self.samples]
+                        expected = [function(dt, period, pytz.timezone(name), force) for dt in self.samples]
+                        self.assertEqual(result, expected, (name, period, function, force))
+
+    def test_aware_results(self):
+        # the same instants, in the datetime's own zoneinfo timezone
+        for name in NAMES:
+            tz, pytz_tz = zoneinfo.ZoneInfo(name), pytz.timezone(name)
+            for period in ('minute-15', 'hour', 'day'):
+                for dt in self.samples[::7]:
+                    aware = dt.replace(tzinfo=timezone.utc).astimezone(tz)
+                    pytz_aware = pytz_tz.fromutc(dt.replace(tzinfo=pytz_tz))
+                    for function in (datetime_utils.round_datetime_down, datetime_utils.round_datetime_up):
+                        result = function(aware, period)
+                        expected = function(pytz_aware, period)
+                        self.assertIs(result.tzinfo, tz)
+                        self.assertEqual(result.timestamp(), expected.timestamp(), (name, period, dt))
+                        self.assertEqual(result.utcoffset(), expected.utcoffset())
+
+    def test_fold(self):
+        # the clocks in New York went back from 02:00 EDT to 01:00 EST on 2015-11-01
+        first = datetime(2015, 11, 1, 1, 30, tzinfo=self.ny)
+        second = first.replace(fold=1)
+
+        result = datetime_utils.round_datetime_up(first, 'hour', self.ny)
+        self.assertEqual((result.replace(tzinfo=None), result.fold), (datetime(2015, 11, 1, 1), 1))
+        self.assertEqual(result.utcoffset(), timedelta(hours=-5))
+
+        result = datetime_utils.round_datetime_up(second, 'hour', self.ny)
+        self.assertEqual((result.replace(tzinfo=None), result.fold), (datetime(2015, 11, 1, 2), 0))
+        self.assertEqual(result.utcoffset(), timedelta(hours=-5))
+
+        result = datetime_utils.round_datetime_down(second, 'minute-15', self.ny)
+        self.assertEqual((result.replace(tzinfo=None), result.fold), (datetime(2015, 11, 1, 1, 30), 1))
+        self.assertTrue(datetime_utils.is_snapped_to(second, 'minute-15'))
+
+    def test_iter_periods(self):
+        # 01:00 EDT is not a boundary, as 01:00 is taken to be EST
+        start = datetime(2015, 11, 1, tzinfo=self.ny)
+        result = list(datetime_utils.iter_periods(start, datetime(2015, 11, 1, 9), 'hour', self.ny))
+        self.assertEqual([(dt.hour, dt.fold) for dt in result], [(0, 0), (1, 1), (2, 0), (3, 0)])
+
+        ny = pytz.timezone('America/New_York')
+        expected = datetime_utils.iter_periods(ny.localize(datetime(2015, 11, 1)), datetime(2015, 11, 1, 9), 'hour', ny)
+        self.assertEqual([dt.timestamp() for dt in result], [dt.timestamp() for dt in expected])
+
+    def test_table(self):
+        for name in NAMES:
+            table = zones.get_zone_table(zoneinfo.ZoneInfo(name))
+            pytz_table = zones.get_zone_table(pytz.timezone(name))
+            for dt in self.samples[::11]:
+                utc = to_seconds(dt) * SECOND
+                self.assertEqual(table.to_local(utc)[0], pytz_table.to_local(utc)[0], (name, dt))
+            self.assertTrue(table.fold)
+
+        self.assertTrue(zones.get_zone_table(zoneinfo.ZoneInfo('UTC')).fixed)
+        self.assertEqual(zones.get_zone_table(zoneinfo.ZoneInfo('Etc/GMT+5')).offsets, [-5 * 3600 * SECOND])
+
+    def test_intervals(self):
+        # from 1970 to 2000 New York is EST, then EDT and EST every year
+        end = to_seconds(datetime(2000, 1, 1)) * SECOND
+        starts, kinds = tzif.zoneinfo_intervals(self.ny, 0, end)
+        self.assertEqual(starts[0], 0)
+        self.assertLess(starts[-1], end)
+        self.assertEqual(len(starts), 61)
+        self.assertEqual(kinds[:2], [(-5 * 3600 * SECOND, False, 'EST'), (-4 * 3600 * SECOND, True, 'EDT')])
+
+    def test_without_file(self):
+        # a zone made from a file object is sampled instead
+        with tzif._open('America/New_York') as f:
+            data = f.read()
+            f.seek(0)
+            tz = zoneinfo.ZoneInfo.from_file(f)
+        table = zones.get_zone_table(tz)
+        expected = zones.get_zone_table(self.ny)
+        for dt in self.samples:
+            utc = to_seconds(dt) * SECOND
+            self.assertEqual(table.to_local(utc), expected.to_local(utc))
+        self.assertEqual(len(table.starts), len(expected.starts))
+
+        # the 32-bit data of version 1 alone
+        times, kinds, before, rules = tzif.read_tzif(data[:4] + b'\0' + data[5:])
+        self.assertEqual(times[1:5], tzif.read_tzif(data)[0][1:5])
+        self.assertEqual(before, (-(4 * 3600 + 56 * 60 + 2) * SECOND, False, 'LMT'))
+        self.assertFalse(rules)
+
+        with self.assertRaises(Exception):
+            tzif.read_tzif(b'not a TZif file')
+
+    def test_tzdata(self):
+        # a zone that is not on TZPATH is looked up in the tzdata package, if installed
+        path = zoneinfo.TZPATH
+        zoneinfo.reset_tzpath([])
+        try:
+            f = tzif._open('America/New_York')
+        finally:
+            zoneinfo.reset_tzpath(path)
+        if f is not None:
+            with f:
+                self.assertEqual(f.read(4), b'TZif')
+        self.assertIsNone(tzif._open('No/Such_Zone'))
+
+
+class TestZoneNames(TestCase):
+
+    def test_get_timezone(self):
+        tz = get_timezone('America/Los_Angeles')
+        self.assertEqual(str(tz), 'America/Los_Angeles')
+        self.assertIs(get_timezone('UTC'), zones.UTC)
+        for name in ('No/Such_Zone', '../etc/passwd'):
+            with self.assertRaises(Exception):
+                get_timezone(name)
+
+    def test_names(self):
+        dt = datetime(2013, 4, 5, 2, 33)
+        la = pytz.timezone('America/Los_Angeles')
+        for period in PERIODS:
+            self.assertEqual(datetime_utils.round_datetime_down(dt, period, 'America/Los_Angeles'),
+                             datetime_utils.round_datetime_down(dt, period, la))
+            self.assertEqual(datetime_utils.round_datetime(dt, period, 'America/Los_Angeles'),
+                             datetime_utils.round_datetime(dt, period, la))
+            self.assertEqual(floor_epoch(to_seconds(dt), period, 'America/Los_Angeles'),
+                             floor_epoch(to_seconds(dt), period, la))
+            self.assertEqual(ceil_epoch(to_seconds(dt), period, 'UTC'), ceil_epoch(to_seconds(dt), period, pytz.UTC))
+        self.assertTrue(datetime_utils.is_snapped_to(datetime(2013, 4, 5, 7), 'day', 'America/Los_Angeles'))
+
+        with self.assertRaises(Exception):
+            datetime_utils.round_datetime_down(dt, 'day', 'No/Such_Zone')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,15 @@
 """
 Tests for datetime helpers.
 """
-from datetime import datetime
+from datetime import datetime, timedelta, tzinfo
+from itertools import groupby
 from unittest import TestCase, main
 
 import pytz
+from pytz.tzinfo import DstTzInfo
 
 from datetime_utils import datetime_utils
+from datetime_utils.periods import Period, get_isoweek_monday
 
 
 class TestIsSnappedTo(TestCase):
@@ -70,6 +73,11 @@ class TestIsSnappedTo(TestCase):
         dt_fail = datetime(2015, 3, 1, 4, 1)
         self.assertFalse(datetime_utils.is_snapped_to(dt_fail, period))
 
+    def test_naive_dt_with_tzinfo(self):
+        # a naive datetime is taken as UTC: 2015-02-01 02:00 UTC is midnight in Sao Paulo's summer time
+        self.assertTrue(datetime_utils.is_snapped_to(datetime(2015, 2, 1, 2), 'day', self.tz_AmericaSaoPaulo))
+        self.assertFalse(datetime_utils.is_snapped_to(datetime(2015, 2, 1), 'day', self.tz_AmericaSaoPaulo))
+
     def test_min(self):
         period = 'minute'
 
@@ -278,6 +286,54 @@ class TestIsSnappedTo(TestCase):
         self.assertFalse(datetime_utils.is_snapped_to(dt_utc_fail, period, self.tz_AsiaAmman))
 
 
+class TestSnappedMask(TestCase):
+    ny = pytz.timezone('America/New_York')
+
+    def setUp(self):
+        # every 15 minutes across the New York fall back, in UTC and in New York
+        start = datetime(2015, 11, 1, 4)
+        self.utc = [start + timedelta(minutes=15 * i, seconds=i % 4 == 2) for i in range(24)]
+        self.local = [self.ny.normalize(pytz.UTC.localize(dt)) for dt in self.utc]
+
+    def test_matches_is_snapped_to(self):
+        for values, tz in ((self.utc, None), (self.utc, self.ny), (self.local, None), (self.local, pytz.UTC),
+                           (self.utc + self.local, None)):
+            for period in ('minute', 'minute-15', 'hour', 'day'):
+                expected = [datetime_utils.is_snapped_to(dt, period, tz) for dt in values]
+                self.assertEqual(list(datetime_utils.snapped_mask(values, period, tz)), expected)
+
+    def test_double_hour(self):
+        # 01:00 EST follows 01:59:59 EDT
+        mask = datetime_utils.snapped_mask(self.local, 'hour')
+        self.assertEqual([dt.strftime('%H:%M%z') for dt, snapped in zip(self.local, mask) if snapped],
+                         ['00:00-0400', '01:00-0400', '01:00-0500', '02:00-0500', '03:00-0500', '04:00-0500'])
+
+    def test_packed(self):
+        values = [datetime(2013, 3, 3, hour) for hour in range(0, 20, 2)] + [datetime(2013, 3, 3, 5, 1)]
+        self.assertEqual(datetime_utils.snapped_mask(values, 'hour'), bytearray([1] * 10 + [0]))
+        self.assertEqual(datetime_utils.snapped_mask(values, 'hour', packed=True), bytearray([0xff, 0xc0]))
+        self.assertEqual(datetime_utils.snapped_mask([], 'hour', packed=True), bytearray())
+
+    def test_all_snapped(self):
+        self.assertTrue(datetime_utils.all_snapped(self.utc[:2], 'minute-15'))
+        self.assertFalse(datetime_utils.all_snapped(self.utc, 'minute-15'))
+        self.assertTrue(datetime_utils.all_snapped([], 'minute-15'))
+
+    def test_first_unsnapped(self):
+        self.assertEqual(datetime_utils.first_unsnapped(self.utc, 'minute-15', self.ny), 2)
+        self.assertEqual(datetime_utils.first_unsnapped(self.utc, 'hour'), 1)
+        self.assertIsNone(datetime_utils.first_unsnapped(self.utc[:2], 'minute'))
+
+    def test_stops_at_the_first_unsnapped(self):
+        def values():
+            yield datetime(2013, 3, 3)
+            yield datetime(2013, 3, 3, 1)
+            raise AssertionError('read past the first unsnapped value')
+
+        self.assertFalse(datetime_utils.all_snapped(values(), 'day'))
+        self.assertEqual(datetime_utils.first_unsnapped(values(), 'day'), 1)
+
+
 class TestIsSnappedTo15Min(TestCase):
 
     # UTC/GMT -2:30 hours
@@ -899,5 +955,509 @@ class RoundDatetimeDown(TestCase):
         self.assertEqual(result, expected_result)
 
 
+class RoundDatetimeDownTransitions(TestCase):
+    # wall times that don't exist or exist twice are resolved the way
+    # pytz's localize(is_dst=False) resolves them
+
+    # UTC/GMT -3 hours
+    # Transition from 2015-10-18 00:00:00 -> 01:00:00 (midnight doesn't exist)
+    tz_AmericaSaoPaulo = pytz.timezone('America/Sao_Paulo')
+
+    # UTC/GMT +2 hours
+    # Transition from 2015-10-30 01:00:00 -> 00:00:00 (midnight exists twice)
+    tz_AsiaAmman = pytz.timezone('Asia/Amman')
+
+    def test_day_midnight_doesnt_exist(self):
+        dt = datetime(2015, 10, 18, 4)
+        expected_result = datetime(2015, 10, 18, 3)
+
+        result = datetime_utils.round_datetime_down(dt, 'day', tzinfo=self.tz_AmericaSaoPaulo)
+        self.assertEqual(result, expected_result)
+
+    def test_day_midnight_exists_twice(self):
+        dt = datetime(2015, 10, 29, 23, 30)
+        expected_result = datetime(2015, 10, 29, 22)
+
+        result = datetime_utils.round_datetime_down(dt, 'day', tzinfo=self.tz_AsiaAmman)
+        self.assertEqual(result, expected_result)
+
+    def test_hour_exists_twice(self):
+        expected_result = datetime(2015, 10, 29, 22)
+
+        # both 00:30s round to the second midnight
+        for dt in (datetime(2015, 10, 29, 21, 30), datetime(2015, 10, 29, 22, 30)):
+            result = datetime_utils.round_datetime_down(dt, 'hour', tzinfo=self.tz_AsiaAmman)
+            self.assertEqual(result, expected_result)
+
+    def assert_resolves_like_localize(self, tz, dt):
+        # rounding an already rounded wall time just resolves it to UTC
+        expected_result = tz.normalize(tz.localize(dt, is_dst=False))
+
+        result = datetime_utils.round_datetime_down(dt.replace(tzinfo=tz), 'minute')
+        self.assertEqual(result, expected_result)
+        self.assertIs(result.tzinfo, expected_result.tzinfo)
+
+    def test_ambiguous_standard_to_standard(self):
+        # Moscow went from UTC+4 to UTC+3 standard time on 2014-10-26 02:00,
+        # so 01:00-02:00 exists twice and neither candidate is DST
+        tz = pytz.timezone('Europe/Moscow')
+        for minute in (0, 30, 59):
+            self.assert_resolves_like_localize(tz, datetime(2014, 10, 26, 1, minute))
+
+    def test_ambiguous_dst_to_dst(self):
+        # London went from double summer time to summer time on 1947-08-10 03:00
+        tz = pytz.timezone('Europe/London')
+        for minute in (0, 30, 59):
+            self.assert_resolves_like_localize(tz, datetime(1947, 8, 10, 2, minute))
+
+    def test_interval_shorter_than_two_days(self):
+        # the offsets a day either side agree, yet neither applies in between
+        class ShortSummer(DstTzInfo):
+            zone = 'Test/ShortSummer'
+            _utc_transition_times = [datetime(1, 1, 1), datetime(2015, 6, 1), datetime(2015, 6, 1, 12)]
+            _transition_info = [
+                (timedelta(0), timedelta(0), 'STD'),
+                (timedelta(hours=1), timedelta(hours=1), 'DST'),
+                (timedelta(0), timedelta(0), 'STD'),
+            ]
+
+        tz = ShortSummer()
+        for hour in (0, 1, 6, 12, 13):
+            self.assert_resolves_like_localize(tz, datetime(2015, 6, 1, hour, 30))
+
+    def test_aware_result_keeps_dst_tzinfo(self):
+        dt = self.tz_AmericaSaoPaulo.localize(datetime(2015, 10, 18, 5, 30))
+        expected_result = self.tz_AmericaSaoPaulo.normalize(pytz.UTC.localize(datetime(2015, 10, 18, 3)))
+
+        result = datetime_utils.round_datetime_down(dt, 'day')
+        self.assertEqual(result, expected_result)
+        self.assertIs(result.tzinfo, expected_result.tzinfo)
+
+    def test_fixed_offset(self):
+        tz = pytz.FixedOffset(-150)
+        dt = tz.localize(datetime(2015, 3, 1, 4, 35))
+        expected_result = tz.localize(datetime(2015, 3, 1))
+
+        result = datetime_utils.round_datetime_down(dt, 'day')
+        self.assertEqual(result, expected_result)
+        self.assertIs(result.tzinfo, tz)
+
+    def test_unsupported_timezone(self):
+        class Local(tzinfo):
+            def utcoffset(self, dt):
+                return timedelta(hours=1)
+
+        with self.assertRaises(Exception):
+            datetime_utils.round_datetime_down(datetime(2015, 3, 1), 'day', tzinfo=Local())
+
+
+class RoundDatetimeUpTransitions(TestCase):
+    # the next boundary is found from the wall time, so a period that is
+    # longer than usual is never skipped or repeated
+
+    # UTC/GMT -3 hours
+    # Transition from 2015-10-18 00:00:00 -> 01:00:00 (midnight doesn't exist)
+    tz_AmericaSaoPaulo = pytz.timezone('America/Sao_Paulo')
+
+    # UTC/GMT +2 hours
+    # Transition from 2015-10-30 01:00:00 -> 00:00:00 (midnight exists twice)
+    tz_AsiaAmman = pytz.timezone('Asia/Amman')
+
+    def test_day_midnight_doesnt_exist(self):
+        dt = datetime(2015, 10, 17, 4)
+        expected_result = datetime(2015, 10, 18, 3)
+
+        result = datetime_utils.round_datetime_up(dt, 'day', tzinfo=self.tz_AmericaSaoPaulo)
+        self.assertEqual(result, expected_result)
+
+    def test_day_midnight_doesnt_exist_snapped(self):
+        dt = datetime(2015, 10, 18, 3)
+
+        result = datetime_utils.round_datetime_up(dt, 'day', tzinfo=self.tz_AmericaSaoPaulo)
+        self.assertEqual(result, dt)
+
+        # the day after the transition is 23 hours long
+        result = datetime_utils.round_datetime_up(dt, 'day', tzinfo=self.tz_AmericaSaoPaulo, force=True)
+        self.assertEqual(result, datetime(2015, 10, 19, 2))
+
+    def test_day_midnight_exists_twice(self):
+        dt = datetime(2015, 10, 28, 23)
+        expected_result = datetime(2015, 10, 29, 22)
+
+        result = datetime_utils.round_datetime_up(dt, 'day', tzinfo=self.tz_AsiaAmman)
+        self.assertEqual(result, expected_result)
+
+    def test_hour_exists_twice(self):
+        dt = datetime(2015, 10, 29, 21, 30)
+        expected_result = datetime(2015, 10, 29, 22)
+
+        result = datetime_utils.round_datetime_up(dt, 'hour', tzinfo=self.tz_AsiaAmman)
+        self.assertEqual(result, expected_result)
+
+        result = datetime_utils.round_datetime_up(expected_result, 'hour', tzinfo=self.tz_AsiaAmman, force=True)
+        self.assertEqual(result, datetime(2015, 10, 29, 23))
+
+    def test_day_25_hours_long(self):
+        # UTC/GMT -5 hours
+        # Transition from 2015-11-01 02:00:00 -> 01:00:00
+        tz = pytz.timezone('US/Eastern')
+        expected_result = datetime(2015, 11, 2, 5)
+
+        # adding a day to 00:30 EDT is still November 1 in EST
+        result = datetime_utils.round_datetime_up(datetime(2015, 11, 1, 4, 30), 'day', tzinfo=tz)
+        self.assertEqual(result, expected_result)
+
+        result = datetime_utils.round_datetime_up(datetime(2015, 11, 1, 4), 'day', tzinfo=tz, force=True)
+        self.assertEqual(result, expected_result)
+
+    def test_hour_exists_twice_force(self):
+        tz = pytz.timezone('US/Eastern')
+
+        # 01:00 EST follows 01:59 EDT
+        result = datetime_utils.round_datetime_up(datetime(2015, 11, 1, 5, 30), 'hour', tzinfo=tz)
+        self.assertEqual(result, datetime(2015, 11, 1, 6))
+
+        result = datetime_utils.round_datetime_up(datetime(2015, 11, 1, 6), 'hour', tzinfo=tz, force=True)
+        self.assertEqual(result, datetime(2015, 11, 1, 7))
+
+    def test_floor_later_than_input(self):
+        # UTC/GMT -3:30 hours
+        # Transition from 2008-03-09 00:01:00 -> 01:01:00
+        tz = pytz.timezone('Canada/Newfoundland')
+
+        # 01:01 floors to the non-existent 01:00, which resolves to 02:00,
+        # but 01:15 is the first boundary after it
+        dt = datetime(2008, 3, 9, 3, 31)
+        self.assertEqual(datetime_utils.round_datetime_down(dt, 'minute-15', tzinfo=tz), datetime(2008, 3, 9, 4, 30))
+        self.assertEqual(datetime_utils.round_datetime_up(dt, 'minute-15', tzinfo=tz), datetime(2008, 3, 9, 3, 45))
+
+        result = datetime_utils.round_datetime_up(datetime(2008, 3, 9, 3, 30), 'minute-15', tzinfo=tz, force=True)
+        self.assertEqual(result, datetime(2008, 3, 9, 3, 45))
+
+    def test_aware_without_tzinfo_snapped(self):
+        dt = self.tz_AsiaAmman.localize(datetime(2015, 10, 29))
+
+        result = datetime_utils.round_datetime_up(dt, 'day')
+        self.assertEqual(result, dt)
+        self.assertIs(result.tzinfo, dt.tzinfo)
+
+    def test_aware_without_tzinfo(self):
+        dt = self.tz_AsiaAmman.localize(datetime(2015, 10, 29, 2))
+        expected_result = self.tz_AsiaAmman.localize(datetime(2015, 10, 30), is_dst=False)
+
+        result = datetime_utils.round_datetime_up(dt, 'day')
+        self.assertEqual(result, expected_result)
+        self.assertIs(result.tzinfo, expected_result.tzinfo)
+
+
+class IterPeriods(TestCase):
+    # the boundaries are the distinct round_datetime_down results of every
+    # instant between start and end, starting from round_datetime_up(start)
+
+    # UTC/GMT -3 hours
+    # Transition from 2015-10-18 00:00:00 -> 01:00:00 (midnight doesn't exist)
+    tz_AmericaSaoPaulo = pytz.timezone('America/Sao_Paulo')
+
+    # UTC/GMT +2 hours
+    # Transition from 2015-10-30 01:00:00 -> 00:00:00 (midnight exists twice)
+    tz_AsiaAmman = pytz.timezone('Asia/Amman')
+
+    # UTC/GMT -5 hours
+    # Transition from 2015-11-01 02:00:00 -> 01:00:00
+    tz_USEastern = pytz.timezone('US/Eastern')
+
+    def boundaries(self, start, end, period, tzinfo=None, step=timedelta(minutes=5)):
+        # floor a grid of instants covering start to end, a period either side
+        first = datetime_utils.round_datetime_up(start, period, tzinfo)
+        length = datetime_utils.period_to_timedelta(period)
+        grid = []
+        dt = start - length - timedelta(hours=3)
+        while dt < end + length:
+            grid.append(dt)
+            dt += step
+        if start.tzinfo:
+            grid = [start.tzinfo.normalize(dt) for dt in grid]
+
+        floors = [key for key, _ in groupby(grid, lambda dt: datetime_utils.round_datetime_down(dt, period, tzinfo))]
+        return sorted(set(dt for dt in floors if first <= dt < end))
+
+    def test_naive(self):
+        result = list(datetime_utils.iter_periods(datetime(2015, 3, 1, 0, 20), datetime(2015, 3, 1, 1, 30),
+                                                  'minute-15'))
+        expected_result = [datetime(2015, 3, 1, 0, 30), datetime(2015, 3, 1, 0, 45), datetime(2015, 3, 1, 1),
+                           datetime(2015, 3, 1, 1, 15)]
+        self.assertEqual(result, expected_result)
+
+    def test_day_23_hours_long(self):
+        result = list(datetime_utils.iter_periods(datetime(2015, 10, 17, 3), datetime(2015, 10, 20), 'day',
+                                                  tzinfo=self.tz_AmericaSaoPaulo))
+        expected_result = [datetime(2015, 10, 17, 3), datetime(2015, 10, 18, 3), datetime(2015, 10, 19, 2)]
+        self.assertEqual(result, expected_result)
+
+    def test_day_25_hours_long(self):
+        result = list(datetime_utils.iter_periods(datetime(2015, 10, 30), datetime(2015, 11, 5), 'day',
+                                                  tzinfo=self.tz_USEastern))
+        expected_result = [datetime(2015, 10, 30, 4), datetime(2015, 10, 31, 4), datetime(2015, 11, 1, 4),
+                           datetime(2015, 11, 2, 5), datetime(2015, 11, 3, 5), datetime(2015, 11, 4, 5)]
+        self.assertEqual(result, expected_result)
+
+    def test_week_25_hours_longer(self):
+        result = list(datetime_utils.iter_periods(datetime(2015, 10, 20), datetime(2015, 11, 10), 'week',
+                                                  tzinfo=self.tz_AsiaAmman))
+        expected_result = [datetime(2015, 10, 25, 21), datetime(2015, 11, 1, 22), datetime(2015, 11, 8, 22)]
+        self.assertEqual(result, expected_result)
+
+    def test_matches_round_datetime_down(self):
+        start = datetime(2015, 10, 16, 7, 13)
+        end = datetime(2015, 11, 3)
+        for tz in (self.tz_AmericaSaoPaulo, self.tz_AsiaAmman, self.tz_USEastern):
+            aware_start, aware_end = tz.localize(start), tz.localize(end)
+            for period in ('minute-15', 'hour', 'day', 'week'):
+                for args in ((start, end, period, tz), (aware_start, aware_end, period, tz),
+                             (aware_start, aware_end, period)):
+                    result = list(datetime_utils.iter_periods(*args))
+                    expected_result = self.boundaries(*args)
+                    self.assertEqual(result, expected_result, args)
+                    self.assertEqual([dt.tzinfo for dt in result], [dt.tzinfo for dt in expected_result])
+
+    def test_empty(self):
+        self.assertEqual(list(datetime_utils.iter_periods(datetime(2015, 3, 1, 5), datetime(2015, 3, 1, 5), 'hour')),
+                         [])
+
+    def test_lazy(self):
+        periods = datetime_utils.iter_periods(datetime(2015, 3, 1), datetime.max, 'minute')
+        self.assertEqual(next(periods), datetime(2015, 3, 1))
+        self.assertEqual(next(periods), datetime(2015, 3, 1, 0, 1))
+
+
+class RoundDatetimeCalendar(TestCase):
+    ny = pytz.timezone('America/New_York')
+    st_johns = pytz.timezone('America/St_Johns')
+
+    def test_down(self):
+        dt = datetime(2016, 2, 29, 23, 59)
+        self.assertEqual(datetime_utils.round_datetime_down(dt, 'month'), datetime(2016, 2, 1))
+        self.assertEqual(datetime_utils.round_datetime_down(dt, 'quarter'), datetime(2016, 1, 1))
+        self.assertEqual(datetime_utils.round_datetime_down(dt, 'year'), datetime(2016, 1, 1))
+        self.assertEqual(datetime_utils.round_datetime_down(datetime(2016, 11, 5), 'quarter'), datetime(2016, 10, 1))
+        self.assertEqual(datetime_utils.round_datetime_down(datetime(2016, 3, 1), 'month', force=True),
+                         datetime(2016, 2, 1))
+
+    def test_up(self):
+        self.assertEqual(datetime_utils.round_datetime_up(datetime(2016, 1, 31, 1), 'month'), datetime(2016, 2, 1))
+        self.assertEqual(datetime_utils.round_datetime_up(datetime(2016, 2, 1), 'month'), datetime(2016, 2, 1))
+        self.assertEqual(datetime_utils.round_datetime_up(datetime(2016, 2, 1), 'month', force=True),
+                         datetime(2016, 3, 1))
+        self.assertEqual(datetime_utils.round_datetime_up(datetime(2016, 8, 1), 'quarter'), datetime(2016, 10, 1))
+        self.assertEqual(datetime_utils.round_datetime_up(datetime(9998, 3, 1), 'year'), datetime(9999, 1, 1))
+
+    def test_nearest(self):
+        # February 2015 is 28 days long, its middle is the 15th at 00:00,
+        # and 2016 is 366 days long, its middle is July 2nd at 00:00
+        self.assertEqual(datetime_utils.round_datetime(datetime(2015, 2, 15), 'month'), datetime(2015, 2, 1))
+        self.assertEqual(datetime_utils.round_datetime(datetime(2015, 2, 15, 0, 1), 'month'), datetime(2015, 3, 1))
+        self.assertEqual(datetime_utils.round_datetime(datetime(2015, 5, 16, 12), 'quarter'), datetime(2015, 4, 1))
+        self.assertEqual(datetime_utils.round_datetime(datetime(2015, 5, 16, 13), 'quarter'), datetime(2015, 7, 1))
+        self.assertEqual(datetime_utils.round_datetime(datetime(2016, 7, 2), 'year'), datetime(2016, 1, 1))
+        self.assertEqual(datetime_utils.round_datetime(datetime(2016, 7, 2, 1), 'year'), datetime(2017, 1, 1))
+
+    def test_timezones(self):
+        # November 1st 2015 in New York started in EDT, the DST change came later that night
+        dt = datetime(2015, 11, 20, 12)
+        self.assertEqual(datetime_utils.round_datetime_down(dt, 'month', self.ny), datetime(2015, 11, 1, 4))
+        self.assertEqual(datetime_utils.round_datetime_up(dt, 'month', self.ny), datetime(2015, 12, 1, 5))
+
+        aware = self.ny.localize(datetime(2015, 11, 20, 12))
+        self.assertEqual(str(datetime_utils.round_datetime_down(aware, 'month')), '2015-11-01 00:00:00-04:00')
+        self.assertEqual(str(datetime_utils.round_datetime_up(aware, 'quarter')), '2016-01-01 00:00:00-05:00')
+        self.assertEqual(str(datetime_utils.round_datetime_down(aware, 'year', pytz.UTC)),
+                         '2014-12-31 19:00:00-05:00')
+
+    def test_is_snapped_to(self):
+        self.assertTrue(datetime_utils.is_snapped_to(datetime(2015, 4, 1), 'quarter'))
+        self.assertFalse(datetime_utils.is_snapped_to(datetime(2015, 5, 1), 'quarter'))
+        self.assertTrue(datetime_utils.is_snapped_to(datetime(2015, 5, 1), 'month'))
+        self.assertTrue(datetime_utils.is_snapped_to(datetime(2015, 1, 1, 3, 30), 'year', self.st_johns))
+        self.assertFalse(datetime_utils.is_snapped_to(datetime(2015, 1, 1), 'year', self.st_johns))
+
+    def test_iter_periods(self):
+        self.assertEqual(list(datetime_utils.iter_periods(datetime(2015, 11, 15), datetime(2016, 4, 1), 'month')),
+                         [datetime(2015, 12, 1), datetime(2016, 1, 1), datetime(2016, 2, 1), datetime(2016, 3, 1)])
+        self.assertEqual([str(dt) for dt in datetime_utils.iter_periods(
+            self.ny.localize(datetime(2015, 2, 1)), self.ny.localize(datetime(2016, 1, 1)), 'quarter')],
+            ['2015-04-01 00:00:00-04:00', '2015-07-01 00:00:00-04:00', '2015-10-01 00:00:00-04:00'])
+
+    def test_no_timedelta(self):
+        with self.assertRaises(Exception):
+            datetime_utils.period_to_timedelta('month')
+        self.assertIsNone(Period.get('year').timedelta)
+
+
+class RoundDatetimeMultiples(TestCase):
+    berlin = pytz.timezone('Europe/Berlin')
+
+    def test_divisors_align(self):
+        dt = datetime(2013, 4, 5, 14, 33, 45)
+        self.assertEqual(datetime_utils.round_datetime_down(dt, 'second-10'), datetime(2013, 4, 5, 14, 33, 40))
+        self.assertEqual(datetime_utils.round_datetime_down(dt, 'minute-5'), datetime(2013, 4, 5, 14, 30))
+        self.assertEqual(datetime_utils.round_datetime_up(dt, 'minute-20'), datetime(2013, 4, 5, 14, 40))
+        self.assertEqual(datetime_utils.round_datetime_down(dt, 'hour-6'), datetime(2013, 4, 5, 12))
+        self.assertEqual(datetime_utils.round_datetime_up(dt, 'hour-6'), datetime(2013, 4, 5, 18))
+
+    def test_counted_from_epoch(self):
+        # 2013-04-05 14:33 is 15800 days after the epoch, 2257 weeks and one day,
+        dt = datetime(2013, 4, 5, 14, 33)
+        self.assertEqual(datetime_utils.round_datetime_down(dt, 'day-7'), datetime(2013, 4, 4))
+        self.assertEqual(datetime_utils.round_datetime_down(datetime(1970, 1, 1, 0, 8), 'minute-7'),
+                         datetime(1970, 1, 1, 0, 7))
+        # and 22752873 minutes, 3 more than a multiple of 7
+        self.assertEqual(datetime_utils.round_datetime_down(dt, 'minute-7'), datetime(2013, 4, 5, 14, 30))
+        self.assertEqual(datetime_utils.round_datetime_down(datetime(1969, 12, 31, 23, 59), 'hour-5'),
+                         datetime(1969, 12, 31, 19))
+        # weeks are counted from Monday 1969-12-29, 2257 weeks before 2013-04-01
+        self.assertEqual(datetime_utils.round_datetime_down(dt, 'week-2'), datetime(2013, 3, 25))
+        self.assertEqual(datetime_utils.round_datetime_down(datetime(2013, 3, 24), 'week-2'), datetime(2013, 3, 11))
+
+    def test_calendar(self):
+        dt = datetime(2016, 2, 29, 23, 59)
+        self.assertEqual(datetime_utils.round_datetime_down(dt, 'month-2'), datetime(2016, 1, 1))
+        self.assertEqual(datetime_utils.round_datetime_up(dt, 'month-2'), datetime(2016, 3, 1))
+        self.assertEqual(datetime_utils.round_datetime_down(datetime(2016, 5, 1), 'quarter-2'), datetime(2016, 1, 1))
+        self.assertEqual(datetime_utils.round_datetime_down(dt, 'year-10'), datetime(2010, 1, 1))
+        self.assertEqual(datetime_utils.round_datetime_up(dt, 'year-10'), datetime(2020, 1, 1))
+        self.assertEqual(datetime_utils.round_datetime_down(datetime(5, 6, 1), 'year-10'), datetime(1, 1, 1))
+        self.assertEqual(datetime_utils.round_datetime_up(datetime(5, 6, 1), 'year-10'), datetime(10, 1, 1))
+
+    def test_nearest(self):
+        # rounded down up to half of the period, to the unit below
+        self.assertEqual(datetime_utils.round_datetime(datetime(2013, 4, 5, 1, 30), 'hour-3'), datetime(2013, 4, 5))
+        self.assertEqual(datetime_utils.round_datetime(datetime(2013, 4, 5, 1, 31), 'hour-3'),
+                         datetime(2013, 4, 5, 3))
+        self.assertEqual(datetime_utils.round_datetime(datetime(2013, 4, 5, 2, 57, 30), 'minute-5'),
+                         datetime(2013, 4, 5, 2, 55))
+        self.assertEqual(datetime_utils.round_datetime(datetime(2013, 4, 5, 2, 57, 31), 'minute-5'),
+                         datetime(2013, 4, 5, 3))
+        # minute-15 keeps rounding down up to 7:59
+        self.assertEqual(datetime_utils.round_datetime(datetime(2013, 4, 5, 2, 7, 59), 'minute-15'),
+                         datetime(2013, 4, 5, 2))
+
+    def test_timezones(self):
+        # the clocks in Berlin went back from 03:00 to 02:00 on 2015-10-25
+        dt = datetime(2015, 10, 24, 23, 30)
+        self.assertEqual(str(datetime_utils.round_datetime_down(self.berlin.localize(dt), 'hour-2')),
+                         '2015-10-24 22:00:00+02:00')
+        self.assertEqual(datetime_utils.round_datetime_up(datetime(2015, 10, 25, 0, 30), 'hour-2', self.berlin),
+                         datetime(2015, 10, 25, 1))
+        self.assertTrue(datetime_utils.is_snapped_to(datetime(2015, 10, 25, 1), 'hour-2', self.berlin))
+        self.assertFalse(datetime_utils.is_snapped_to(datetime(2015, 10, 25, 1), 'hour-3', self.berlin))
+
+    def test_is_snapped_to(self):
+        self.assertTrue(datetime_utils.is_snapped_to(datetime(2013, 4, 1), 'week'))
+        self.assertFalse(datetime_utils.is_snapped_to(datetime(2013, 4, 1), 'week-2'))
+        self.assertTrue(datetime_utils.is_snapped_to(datetime(2013, 3, 25), 'week-2'))
+        self.assertTrue(datetime_utils.is_snapped_to(datetime(2013, 4, 5, 14, 35), 'minute-5'))
+
+
+class RoundDatetimeSubSecond(TestCase):
+    ny = pytz.timezone('America/New_York')
+
+    def test_down(self):
+        dt = datetime(2013, 4, 5, 2, 33, 45, 123456)
+        self.assertEqual(datetime_utils.round_datetime_down(dt, 'millisecond'), datetime(2013, 4, 5, 2, 33, 45, 123000))
+        self.assertEqual(datetime_utils.round_datetime_down(dt, 'millisecond-100'),
+                         datetime(2013, 4, 5, 2, 33, 45, 100000))
+        self.assertEqual(datetime_utils.round_datetime_down(dt, 'microsecond-250'),
+                         datetime(2013, 4, 5, 2, 33, 45, 123250))
+        self.assertEqual(datetime_utils.round_datetime_down(dt, 'microsecond'), dt)
+        self.assertEqual(datetime_utils.round_datetime_down(dt, 'microsecond', force=True),
+                         datetime(2013, 4, 5, 2, 33, 45, 123455))
+
+    def test_up(self):
+        dt = datetime(2013, 4, 5, 2, 33, 45, 123456)
+        self.assertEqual(datetime_utils.round_datetime_up(dt, 'millisecond'), datetime(2013, 4, 5, 2, 33, 45, 124000))
+        self.assertEqual(datetime_utils.round_datetime_up(dt, 'millisecond-100'),
+                         datetime(2013, 4, 5, 2, 33, 45, 200000))
+        self.assertEqual(datetime_utils.round_datetime_up(datetime(2013, 4, 5, 2, 33, 59, 999001), 'millisecond'),
+                         datetime(2013, 4, 5, 2, 34))
+
+    def test_nearest(self):
+        # rounded down up to half of the period, to the unit below
+        self.assertEqual(datetime_utils.round_datetime(datetime(2013, 4, 5, 2, 33, 45, 50000), 'millisecond-100'),
+                         datetime(2013, 4, 5, 2, 33, 45))
+        self.assertEqual(datetime_utils.round_datetime(datetime(2013, 4, 5, 2, 33, 45, 50001), 'millisecond-100'),
+                         datetime(2013, 4, 5, 2, 33, 45, 100000))
+        self.assertEqual(datetime_utils.round_datetime(datetime(2013, 4, 5, 2, 33, 45, 500), 'millisecond'),
+                         datetime(2013, 4, 5, 2, 33, 45))
+        self.assertEqual(datetime_utils.round_datetime(datetime(2013, 4, 5, 2, 33, 45, 126), 'microsecond-250'),
+                         datetime(2013, 4, 5, 2, 33, 45, 250))
+
+    def test_timezones(self):
+        # the clocks in New York went back from 02:00 EDT to 01:00 EST on 2015-11-01
+        edt = self.ny.localize(datetime(2015, 11, 1, 1, 59, 59, 999999), is_dst=True)
+        self.assertEqual(str(datetime_utils.round_datetime_up(edt, 'millisecond', self.ny)),
+                         '2015-11-01 01:00:00-05:00')
+        self.assertEqual(datetime_utils.round_datetime_up(datetime(2015, 11, 1, 5, 59, 59, 999999), 'millisecond-100',
+                                                          self.ny), datetime(2015, 11, 1, 6))
+        self.assertTrue(datetime_utils.is_snapped_to(datetime(2015, 11, 1, 6), 'millisecond', self.ny))
+        self.assertFalse(datetime_utils.is_snapped_to(datetime(2015, 11, 1, 6, 0, 0, 100), 'millisecond', self.ny))
+        self.assertTrue(datetime_utils.is_snapped_to(datetime(2015, 11, 1, 6, 0, 0, 250), 'microsecond-250', self.ny))
+
+    def test_repeated_hour(self):
+        # the wall times of the first 01:30 EDT floor to the second
+        # occurrence, in EST, so the first boundary after it is 01:00 EST,
+        # found without walking through the rest of the hour microsecond
+        # by microsecond
+        self.assertEqual(datetime_utils.round_datetime_up(datetime(2015, 11, 1, 5, 30, 0, 500), 'microsecond', self.ny),
+                         datetime(2015, 11, 1, 6))
+        # in Dublin those of the second 01:30 (GMT) floor to the first (IST)
+        dublin = pytz.timezone('Europe/Dublin')
+        self.assertEqual(datetime_utils.round_datetime_up(datetime(2015, 10, 25, 1, 30, 0, 500), 'millisecond', dublin),
+                         datetime(2015, 10, 25, 2))
+
+
+class TestPeriod(TestCase):
+
+    def test_get_is_cached(self):
+        period = Period.get('minute-15')
+        self.assertIs(Period.get('minute-15'), period)
+        self.assertIs(Period.get(period), period)
+
+    def test_parts(self):
+        period = Period.get('minute-15')
+        self.assertEqual(period.unit, 'minute')
+        self.assertEqual(period.quantity, 15)
+        self.assertEqual(period.timedelta, timedelta(minutes=15))
+        self.assertEqual(repr(period), "Period('minute-15')")
+
+    def test_unrecognized_period(self):
+        for name in (None, 5, 'fortnight', 'month-1', 'minute-x', 'hour-0', 'hour--2', ['day'], 'minute-15-3',
+                     'minute-015', 'day-1', 'minute-'):
+            with self.assertRaises(Exception):
+                Period.get(name)
+
+    def test_second(self):
+        period = Period.get('second')
+        self.assertEqual(datetime_utils.round_datetime(datetime(2015, 3, 1, 0, 0, 0, 500999), period),
+                         datetime(2015, 3, 1))
+        self.assertEqual(datetime_utils.round_datetime(datetime(2015, 3, 1, 0, 0, 0, 501000), period),
+                         datetime(2015, 3, 1, 0, 0, 1))
+        self.assertTrue(datetime_utils.is_snapped_to(datetime(2015, 3, 1), period))
+        self.assertFalse(datetime_utils.is_snapped_to(datetime(2015, 3, 1, 0, 0, 0, 1), period))
+
+    def test_get_isoweek_monday(self):
+        self.assertEqual(get_isoweek_monday(datetime(2013, 3, 3, 5)), datetime(2013, 2, 25, 5))
+        self.assertEqual(get_isoweek_monday(datetime(2013, 3, 4)), datetime(2013, 3, 4))
+
+    def test_accepted_in_place_of_string(self):
+        dt = datetime(2013, 4, 5, 2, 38)
+        for name in ('minute', 'minute-15', 'hour', 'day', 'week'):
+            period = Period.get(name)
+            self.assertEqual(datetime_utils.round_datetime(dt, period), datetime_utils.round_datetime(dt, name))
+            self.assertEqual(datetime_utils.round_datetime_down(dt, period),
+                             datetime_utils.round_datetime_down(dt, name))
+            self.assertEqual(datetime_utils.round_datetime_up(dt, period), datetime_utils.round_datetime_up(dt, name))
+            self.assertEqual(datetime_utils.period_to_timedelta(period), datetime_utils.period_to_timedelta(name))
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,146 @@
+"""
+The offset history of zoneinfo timezones.
+
+zoneinfo.ZoneInfo does not expose its transitions, so they are read from
+the zone's TZif file (RFC 8536), looked up on zoneinfo.TZPATH and then in
+the tzdata package as zoneinfo itself does. After the last transition in
+the file, where the zone follows its DST rules, the offsets are found by
+asking the ZoneInfo itself up to HORIZON. A ZoneInfo without a file (one
+made with ZoneInfo.from_file) is sampled like that from SAMPLE_START.
+"""
+import os
+import struct
+from datetime import datetime, timedelta
+
+from .periods import SECOND, to_microseconds
+
+EPOCH = datetime(1970, 1, 1)
+
+# the range offsets are sampled in, in seconds since the Unix epoch
+SAMPLE_START = int((datetime(1800, 1, 1) - EPOCH).total_seconds())
+HORIZON = int((datetime(2100, 1, 1) - EPOCH).total_seconds())
+
+# the spacing of the samples, in seconds; DST lasts longer than this
+_SAMPLE_STEP = 7 * 86400
+
+
+def _open(key):
+    import zoneinfo
+
+    for root in zoneinfo.TZPATH:
+        path = os.path.join(root, *key.split('/'))
+        if os.path.isfile(path):
+            return open(path, 'rb')
+
+    try:
+        from importlib import resources
+        return resources.files('tzdata').joinpath('zoneinfo', *key.split('/')).open('rb')
+    except (ImportError, OSError):
+        return None
+
+
+def read_tzif(data):
+    """
+    Parse the contents of a TZif file.
+
+    :rtype: tuple
+    :returns: The transition times (seconds since the Unix epoch), the
+        kind each one starts, the kind before the first one and whether
+        the footer has DST rules. A kind is (offset in microseconds, dst
+        flag, abbreviation).
+    """
+    if data[:4] != b'TZif':
+        raise Exception('Unsupported timezone file')
+
+    counts = struct.unpack('>6l', data[20:44])
+    size, code = 4, 'l'
+    if data[4:5] >= b'2':
+        # skip the 32-bit data of version 1 to the 64-bit data after it
+        isutcnt, isstdcnt, leapcnt, timecnt, typecnt, charcnt = counts
+        data = data[44 + timecnt * 5 + typecnt * 6 + charcnt + leapcnt * 8 + isstdcnt + isutcnt:]
+        counts = struct.unpack('>6l', data[20:44])
+        size, code = 8, 'q'
+    isutcnt, isstdcnt, leapcnt, timecnt, typecnt, charcnt = counts
+
+    position = 44
+    times = struct.unpack('>%d%s' % (timecnt, code), data[position:position + timecnt * size])
+    position += timecnt * size
+    indices = struct.unpack('>%dB' % timecnt, data[position:position + timecnt])
+    position += timecnt
+    types = [struct.unpack('>lBB', data[position + i * 6:position + i * 6 + 6]) for i in range(typecnt)]
+    position += typecnt * 6
+    chars = data[position:position + charcnt]
+    position += charcnt + leapcnt * (size + 4) + isstdcnt + isutcnt
+
+    kinds = [
+        (offset * SECOND, bool(isdst), chars[start:chars.index(b'\0', start)].decode('ascii'))
+        for offset, isdst, start in types
+    ]
+    # zoneinfo uses the first standard time before the first transition
+    before = next((kind for kind in kinds if not kind[1]), kinds[0])
+    rules = b',' in data[position:] if size == 8 else False
+    return list(times), [kinds[i] for i in indices], before, rules
+
+
+def _kind(tzinfo, seconds):
+    dt = tzinfo.fromutc((EPOCH + timedelta(seconds=seconds)).replace(tzinfo=tzinfo))
+    return to_microseconds(dt.utcoffset()), bool(dt.dst()), dt.tzname()
+
+
+def _sample(tzinfo, start, end, step):
+    # the changes of kind after start up to end, in seconds, assuming
+    # there is at most one in every step
+    times, kinds = [], []
+    kind = _kind(tzinfo, start)
+    while start < end:
+        upper = min(start + step, end)
+        if _kind(tzinfo, upper) == kind:
+            start = upper
+            continue
+        # bisect to the first second of the new kind
+        while upper - start > 1:
+            middle = (start + upper) // 2
+            if _kind(tzinfo, middle) == kind:
+                start = middle
+            else:
+                upper = middle
+        kind = _kind(tzinfo, upper)
+        times.append(upper)
+        kinds.append(kind)
+        start = upper
+    return times, kinds
+
+
+def zoneinfo_intervals(tzinfo, minimum, maximum):
+    """
+    Return the offset intervals of a zoneinfo timezone between the UTC
+    instants minimum and maximum, in microseconds since the Unix epoch.
+
+    :rtype: tuple
+    :returns: The start of every interval and its kind, with consecutive
+        intervals of the same kind merged. The first starts at minimum.
+    """
+    f = _open(tzinfo.key) if tzinfo.key else None
+    if f is None:
+        times, kinds = _sample(tzinfo, SAMPLE_START, HORIZON, _SAMPLE_STEP)
+        before = _kind(tzinfo, SAMPLE_START)
+    else:
+        with f:
+            times, kinds, before, rules = read_tzif(f.read())
+        # after the last transition the zone follows its rules, if it has any
+        last = times[-1] if times else SAMPLE_START
+        tail = _sample(tzinfo, last, HORIZON, _SAMPLE_STEP if rules else HORIZON - last)
+        times += tail[0]
+        kinds += tail[1]
+
+    starts, merged = [minimum], [before]
+    for seconds, kind in zip(times, kinds):
+        utc = seconds * SECOND
+        if not minimum < utc < maximum:
+            if utc <= minimum:
+                merged[0] = kind
+            continue
+        if kind != merged[-1]:
+            starts.append(utc)
+            merged.append(kind)
+    return starts, merged
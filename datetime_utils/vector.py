@@ -0,0 +1,358 @@
+"""
+Rounding for numpy arrays of timestamps.
+
+The functions here mirror round_datetime_down, round_datetime_up,
+round_datetime and is_snapped_to, but take a ``numpy.datetime64`` array
+or an int64 array of epoch values and work on the whole array at once.
+Values are UTC instants, the array equivalent of naive UTC datetimes,
+and results come back in the dtype (and unit) they went in with, except
+that datetime64 units coarser than seconds (such as the days of a date
+column) come back in microseconds. NaT values are passed through.
+
+This module needs numpy, which datetime_utils does not otherwise depend
+on.
+
+.. code-block:: python
+
+    >>> import numpy
+    >>> import pytz
+    >>> from datetime_utils import vector
+    >>> values = numpy.array(['2013-04-05T02:33', '2013-04-05T19:10'], dtype='datetime64[s]')
+    >>> vector.round_datetime_down(values, 'day', tzinfo=pytz.timezone('America/Los_Angeles'))
+    array(['2013-04-04T07:00:00', '2013-04-05T07:00:00'], dtype='datetime64[s]')
+"""
+import numpy
+
+from .epoch import UNITS, get_unit
+from .periods import HOUR, MINUTE, Period
+from .zones import get_zone_table
+
+_SIX_HOURS = 6 * HOUR
+_ONE_DAY = 24 * HOUR
+
+_arrays = {}
+
+
+def _zone_arrays(tzinfo):
+    table = get_zone_table(tzinfo)
+    try:
+        return _arrays[id(table)]
+    except KeyError:
+        pass
+
+    # the kinds of the intervals, which is_snapped_to compares, as integers
+    ids = {}
+    infos = [ids.setdefault(kind, len(ids)) for kind in table.kinds]
+    arrays = _arrays[id(table)] = (
+        numpy.array(table.starts, dtype=numpy.int64),
+        numpy.array(table.offsets, dtype=numpy.int64),
+        numpy.array(table.dst, dtype=bool),
+        numpy.array(infos, dtype=numpy.int64),
+        numpy.array(table.ends, dtype=numpy.int64),
+    )
+    return arrays
+
+
+def _interval(starts, utc):
+    return numpy.maximum(numpy.searchsorted(starts, utc, side='right') - 1, 0)
+
+
+def _to_local(zone, utc):
+    """
+    Return wall times in the zone and the index of their offset interval.
+    """
+    starts, offsets = zone[:2]
+    index = _interval(starts, utc)
+    return utc + offsets[index], index
+
+
+def _to_utc(zone, local):
+    """
+    Convert wall times in the zone to UTC the way pytz localize does with
+    is_dst=False, the conversion round_datetime_down relies on.
+    """
+    starts, offsets, dst = zone[:3]
+
+    # the candidates pytz considers are the offsets in force a day either side
+    first = offsets[_interval(starts, local - _ONE_DAY)]
+    second = offsets[_interval(starts, local + _ONE_DAY)]
+    first_utc = local - first
+    second_utc = local - second
+    first_index = _interval(starts, first_utc)
+    second_index = _interval(starts, second_utc)
+    first_ok = offsets[first_index] == first
+    second_ok = offsets[second_index] == second
+
+    utc = numpy.where(first_ok, first_utc, second_utc)
+
+    # ambiguous: prefer the only standard time candidate, else the later one
+    ambiguous = first_ok & second_ok & (first_utc != second_utc)
+    if ambiguous.any():
+        first_std = ~dst[first_index]
+        second_std = ~dst[second_index]
+        chosen = numpy.where(
+            first_std & ~second_std, first_utc,
+            numpy.where(second_std & ~first_std, second_utc, numpy.maximum(first_utc, second_utc)))
+        utc = numpy.where(ambiguous, chosen, utc)
+
+    # non-existent: use the offset six hours earlier, as pytz does
+    missing = ~(first_ok | second_ok)
+    if missing.any():
+        utc[missing] = _to_utc(zone, local[missing] - _SIX_HOURS) + _SIX_HOURS
+
+    return utc
+
+
+def _floor(utc, period, zone):
+    if zone is None:
+        return period.floor_us(utc)
+    local, _ = _to_local(zone, utc)
+    return _to_utc(zone, period.floor_us(local))
+
+
+def _period_end(zone, utc, period):
+    """
+    Return where the wall time of each UTC instant leaves its period, as
+    ZoneTable.period_end does.
+    """
+    starts, offsets = zone[:2]
+    ends = zone[4]
+    local, index = _to_local(zone, utc)
+    start = period.floor_us(local)
+    end = period.next_us(start)
+
+    result = numpy.empty_like(utc)
+    pending = numpy.ones(utc.shape, dtype=bool)
+    while True:
+        # where the wall time reaches end in the current interval
+        crossing = end - offsets[index]
+        reached = pending & (crossing < ends[index])
+        result[reached] = crossing[reached]
+        pending &= ~reached
+        if not pending.any():
+            return result
+
+        # the offset changes first: see where the wall time lands
+        index = numpy.where(pending, index + 1, index)
+        landed = starts[index] + offsets[index]
+        left = pending & ~((start <= landed) & (landed < end))
+        result[left] = starts[index][left]
+        pending &= ~left
+
+
+def _overlap_end(zone, probe, rounded):
+    """
+    Return where ZoneTable.ceil's walk can skip to from each probe, as
+    ZoneTable._overlap_end does.
+    """
+    starts, offsets = zone[:2]
+    ends = zone[4]
+    local, _ = _to_local(zone, rounded)
+    index = _interval(starts, probe)
+    after = numpy.minimum(index + 1, len(starts) - 1)
+    before = numpy.maximum(index - 1, 0)
+    longer = ends - starts > 2 * _ONE_DAY
+
+    # the clocks go back at the end of probe's interval, or went back at its start
+    at_end = ((rounded >= ends[index]) & (ends[index] + offsets[after] <= local) &
+              (local < ends[index] + offsets[index]) & longer[index] & longer[after])
+    at_start = ((index > 0) & (rounded < starts[index]) & (starts[index] + offsets[index] <= local) &
+                (local < starts[index] + offsets[before]) & longer[before] & longer[index])
+    return numpy.where(at_end, ends[index],
+                       numpy.where(at_start, starts[index] + offsets[before] - offsets[index], probe))
+
+
+def _ceil(values, period, zone, force):
+    # same steps as ZoneTable.ceil: values not on a boundary (and forced
+    # ones) move to the first boundary after them
+    utc = values.to_us(values.data)
+    rounded = _floor(utc, period, zone)
+    snapped = (rounded == utc) & values.exact & (not force)
+
+    if zone is None:
+        return numpy.where(snapped, rounded, period.next_us(utc))
+
+    # the first boundary after utc, walking its periods as ZoneTable.ceil does
+    found = snapped | (rounded > utc)
+    best = numpy.where(found, rounded, numpy.iinfo(numpy.int64).max)
+    done = snapped | (found & (rounded == utc))
+    probe = utc
+    while not done.all():
+        pending = ~done
+        # short periods would otherwise be walked one by one through the
+        # rest of a repeated hour
+        following = numpy.maximum(_period_end(zone, probe, period), _overlap_end(zone, probe, rounded))
+        probe = numpy.where(pending, following, probe)
+        rounded = _floor(probe, period, zone)
+        later = pending & (rounded > utc)
+        best = numpy.where(later, numpy.minimum(best, rounded), best)
+        done |= (later & (rounded == probe)) | (probe >= best)
+    return best
+
+
+class _Values(object):
+    """
+    An input array as int64 epoch values in a known unit.
+    """
+
+    def __init__(self, values, unit):
+        values = numpy.asarray(values)
+
+        if values.dtype.kind == 'M':
+            unit, count = numpy.datetime_data(values.dtype)
+            if unit not in UNITS or count != 1:
+                # coarser units such as days come back in microseconds, as
+                # most results are not whole days (or whole units) any more
+                if numpy.timedelta64(count, unit) % numpy.timedelta64(1, 'us'):
+                    raise Exception('Unrecognized unit: %s' % values.dtype)
+                values = values.astype('datetime64[us]')
+                unit = 'us'
+            self.dtype = values.dtype
+            self.nat = numpy.isnat(values)
+            data = values.view(numpy.int64)
+            if self.nat.any():
+                data = numpy.where(self.nat, 0, data)
+        elif values.dtype.kind in 'iu':
+            unit = unit or 's'
+            self.dtype = numpy.dtype(numpy.int64)
+            self.nat = None
+            data = values.astype(numpy.int64)
+        else:
+            raise Exception('Unsupported dtype: %s' % values.dtype)
+
+        self.multiplier, self.divisor = get_unit(unit)
+        self.data = data
+
+        # whether each value is a whole number of microseconds
+        self.exact = data % self.divisor == 0 if self.divisor > 1 else True
+
+    def to_us(self, data):
+        return data * self.multiplier // self.divisor
+
+    def from_us(self, data):
+        return data * self.divisor // self.multiplier
+
+    def wrap(self, data):
+        if self.nat is not None and self.nat.any():
+            data = numpy.where(self.nat, numpy.iinfo(numpy.int64).min, data)
+        return data.astype(numpy.int64).view(self.dtype)
+
+
+def _zone(tzinfo):
+    return _zone_arrays(tzinfo) if tzinfo else None
+
+
+def round_datetime_down(values, period, tzinfo=None, force=False, unit=None):
+    """
+    Round every value down by 'snapping' it to the period.
+
+    :type values: numpy.ndarray
+    :param values: A datetime64 array, or an integer array of epoch values.
+
+    :type period: str or Period
+    :param period: Options are microsecond, millisecond, second, minute, hour, day, week,
+        month, quarter, year or multiples such as minute-15
+
+    :type tzinfo: tzinfo or str
+    :param tzinfo: A pytz or zoneinfo timezone, a fixed offset or a timezone name. If given, the round will
+        be performed with respect to the timezone.
+
+    :type force: bool
+    :param force: A boolean value. If force=True,
+        it causes pre-rounded values to jump another step anyway.
+
+    :type unit: str
+    :param unit: The unit of integer values: 's' (the default), 'ms',
+        'us' or 'ns'. Ignored for datetime64 arrays.
+
+    :rtype: numpy.ndarray
+    :returns: An array of the same dtype as values.
+    """
+    period = Period.get(period)
+    values = _Values(values, unit)
+
+    data = values.data - 1 if force else values.data
+    rounded = _floor(values.to_us(data), period, _zone(tzinfo))
+    return values.wrap(values.from_us(rounded))
+
+
+def round_datetime_up(values, period, tzinfo=None, force=False, unit=None):
+    """
+    Round every value up by 'snapping' it to the period.
+
+    Takes the same arguments as :func:`round_datetime_down`.
+    """
+    period = Period.get(period)
+    values = _Values(values, unit)
+
+    rounded = _ceil(values, period, _zone(tzinfo), force)
+    return values.wrap(values.from_us(rounded))
+
+
+def round_datetime(values, period, tzinfo=None, force=False, unit=None):
+    """
+    Round every value to the nearest period.
+
+    Takes the same arguments as :func:`round_datetime_down`. Like
+    round_datetime, the direction is decided from the UTC fields of each
+    value, not its time in tzinfo.
+    """
+    period = Period.get(period)
+    values = _Values(values, unit)
+    zone = _zone(tzinfo)
+
+    down = period.rounds_down_us(values.to_us(values.data))
+
+    floor_data = values.data - 1 if force else values.data
+    rounded = numpy.where(
+        down,
+        _floor(values.to_us(floor_data), period, zone),
+        _ceil(values, period, zone, force))
+    return values.wrap(values.from_us(rounded))
+
+
+def is_snapped_to(values, period, tzinfo=None, unit=None):
+    """
+    Check which values are 'snapped' to the period.
+
+    :type values: numpy.ndarray
+    :param values: A datetime64 array, or an integer array of epoch values.
+
+    :type period: str or Period
+    :param period: Options are microsecond, millisecond, second, minute, hour, day, week,
+        month, quarter, year or multiples such as minute-15
+
+    :type tzinfo: tzinfo or str
+    :param tzinfo: A pytz or zoneinfo timezone, a fixed offset or a timezone name. If given, the check is done in
+        that timezone, else in UTC.
+
+    :type unit: str
+    :param unit: The unit of integer values: 's' (the default), 'ms',
+        'us' or 'ns'. Ignored for datetime64 arrays.
+
+    :rtype: numpy.ndarray
+    :returns: A boolean array. NaT values are never snapped.
+    """
+    period = Period.get(period)
+    values = _Values(values, unit)
+    zone = _zone(tzinfo)
+
+    local = values.to_us(values.data)
+    less = values.to_us(values.data - 1)
+    if zone is not None:
+        local, index = _to_local(zone, local)
+        less, less_index = _to_local(zone, less)
+
+    snapped = period.snap_key_us(less) != period.snap_key_us(local)
+
+    # handling the case where there's a 'double hour' DST transition
+    if zone is not None and period.unit == 'hour':
+        infos = zone[3]
+        double = (infos[less_index] != infos[index]) & (less // MINUTE % 60 > local // MINUTE % 60)
+        if period.quantity > 1:
+            double &= period.floor_us(local) == local
+        snapped |= double
+
+    if values.nat is not None:
+        snapped &= ~values.nat
+    return snapped
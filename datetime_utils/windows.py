@@ -0,0 +1,484 @@
+"""
+Aggregation of timestamped values over tumbling and hopping windows.
+"""
+from __future__ import division
+
+import heapq
+import sys
+from collections import deque, namedtuple
+from itertools import chain
+
+from .buckets import end_us, start_us
+from .cache import _to_datetime
+from .periods import Period, to_microseconds
+from .zones import get_zone_table, wall_microseconds
+
+AGGREGATIONS = ('count', 'sum', 'min', 'max', 'mean')
+
+Window = namedtuple('Window', 'bucket start end aggregates')
+
+
+class WindowAggregator(object):
+    """
+    Counts, sums, minimums, maximums and means of values over the
+    consecutive periods of their timestamps, one window per period.
+
+    The windows are those of round_datetime_down in the timezone: every
+    value is in the window that starts at round_datetime_down(dt, period,
+    tzinfo or UTC), as an instant, and the windows are keyed by
+    bucket_id. Unlike round_datetime_down without a timezone, aware
+    datetimes are not rounded in their own timezone but in UTC when
+    tzinfo is None, so that all the windows are in the one timezone;
+    pass their timezone as tzinfo for windows in it. A window is closed,
+    and returned by add or add_many, as soon as a value at or after its
+    end is added. Until then it holds a count, a sum, a minimum and a
+    maximum, whatever the number of values in it, so for timestamps that
+    are roughly in order only a window or two is open at a time. A value
+    for a window that has already been closed is not aggregated, only
+    counted in late.
+
+    :type period: str or Period
+    :param period: Options are microsecond, millisecond, second, minute, hour, day, week,
+        month, quarter, year or multiples such as minute-15
+
+    :type tzinfo: tzinfo or str
+    :param tzinfo: A pytz or zoneinfo timezone, a fixed offset or a timezone name. If given, the windows
+        are the periods of the timezone, else those of UTC, for aware
+        datetimes too, with naive datetimes taken as UTC.
+
+    :type aggregations: iterable
+    :param aggregations: The aggregates of every window, of 'count',
+        'sum', 'min', 'max' and 'mean'. Values are only needed for the
+        ones other than 'count'.
+
+    .. code-block:: python
+
+        >>> import datetime
+        >>> from datetime_utils import WindowAggregator
+        >>> aggregator = WindowAggregator('hour', aggregations=('count', 'max'))
+        >>> aggregator.add_many([(datetime.datetime(2013, 4, 5, 2, 10), 3), (datetime.datetime(2013, 4, 5, 2, 40), 5)])
+        []
+        >>> window, = aggregator.add(datetime.datetime(2013, 4, 5, 3, 5), 1)
+        >>> print(window.bucket, window.start, window.end, sorted(window.aggregates.items()))
+        379202 2013-04-05 02:00:00 2013-04-05 03:00:00 [('count', 2), ('max', 5)]
+        >>> [window.start.hour for window in aggregator.flush()]
+        [3]
+    """
+
+    def __init__(self, period, tzinfo=None, aggregations=('count',)):
+        for name in aggregations:
+            if name not in AGGREGATIONS:
+                raise Exception('Unrecognized aggregation: %s' % name)
+
+        self.period = Period.get(period)
+        self.tzinfo = tzinfo
+        self.aggregations = tuple(aggregations)
+        # the latest instant added, in microseconds since the Unix epoch
+        self.watermark = None
+        self.late = 0
+
+        self._zone = get_zone_table(tzinfo) if tzinfo else None
+        # bucket -> [count, sum, min, max] of the open windows
+        self._open = {}
+        # a heap of the (end, bucket) of the open windows
+        self._ends = []
+        # the instants from lower up to upper are in the window of state
+        self._run = (1, 0, None)
+
+    def __len__(self):
+        return len(self._open)
+
+    def _window(self, utc):
+        # find the state of the window of utc, opening it if need be; None
+        # if it has been closed
+        zone, period = self._zone, self.period
+        if zone is None:
+            bucket, upper = period.index_us(utc), period.next_us(utc)
+        else:
+            bucket, upper = period.index_us(zone.to_local(utc)[0]), zone.period_end(utc, period)
+
+        state = self._open.get(bucket)
+        if state is None:
+            end = end_us(zone, period, bucket)
+            if self.watermark is not None and end <= self.watermark:
+                return None
+            state = self._open[bucket] = [0, 0, None, None]
+            heapq.heappush(self._ends, (end, bucket))
+        self._run = (utc, upper, state)
+        return state
+
+    def add(self, dt, value=None):
+        """
+        Add a value at the datetime dt, naive UTC or aware.
+
+        :rtype: list
+        :returns: The windows this closes, as for add_many.
+        """
+        return self.add_many(((dt, value),))
+
+    def add_many(self, records):
+        """
+        Add (dt, value) pairs, where dt is a naive UTC or aware datetime.
+
+        :rtype: list
+        :returns: The windows the records close, in the order they end: a
+            Window(bucket, start, end, aggregates) for each, where start and
+            end are datetimes as bucket_start and bucket_end return them and
+            aggregates a dict of the aggregations.
+        """
+        values = 'sum' in self.aggregations or 'mean' in self.aggregations
+        minimum = 'min' in self.aggregations
+        maximum = 'max' in self.aggregations
+        ends = self._ends
+        closed = []
+
+        for dt, value in records:
+            utc = wall_microseconds(dt)
+            if dt.tzinfo is not None:
+                utc -= to_microseconds(dt.utcoffset())
+
+            lower, upper, state = self._run
+            if not lower <= utc < upper:
+                state = self._window(utc)
+                if state is None:
+                    self.late += 1
+                    continue
+
+            state[0] += 1
+            if values:
+                state[1] += value
+            if minimum and (state[2] is None or value < state[2]):
+                state[2] = value
+            if maximum and (state[3] is None or value > state[3]):
+                state[3] = value
+
+            if self.watermark is None or utc > self.watermark:
+                self.watermark = utc
+                if ends[0][0] <= utc:
+                    closed.extend(self._close(utc))
+        return closed
+
+    def _close(self, watermark):
+        # the windows that end by watermark
+        ends = self._ends
+        closed = []
+        while ends and ends[0][0] <= watermark:
+            _, bucket = heapq.heappop(ends)
+            closed.append(self._result(bucket, self._open.pop(bucket)))
+        self._run = (1, 0, None)
+        return closed
+
+    def _result(self, bucket, state):
+        zone, period = self._zone, self.period
+        count, total, minimum, maximum = state
+        aggregates = {'count': count, 'sum': total, 'min': minimum, 'max': maximum, 'mean': total / count}
+        return Window(bucket, _to_datetime(start_us(zone, period, bucket), zone),
+                      _to_datetime(end_us(zone, period, bucket), zone),
+                      dict((name, aggregates[name]) for name in self.aggregations))
+
+    def flush(self):
+        """
+        Close every open window, at the end of the input. Values added
+        after that open their windows again.
+
+        :rtype: list
+        :returns: The windows, as for add_many.
+        """
+        if not self._ends:
+            return []
+        return self._close(max(self._ends)[0])
+
+    def memory_usage(self):
+        """
+        Return an estimate of the memory the open windows take, in bytes:
+        that of the containers and the state of every window, but not of
+        the values in them.
+        """
+        size = sys.getsizeof(self._open) + sys.getsizeof(self._ends)
+        for bucket, state in self._open.items():
+            size += sys.getsizeof(bucket) + sys.getsizeof(state)
+        for entry in self._ends:
+            size += sys.getsizeof(entry) + sys.getsizeof(entry[0])
+        return size
+
+
+def _panes(size, hop):
+    # the number of hop periods in a window of size, in wall time
+    if size.timedelta is not None and hop.timedelta is not None:
+        if size.step % hop.step == 0:
+            return size.step // hop.step
+    elif size.timedelta is None and hop.timedelta is None:
+        if size.months % hop.months == 0:
+            return size.months // hop.months
+    raise Exception('Unsupported windows: %s every %s' % (size.name, hop.name))
+
+
+def _utc(dt):
+    utc = wall_microseconds(dt)
+    if dt.tzinfo is not None:
+        utc -= to_microseconds(dt.utcoffset())
+    return utc
+
+
+def _pane(zone, hop, utc):
+    return hop.index_us(utc if zone is None else zone.to_local(utc)[0])
+
+
+def _window_start(zone, hop, first):
+    # the start of the window from the pane first: that of the pane, or
+    # if the clocks skipped its wall time, the instant they jumped
+    start = start_us(zone, hop, first)
+    if zone is not None and zone.to_local(start)[0] != hop.start_us(first):
+        return end_us(zone, hop, first - 1)
+    return start
+
+
+def hopping_windows(dt, size, hop, tzinfo=None):
+    """
+    Return every window of length size, starting at each boundary of hop,
+    that the datetime dt is in.
+
+    The windows are runs of whole hop periods, panes, counted in wall
+    time, so a window of a day is 23 or 25 hours long across a DST
+    change, and one from a pane the clocks skipped starts where they
+    jumped. They are all worked out from the one pane of dt. Sliding
+    windows aligned to the boundaries of a period are hopping windows
+    with that period as hop, e.g. an hour every minute.
+
+    :type dt: datetime
+    :param dt: A datetime object, naive UTC or aware.
+
+    :type size: str or Period
+    :param size: The length of the windows, a whole number of hop periods:
+        'hour' for hop 'minute-15', or 'year' for hop 'month'.
+
+    :type hop: str or Period
+    :param hop: The period the windows start every one of.
+
+    :type tzinfo: tzinfo or str
+    :param tzinfo: A pytz or zoneinfo timezone, a fixed offset or a timezone name. If given, the windows
+        are those of the timezone, else those of UTC.
+
+    :rtype: list
+    :returns: (start, end) pairs of datetimes as bucket_start and
+        bucket_end return them, the earliest window first.
+
+    :raises: Exception if size is not a whole number of hop periods
+
+    .. code-block:: python
+
+        >>> import datetime
+        >>> from datetime_utils import hopping_windows
+        >>> for start, end in hopping_windows(datetime.datetime(2013, 4, 5, 2, 33), 'hour', 'minute-30'):
+        ...     print(start, end)
+        2013-04-05 02:00:00 2013-04-05 03:00:00
+        2013-04-05 02:30:00 2013-04-05 03:30:00
+    """
+    size, hop = Period.get(size), Period.get(hop)
+    panes = _panes(size, hop)
+    zone = get_zone_table(tzinfo) if tzinfo else None
+    pane = _pane(zone, hop, _utc(dt))
+    return [(_to_datetime(_window_start(zone, hop, first), zone),
+             _to_datetime(end_us(zone, hop, first + panes - 1), zone))
+            for first in range(pane - panes + 1, pane + 1)]
+
+
+_EMPTY = (0, 0, None, None)
+
+
+def _combine(first, second):
+    # the aggregates of two (count, sum, min, max) states together
+    count, total, minimum, maximum = first
+    if not second[0]:
+        return first
+    if not count:
+        return second
+    return (count + second[0], total + second[1],
+            minimum if second[2] is None or minimum is not None and minimum <= second[2] else second[2],
+            maximum if second[3] is None or maximum is not None and maximum >= second[3] else second[3])
+
+
+class _PaneAggregator(WindowAggregator):
+    """
+    A WindowAggregator that closes its windows to (bucket, state) pairs.
+    """
+
+    def _result(self, bucket, state):
+        return bucket, tuple(state)
+
+
+class HoppingWindowAggregator(object):
+    """
+    Counts, sums, minimums, maximums and means of values over windows of
+    length size that start at every boundary of hop, such as an hour
+    every 15 minutes; with a hop as long as size the windows tumble.
+
+    The values are aggregated once, into panes of one hop period each as
+    a WindowAggregator does, and every window is the panes in it
+    combined, taken from a queue of the panes it shares with the windows
+    before and after it; only the panes of the windows still open are
+    kept. A window is closed once all its panes are, and only returned if
+    there were values in it. As for hopping_windows, the windows are runs
+    of panes in wall time, 23 or 25 hours long for a day across a DST
+    change.
+
+    :type size: str or Period
+    :param size: The length of the windows, a whole number of hop periods.
+
+    :type hop: str or Period
+    :param hop: The period the windows start every one of.
+
+    The other arguments are those of WindowAggregator.
+
+    .. code-block:: python
+
+        >>> import datetime
+        >>> from datetime_utils import HoppingWindowAggregator
+        >>> aggregator = HoppingWindowAggregator('hour', 'minute-30', aggregations=('count', 'sum'))
+        >>> records = [(datetime.datetime(2013, 4, 5, 2, minute), minute) for minute in (10, 40, 50)]
+        >>> for window in aggregator.add_many(records):
+        ...     print(window.start, window.end, sorted(window.aggregates.items()))
+        2013-04-05 01:30:00 2013-04-05 02:30:00 [('count', 1), ('sum', 10)]
+        >>> for window in aggregator.add(datetime.datetime(2013, 4, 5, 3, 35), 1):
+        ...     print(window.start, window.end, sorted(window.aggregates.items()))
+        2013-04-05 02:00:00 2013-04-05 03:00:00 [('count', 3), ('sum', 100)]
+        2013-04-05 02:30:00 2013-04-05 03:30:00 [('count', 2), ('sum', 90)]
+    """
+
+    def __init__(self, size, hop, tzinfo=None, aggregations=('count',)):
+        self.size = Period.get(size)
+        self.hop = Period.get(hop)
+        self.panes = _panes(self.size, self.hop)
+        self.aggregations = tuple(aggregations)
+        self.tzinfo = tzinfo
+
+        self._panes = _PaneAggregator(self.hop, tzinfo, aggregations)
+        self._zone = self._panes._zone
+        # the closed panes no window has taken yet, oldest first
+        self._pending = deque()
+        # the panes of the window being combined, as two stacks: front
+        # holds each pane with the aggregates of it and the panes after it
+        # in front, oldest last, and back the newer ones with their total
+        self._front = []
+        self._back = []
+        self._back_total = _EMPTY
+        # the first pane of the next window, and when the first pane that
+        # has not closed yet ends
+        self._next = None
+        self._next_close = None
+
+    def __len__(self):
+        return len(self._panes) + len(self._pending) + len(self._front) + len(self._back)
+
+    @property
+    def late(self):
+        return self._panes.late
+
+    def add(self, dt, value=None):
+        """
+        Add a value at the datetime dt, naive UTC or aware.
+
+        :rtype: list
+        :returns: The windows this closes, as for add_many.
+        """
+        return self.add_many(((dt, value),))
+
+    def add_many(self, records):
+        """
+        Add (dt, value) pairs, where dt is a naive UTC or aware datetime.
+
+        :rtype: list
+        :returns: The windows the records close, the earliest first: a
+            Window(bucket, start, end, aggregates) for each, where bucket
+            is the bucket_id of its first pane for the hop period.
+        """
+        self._pending.extend(self._panes.add_many(records))
+        watermark = self._panes.watermark
+        if watermark is None or self._next_close is not None and watermark < self._next_close:
+            return []
+
+        # the last pane that ends by the watermark
+        zone, hop = self._zone, self.hop
+        closed = _pane(zone, hop, watermark)
+        while end_us(zone, hop, closed) > watermark:
+            closed -= 1
+        self._next_close = end_us(zone, hop, closed + 1)
+        return self._windows(closed)
+
+    def flush(self):
+        """
+        Close every open window, at the end of the input. Values added
+        after that open their windows again.
+
+        :rtype: list
+        :returns: The windows, as for add_many.
+        """
+        self._pending.extend(self._panes.flush())
+        if not self._pending:
+            return []
+        windows = self._windows(self._pending[-1][0] + self.panes - 1)
+        del self._front[:], self._back[:]
+        self._back_total = _EMPTY
+        self._next = self._next_close = None
+        return windows
+
+    def _windows(self, closed):
+        # the windows whose panes are all at or before the pane closed
+        panes, pending, front, back = self.panes, self._pending, self._front, self._back
+        windows = []
+        while True:
+            if not front and not back:
+                if not pending:
+                    break
+                # skip the windows without any panes
+                first = pending[0][0] - panes + 1
+                if self._next is None or self._next < first:
+                    self._next = first
+
+            first = self._next
+            last = first + panes - 1
+            if last > closed:
+                break
+
+            while pending and pending[0][0] <= last:
+                pane = pending.popleft()
+                back.append(pane)
+                self._back_total = _combine(self._back_total, pane[1])
+            while (front or back) and (front[-1][0] if front else back[0][0]) < first:
+                if not front:
+                    self._flip()
+                front.pop()
+
+            if front or back:
+                total = _combine(front[-1][1], self._back_total) if front else self._back_total
+                windows.append(self._result(first, total))
+            self._next = first + 1
+        return windows
+
+    def _flip(self):
+        # move the back stack to the front, totalling it from the newest pane
+        total = _EMPTY
+        for bucket, state in reversed(self._back):
+            total = _combine(state, total)
+            self._front.append((bucket, total))
+        del self._back[:]
+        self._back_total = _EMPTY
+
+    def _result(self, first, state):
+        zone, hop = self._zone, self.hop
+        count, total, minimum, maximum = state
+        aggregates = {'count': count, 'sum': total, 'min': minimum, 'max': maximum, 'mean': total / count}
+        return Window(first, _to_datetime(_window_start(zone, hop, first), zone),
+                      _to_datetime(end_us(zone, hop, first + self.panes - 1), zone),
+                      dict((name, aggregates[name]) for name in self.aggregations))
+
+    def memory_usage(self):
+        """
+        Return an estimate of the memory the open panes and windows take,
+        in bytes, as WindowAggregator.memory_usage does.
+        """
+        size = self._panes.memory_usage() + sys.getsizeof(self._pending) + sys.getsizeof(self._front) + \
+            sys.getsizeof(self._back)
+        for bucket, state in chain(self._pending, self._front, self._back):
+            size += sys.getsizeof(bucket) + sys.getsizeof(state)
+        return size
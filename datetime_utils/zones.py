@@ -0,0 +1,338 @@
+import sys
+from bisect import bisect_right
+from datetime import datetime, timedelta
+
+from .periods import DAY, HOUR, to_microseconds
+
+EPOCH = datetime(1970, 1, 1)
+
+_EPOCH_ORDINAL = EPOCH.toordinal()
+
+_SIX_HOURS = 6 * HOUR
+
+# fixed offset tzinfo classes that are not pytz zones, and the UTC the
+# rounding functions default to, which spares importing pytz until a
+# timezone is actually used
+try:
+    from datetime import timezone
+    _FIXED_TZINFOS = (timezone,)
+    UTC = timezone.utc
+except ImportError:  # pragma: no cover (Python 2)
+    import pytz
+    _FIXED_TZINFOS = ()
+    UTC = pytz.UTC
+
+# earliest and latest representable instants, in microseconds since the Unix epoch
+MIN_MICROSECONDS = to_microseconds(datetime.min - EPOCH)
+MAX_MICROSECONDS = to_microseconds(datetime.max - EPOCH)
+
+
+class ZoneTable(object):
+    """
+    The UTC offset history of a timezone as sorted integer lists.
+
+    starts[i] is the first UTC instant, in microseconds since the Unix
+    epoch, at which offsets[i] (also in microseconds) applies, and ends[i]
+    the first at which it no longer does. dst[i] is the dst flag of that
+    interval, tzinfos[i] the tzinfo instance its datetimes are given and
+    kinds[i] what tells it apart from the intervals next to it (for pytz
+    zones the tzinfo instance itself). A fold table is one of a fold-aware
+    zone such as zoneinfo.ZoneInfo, whose datetimes share one tzinfo and
+    give the second occurrence of a repeated wall time fold=1.
+    """
+
+    def __init__(self, starts, offsets, dst, tzinfos, kinds=None, fold=False):
+        self.starts = starts
+        self.ends = starts[1:] + [MAX_MICROSECONDS]
+        self.offsets = offsets
+        self.dst = dst
+        self.tzinfos = tzinfos
+        self.kinds = tzinfos if kinds is None else kinds
+        self.fold = fold
+        self.fixed = len(starts) == 1
+
+    def _index(self, utc):
+        return max(0, bisect_right(self.starts, utc) - 1)
+
+    def to_local(self, utc):
+        """
+        Return the wall time at the UTC instant utc and its interval index.
+        """
+        if self.fixed:
+            return utc + self.offsets[0], 0
+        index = self._index(utc)
+        return utc + self.offsets[index], index
+
+    def to_utc(self, local, index=None):
+        """
+        Return the UTC instant of the wall time local.
+
+        Ambiguous and non-existent wall times are resolved the way pytz's
+        localize does with is_dst=False, which is what the rounding
+        functions have always relied on. index is an optional guess at the
+        interval local falls in, which saves the lookups when it is right.
+        """
+        offsets = self.offsets
+        if self.fixed:
+            return local - offsets[0]
+
+        # a day either side is in the same interval, so nothing to resolve
+        if index is not None and self.starts[index] <= local - DAY and local + DAY < self.ends[index]:
+            return local - offsets[index]
+
+        # the candidates pytz considers are the offsets in force a day either side
+        first = offsets[self._index(local - DAY)]
+        second = offsets[self._index(local + DAY)]
+        first_utc = local - first
+        first_index = self._index(first_utc)
+        first_ok = offsets[first_index] == first
+
+        if first == second:
+            if first_ok:
+                return first_utc
+            second_ok = False
+        else:
+            second_utc = local - second
+            second_index = self._index(second_utc)
+            second_ok = offsets[second_index] == second
+
+        if first_ok and second_ok:
+            # ambiguous: prefer the only standard time candidate, else the later one
+            first_std = not self.dst[first_index]
+            if first_std != (not self.dst[second_index]):
+                return first_utc if first_std else second_utc
+            return max(first_utc, second_utc)
+
+        if first_ok:
+            return first_utc
+        if second_ok:
+            return second_utc
+
+        # non-existent: use the offset six hours earlier, as pytz does
+        return self.to_utc(local - _SIX_HOURS) + _SIX_HOURS
+
+    def floor(self, utc, period):
+        """
+        Return the UTC start of the period containing the UTC instant utc,
+        with the period's boundaries taken from wall time in this zone.
+        """
+        if self.fixed:
+            # UTC and fixed offsets need no lookups at all
+            offset = self.offsets[0]
+            return period.floor_us(utc + offset) - offset
+        local, index = self.to_local(utc)
+        return self.to_utc(period.floor_us(local), index)
+
+    def ceil(self, utc, period, force=False):
+        """
+        Return the first period boundary after the UTC instant utc, or utc
+        itself if it is already on a boundary and force is not set.
+
+        The boundaries are the instants floor returns. The periods after
+        utc's are walked through with period_end, which follows the wall
+        time across DST changes, rather than by adding a period to utc,
+        which can land back in the same wall time period when the clocks
+        go back.
+        """
+        if self.fixed:
+            offset = self.offsets[0]
+            local = utc + offset
+            if not force and period.floor_us(local) == local:
+                return utc
+            return period.next_us(local) - offset
+
+        best = None
+        probe = utc
+        while True:
+            rounded = self.floor(probe, period)
+            if rounded > utc or (rounded == utc and not force):
+                # nothing after a boundary at the start of its own period floors earlier
+                if rounded == probe:
+                    return rounded if best is None else min(best, rounded)
+                # a wall time that exists twice floors to its later occurrence,
+                # so a later period can still start first
+                best = rounded if best is None else min(best, rounded)
+            following = self.period_end(probe, period)
+            if rounded != probe:
+                # short periods would otherwise be walked one by one
+                # through the rest of a repeated hour
+                following = max(following, self._overlap_end(probe, rounded))
+            probe = following
+            if best is not None and probe >= best:
+                return best
+
+    def _overlap_end(self, probe, rounded):
+        """
+        Return the end of the wall times that exist twice around probe if
+        rounded, the floor of probe, is one of them and was resolved to its
+        other occurrence. The floors of the instants up to there are
+        resolved the same way, so ceil needs none of them. Else return
+        probe.
+        """
+        index = self._index(probe)
+        starts, ends, offsets = self.starts, self.ends, self.offsets
+        local = self.to_local(rounded)[0]
+
+        if rounded >= ends[index]:
+            # the clocks go back at the end of probe's interval
+            first, end = index, ends[index]
+            repeated = ends[index] + offsets[index + 1] <= local < ends[index] + offsets[index]
+        elif index and rounded < starts[index]:
+            # the clocks went back at its start
+            first, end = index - 1, starts[index] + offsets[index - 1] - offsets[index]
+            repeated = starts[index] + offsets[index] <= local < starts[index] + offsets[index - 1]
+        else:
+            return probe
+
+        # to_utc resolves wall times by the offsets a day either side,
+        # which is only the same for all of them between longer intervals
+        if repeated and ends[first] - starts[first] > 2 * DAY and ends[first + 1] - starts[first + 1] > 2 * DAY:
+            return end
+        return probe
+
+    def period_end(self, utc, period):
+        """
+        Return the first UTC instant after utc at which floor(utc, period)
+        changes, i.e. where the wall time leaves utc's period.
+        """
+        local, index = self.to_local(utc)
+        start = period.floor_us(local)
+        end = period.next_us(start)
+
+        while True:
+            # where the wall time reaches end in this interval
+            crossing = end - self.offsets[index]
+            if crossing < self.ends[index]:
+                return crossing
+
+            # the offset changes first: see where the wall time lands
+            index += 1
+            if not start <= self.starts[index] + self.offsets[index] < end:
+                return self.starts[index]
+
+    def to_datetime(self, utc):
+        """
+        Return the UTC instant utc as an aware datetime in this zone.
+        """
+        local, index = self.to_local(utc)
+        dt = (EPOCH + timedelta(microseconds=local)).replace(tzinfo=self.tzinfos[index])
+        # the clocks went back at the start of the interval and local is
+        # one of the wall times that came round again
+        if self.fold and index and local < self.starts[index] + self.offsets[index - 1]:
+            dt = dt.replace(fold=1)
+        return dt
+
+
+def wall_microseconds(dt):
+    """
+    Return the wall time of dt (ignoring any tzinfo) in microseconds since
+    the Unix epoch.
+    """
+    return (
+        ((dt.toordinal() - _EPOCH_ORDINAL) * 86400 + dt.hour * 3600 + dt.minute * 60 + dt.second) * 1000000 +
+        dt.microsecond)
+
+
+def _pytz_table(tzinfo):
+    infos = tzinfo._transition_info
+    return ZoneTable(
+        [to_microseconds(t - EPOCH) for t in tzinfo._utc_transition_times],
+        [to_microseconds(info[0]) for info in infos],
+        [bool(info[1]) for info in infos],
+        [tzinfo._tzinfos[info] for info in infos],
+    )
+
+
+def _fixed_table(tzinfo):
+    # UTC, pytz.FixedOffset, StaticTzInfo zones and datetime.timezone
+    offset = to_microseconds(tzinfo.utcoffset(EPOCH))
+    return ZoneTable([MIN_MICROSECONDS], [offset], [bool(tzinfo.dst(EPOCH))], [tzinfo])
+
+
+def _zoneinfo_table(tzinfo):
+    from .tzif import zoneinfo_intervals
+    starts, kinds = zoneinfo_intervals(tzinfo, MIN_MICROSECONDS, MAX_MICROSECONDS)
+    return ZoneTable(starts, [kind[0] for kind in kinds], [kind[1] for kind in kinds], [tzinfo] * len(starts),
+                     kinds, fold=True)
+
+
+def _is_zoneinfo(tzinfo):
+    # a ZoneInfo can only exist once zoneinfo has been imported
+    zoneinfo = sys.modules.get('zoneinfo')
+    return zoneinfo is not None and isinstance(tzinfo, zoneinfo.ZoneInfo)
+
+
+def _is_fixed(tzinfo):
+    return hasattr(tzinfo, 'localize') or isinstance(tzinfo, _FIXED_TZINFOS)
+
+
+# (name, accepts, compile) of every kind of timezone a ZoneTable can be
+# compiled from, in the order they are tried
+BACKENDS = [
+    ('pytz', lambda tzinfo: hasattr(tzinfo, '_utc_transition_times'), _pytz_table),
+    ('zoneinfo', _is_zoneinfo, _zoneinfo_table),
+    ('fixed', _is_fixed, _fixed_table),
+]
+
+
+def _compile(tzinfo):
+    for name, accepts, compile_table in BACKENDS:
+        if accepts(tzinfo):
+            return compile_table(tzinfo)
+    raise Exception('Unsupported timezone: %r' % (tzinfo,))
+
+
+def get_timezone(name):
+    """
+    Return the timezone called name, such as 'America/New_York', from the
+    fastest backend available: zoneinfo (Python 3.9 and later), which
+    needs no localize or normalize and nothing beyond the standard
+    library, else pytz. 'UTC' is datetime.timezone.utc.
+
+    Every function taking a tzinfo also takes a timezone name, which is
+    looked up with this.
+
+    :raises: Exception if there is no such timezone
+    """
+    if name == 'UTC':
+        return UTC
+    try:
+        try:
+            from zoneinfo import ZoneInfo
+        except ImportError:  # pragma: no cover (Python < 3.9)
+            import pytz
+            return pytz.timezone(name)
+        return ZoneInfo(name)
+    except (KeyError, ValueError):
+        raise Exception('Unrecognized timezone: %s' % name)
+
+
+# zone name (or the tzinfo itself for fixed offsets) -> ZoneTable
+_tables = {}
+
+# tzinfo instance -> ZoneTable, to skip the zone name lookup
+_tzinfo_tables = {}
+
+
+def get_zone_table(tzinfo):
+    """
+    Return the cached ZoneTable of a timezone: a pytz, zoneinfo or fixed
+    offset tzinfo, or the name of one.
+
+    Every tzinfo instance of a pytz zone shares the zone's table.
+    """
+    try:
+        return _tzinfo_tables[tzinfo]
+    except KeyError:
+        pass
+
+    name = tzinfo
+    if isinstance(tzinfo, str):
+        tzinfo = get_timezone(tzinfo)
+
+    key = getattr(tzinfo, 'zone', None) or tzinfo
+    table = _tables.get(key)
+    if table is None:
+        table = _tables[key] = _compile(tzinfo)
+    _tzinfo_tables[name] = table
+    return table
@@ -14,6 +14,9 @@ setup(
     install_requires=[
         'pytz>=2014.10',
     ],
+    extras_require={
+        'vector': ['numpy'],
+    },
     classifiers=[
         'Topic :: Utilities',
         'Topic :: Software Development :: Libraries :: Python Modules',